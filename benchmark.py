@@ -0,0 +1,266 @@
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import food_recommendation_bot
+import food_recommendation_simple
+import order_generator
+import order_store
+import parse_orders
+import snapshots
+
+# Order counts for the pipeline benchmark
+PIPELINE_SIZES = [1_000, 10_000, 100_000]
+
+# Pipeline results to compare against (python benchmark.py pipeline --save-baseline),
+# and how much slower or bigger than its baseline a stage may get
+BASELINES_FILE = "benchmark_baselines.json"
+REGRESSION_THRESHOLD = 0.25
+
+# Slowdowns smaller than this (seconds) are timer noise, not regressions
+REGRESSION_MIN_SECONDS = 0.005
+
+# Quick stages are repeated until they've run this long (seconds), and the best run counts
+MIN_MEASURE_TIME = 0.5
+
+# Fresh interpreters started to measure the bot's cold start
+STARTUP_RUNS = 5
+
+# Subsystems the bot imports on first use, in the order a new chat would reach them
+LAZY_MODULES = ['order_store', 'food_recommendation_simple', 'login_flow', 'food_recommendation']
+
+def measure(func, prepare=None, min_time=MIN_MEASURE_TIME):
+    """Best time of func over at least min_time seconds of runs, then its peak memory (bytes).
+
+    prepare() runs before every run, to put back the state func expects.
+    """
+
+    timings = []
+    while sum(timings) < min_time and len(timings) < 1000:
+        if prepare:
+            prepare()
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+
+    # tracemalloc slows Python down a lot, so memory is measured in a separate run
+    if prepare:
+        prepare()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, min(timings), peak
+
+def load_baselines(path=BASELINES_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_baselines(results, path=BASELINES_FILE):
+    baselines = load_baselines(path)
+    baselines.update(results)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+
+def compare(result, baseline):
+    # Ratios to the baseline, and whether either is past the regression threshold
+    if not baseline:
+        return "(no baseline)", False
+    time_ratio = result['seconds'] / baseline['seconds'] if baseline['seconds'] else 1.0
+    memory_ratio = result['peak_mb'] / baseline['peak_mb'] if baseline['peak_mb'] else 1.0
+    regressed = (
+        (time_ratio > 1 + REGRESSION_THRESHOLD and result['seconds'] - baseline['seconds'] > REGRESSION_MIN_SECONDS)
+        or memory_ratio > 1 + REGRESSION_THRESHOLD
+    )
+    return f"time {time_ratio:.2f}x, memory {memory_ratio:.2f}x" + ("  REGRESSION" if regressed else ""), regressed
+
+def bench_pipeline(sizes=PIPELINE_SIZES, save_baseline=False):
+    """The pipeline from an orders_data.json export to the bot's messages, on synthetic orders.
+
+    Reports time, throughput and peak memory of every stage and compares
+    them with the stored baselines. Returns the stages that regressed.
+    """
+
+    print("===== PIPELINE BENCHMARK =====\n")
+    print(f"{'stage':<28} {'orders':>9} {'time':>10} {'throughput':>16} {'peak MB':>9}  vs baseline")
+
+    baselines = load_baselines()
+    results = {}
+    regressions = []
+
+    for size in sizes:
+        workdir = tempfile.mkdtemp(prefix="bench_")
+        json_file = os.path.join(workdir, "orders_data.json")
+        csv_file = os.path.join(workdir, "orders_summary.csv")
+        db_file = os.path.join(workdir, "orders.db")
+        snapshot_file = os.path.join(workdir, "snapshot.pickle")
+
+        def remove(*paths):
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+        def fresh_csv():
+            remove(csv_file)
+
+        def fresh_store():
+            remove(db_file, db_file + "-wal", db_file + "-shm")
+            order_store.invalidate_cache(db_file)
+
+        def cold_store():
+            order_store.invalidate_cache(db_file)
+
+        def forget_snapshot():
+            # As after a restart: nothing in memory, the snapshot file on disk
+            cold_store()
+            snapshots.forget(snapshot_file)
+
+        def snapshot():
+            return snapshots.get(db_file, snapshot_file)
+
+        # Later stages work on what earlier ones produced
+        state = {}
+
+        def read_history():
+            state['orders'] = order_store.load_order_history(db_file)
+
+        def analyze():
+            state['analysis'] = food_recommendation_simple.analyze_orders(state['orders'])
+
+        # (name, orders it handles per run, prepare, func)
+        stages = [
+            ("generate orders_data.json", size, None,
+             lambda: order_generator.write_orders_json(json_file, size)),
+            ("parse_orders_to_csv", size, fresh_csv,
+             lambda: parse_orders.parse_orders_to_csv(json_file, csv_file)),
+            ("order_store.ingest_json", size, fresh_store,
+             lambda: order_store.ingest_json(json_file, db_file)),
+            ("read_order_history", size, cold_store, read_history),
+            ("analyze_orders", size, None, analyze),
+            ("generate_recommendation", 1, None,
+             lambda: food_recommendation_simple.generate_recommendation(state['analysis'])),
+            ("order_store.get_time_index", size, cold_store,
+             lambda: order_store.get_time_index(db_file)),
+            ("snapshots.refresh", size, cold_store,
+             lambda: snapshots.refresh(db_file, snapshot_file)),
+            ("snapshots.get after restart", size, forget_snapshot,
+             lambda: snapshots.get(db_file, snapshot_file)),
+            ("bot: recent orders", 1, None,
+             lambda: food_recommendation_bot.format_order_history(snapshot()['recent_orders'])),
+            ("bot: top restaurants", 1, None,
+             lambda: food_recommendation_bot.format_top_restaurants(snapshots.top_restaurants(snapshot()))),
+            ("bot: top restaurants month", 1, None,
+             lambda: food_recommendation_bot.format_top_restaurants(
+                 snapshots.top_restaurants(snapshot(), 'month'), 'month', snapshots.order_totals(snapshot(), 'month')
+             )),
+            ("bot: recommendation", 1, None,
+             lambda: snapshots.recommendation(snapshot())),
+        ]
+
+        try:
+            for name, units, prepare, func in stages:
+                result, seconds, peak = measure(func, prepare)
+                key = f"{name}@{size}"
+                results[key] = {'seconds': seconds, 'peak_mb': peak / 1024 ** 2}
+                verdict, regressed = compare(results[key], baselines.get(key))
+                if regressed:
+                    regressions.append(key)
+
+                rate = f"{units / seconds:,.0f} orders/s" if units > 1 else f"{1 / seconds:,.0f} calls/s"
+                print(f"{name:<28} {size:>9} {seconds * 1000:>8.1f}ms {rate:>16} "
+                      f"{results[key]['peak_mb']:>9.1f}  {verdict}")
+        finally:
+            order_store.invalidate_cache(db_file)
+            snapshots.forget(snapshot_file)
+            shutil.rmtree(workdir, ignore_errors=True)
+        print()
+
+    if save_baseline:
+        save_baselines(results)
+        print(f"Saved as the baseline in {BASELINES_FILE}")
+    elif regressions:
+        print(f"{len(regressions)} stage(s) more than {REGRESSION_THRESHOLD:.0%} slower or bigger than the baseline:")
+        for key in regressions:
+            print(f"  {key}")
+    return regressions
+
+def import_times(code):
+    """Run code in a fresh interpreter; returns its wall time and the import times (ms) of its modules"""
+
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    elapsed = time.perf_counter() - started
+
+    # Lines look like "import time:       561 |       5981 |   jobs", nesting shown by indentation
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if not own.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), depth, int(cumulative) / 1000))
+    return elapsed, modules
+
+def bench_startup(runs=STARTUP_RUNS):
+    """Cold start of the bot, with an import-time breakdown"""
+
+    print("===== STARTUP BENCHMARK =====\n")
+
+    code = "import food_recommendation_bot as bot"
+    ready = code + "; bot.create_bot('123456:stub-token')"
+    first_use = ready + "".join(f"; import {name}" for name in LAZY_MODULES)
+
+    import_runs = [import_times(code) for _ in range(runs)]
+    ready_runs = [import_times(ready) for _ in range(runs)]
+    baseline = statistics.median(import_times("pass")[0] for _ in range(runs))
+
+    def median_ms(runs, name):
+        return statistics.median(
+            next((ms for module, depth, ms in modules if module == name and depth == 0), 0.0)
+            for elapsed, modules in runs
+        )
+
+    print(f"Interpreter start:                 {baseline * 1000:7.1f} ms")
+    print(f"Import food_recommendation_bot:    {statistics.median(e for e, _ in import_runs) * 1000:7.1f} ms"
+          f" (module itself {median_ms(import_runs, 'food_recommendation_bot'):.1f} ms)")
+    print(f"... and create the Telegram client: {statistics.median(e for e, _ in ready_runs) * 1000:7.1f} ms")
+
+    # Top-level imports of the ready bot, slowest first
+    elapsed, modules = ready_runs[-1]
+    print("\nSlowest imports until the bot is ready (cumulative):")
+    top = sorted(((ms, name) for name, depth, ms in modules if depth <= 1), reverse=True)[:10]
+    for ms, name in top:
+        print(f"  {name:<40} {ms:7.1f} ms")
+
+    # What each lazily imported subsystem costs the first request that needs it
+    first_use_runs = [import_times(first_use) for _ in range(runs)]
+    print("\nFirst use of lazily imported subsystems:")
+    for name in LAZY_MODULES:
+        print(f"  {name:<40} {median_ms(first_use_runs, name):7.1f} ms")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ['startup']:
+        bench_startup()
+    else:
+        # python benchmark.py [pipeline] [sizes...] [--save-baseline]
+        args = args[1:] if args[:1] == ['pipeline'] else args
+        sizes = [int(arg) for arg in args if not arg.startswith('--')] or PIPELINE_SIZES
+        if bench_pipeline(sizes, save_baseline='--save-baseline' in args):
+            sys.exit(1)
@@ -0,0 +1,20 @@
+import threading
+
+_loaded = False
+_lock = threading.Lock()
+
+def load():
+    """Read the .env file into the environment, once per process.
+
+    Every module calls this before reading its settings; only the first call
+    touches the file. Variables already set in the environment win.
+    """
+
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if not _loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _loaded = True
@@ -0,0 +1,128 @@
+import json
+import hashlib
+import logging
+import threading
+from collections import deque
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Keyword table mapping each food type to the words that mark it
+FOOD_TYPES_FILE = "food_types.json"
+
+# Used when food_types.json can't be found
+DEFAULT_FOOD_TYPES = {
+    'burger': ['Burger', 'King', 'Secret'],
+    'pizza': ['Pizza'],
+    'sandwich': ['Sandwich', 'Tost'],
+    'tacos': ['Tacos'],
+    'chicken': ['Chicken', 'Tavuk'],
+    'coffee': ['Latte', 'Caffe']
+}
+
+# How many distinct item names to remember classifications for
+CLASSIFY_CACHE_SIZE = 65536
+
+# Dotted and dotless I are folded together, so "SANDWİCH", "SANDWICH"
+# and "sandwich" all match the keyword "Sandwich"
+_TURKISH_I = str.maketrans({'İ': 'i', 'I': 'i', 'ı': 'i'})
+
+def turkish_fold(text):
+    """Case-fold text for matching, treating Turkish I/İ/ı as the same letter"""
+
+    return text.translate(_TURKISH_I).casefold()
+
+def load_food_types(path=FOOD_TYPES_FILE):
+    """Load the keyword table, falling back to the built-in one"""
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logger.warning("%s not found. Using default food types.", path)
+        return dict(DEFAULT_FOOD_TYPES)
+
+class FoodClassifier:
+    """Finds every food type mentioned in an item name in a single pass.
+
+    All keywords are compiled into one Aho-Corasick automaton over
+    Turkish-folded text, and results are memoized per distinct item name.
+    """
+
+    def __init__(self, food_types):
+        self.food_types = list(food_types)
+
+        # Fingerprint of the table, so stored results can tell when it changed
+        table = json.dumps(food_types, sort_keys=True, ensure_ascii=False)
+        self.fingerprint = hashlib.sha1(table.encode('utf-8')).hexdigest()[:12]
+
+        self._build(food_types)
+        self.classify = lru_cache(maxsize=CLASSIFY_CACHE_SIZE)(self._classify)
+
+    def _build(self, food_types):
+        # Trie of all keywords; each node records which types end there
+        self._goto = [{}]
+        self._outputs = [frozenset()]
+        for type_index, keywords in enumerate(food_types.values()):
+            for keyword in keywords:
+                node = 0
+                for char in turkish_fold(keyword):
+                    if char not in self._goto[node]:
+                        self._goto.append({})
+                        self._outputs.append(frozenset())
+                        self._goto[node][char] = len(self._goto) - 1
+                    node = self._goto[node][char]
+                self._outputs[node] = self._outputs[node] | {type_index}
+
+        # Failure links (breadth first), merging outputs of keywords that end inside longer ones
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._outputs[child] = self._outputs[child] | self._outputs[self._fail[child]]
+                queue.append(child)
+
+    def _classify(self, item):
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+
+        node = 0
+        found = set()
+        for char in turkish_fold(item):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if outputs[node]:
+                found |= outputs[node]
+
+        # Types come back in table order
+        return tuple(self.food_types[index] for index in sorted(found))
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+def get_classifier():
+    """The shared classifier built from food_types.json"""
+
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = FoodClassifier(load_food_types())
+    return _classifier
+
+def get_food_types():
+    """Names of all food types, in table order"""
+
+    return get_classifier().food_types
+
+def classify_food_types(item):
+    """Return the food types whose keywords appear in an item name"""
+
+    return get_classifier().classify(item)
@@ -1,49 +1,45 @@
-import csv
 import os
+import sys
 import requests
 import json
-from dotenv import load_dotenv
+import logging
+
+import config
+import http_client
+import log_config
+import order_store
+import prompt_builder
+import response_cache
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
-load_dotenv()
+config.load()
 
-def read_order_history(csv_file):
-    """Read the order history from CSV file"""
-    
-    if not os.path.exists(csv_file):
-        print(f"Error: {csv_file} not found. Please run parse_orders.py first.")
-        return None
-    
-    orders = []
-    with open(csv_file, 'r', encoding='utf-8') as f:
-        csv_reader = csv.DictReader(f)
-        for row in csv_reader:
-            orders.append(row)
-    
-    print(f"Loaded {len(orders)} orders from {csv_file}")
-    return orders
+# Claude API settings; all of them are part of the response cache key
+CLAUDE_API_URL = os.getenv("CLAUDE_API_URL", "https://api.anthropic.com/v1/messages")
+CLAUDE_MODEL = "claude-3-opus-20240229"
+CLAUDE_MAX_TOKENS = 1000
 
-def get_food_recommendation(orders):
-    """Get food recommendation from Claude AI based on order history"""
-    
-    # Use Claude API key from environment variable
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    
-    if not api_key:
-        print("Error: ANTHROPIC_API_KEY not found in .env file.")
-        print("Please create a .env file with your Anthropic API key like:")
-        print("ANTHROPIC_API_KEY=your_api_key_here")
-        return None
-    
-    # Prepare the API request data
-    api_url = "https://api.anthropic.com/v1/messages"
+# A whole (non-streamed) answer can take a while to generate
+CLAUDE_TIMEOUT = (http_client.CONNECT_TIMEOUT, 120)
+
+# Raised when a streamed answer fails, possibly after part of it was yielded
+class RecommendationError(Exception):
+    pass
+
+# Shared, cached loader for the order history (see order_store.load_order_history)
+read_order_history = order_store.load_order_history
+
+def build_request(orders):
+    """The prompt for Claude and the response cache key it maps to"""
     
     # Load the prompt template
     try:
         with open('claude_prompt_template.txt', 'r', encoding='utf-8') as f:
             prompt_template = f.read()
     except FileNotFoundError:
-        print("Warning: claude_prompt_template.txt not found. Using default prompt.")
+        logger.warning("claude_prompt_template.txt not found. Using default prompt.")
         prompt_template = """Here's my food order history:
 
 {order_history}
@@ -56,16 +52,33 @@ Based on my order history, can you suggest:
 
 Please be specific in your recommendations and explain your reasoning."""
     
-    # Format the order history for Claude
-    order_history_text = ""
-    for order in orders[:20]:  # Limit to the 20 most recent orders
-        order_history_text += f"- {order['Item Name']} from {order['Restaurant Name']} ({order['Restaurant Location']}) ordered on {order['Date']} at {order['Time']} for {order['Price (TL)']} TL\n"
+    # Summarize the whole order history within the token budget
+    instructions, order_history_text = prompt_builder.build_prompt(prompt_template, orders)
     
-    # Create the final prompt by substituting the order history into the template
-    prompt = prompt_template.replace("{order_history}", order_history_text)
+    cache_key = response_cache.make_key(
+        CLAUDE_MODEL, prompt_template, order_history_text, CLAUDE_MAX_TOKENS, prompt_builder.PROMPT_TOKEN_BUDGET
+    )
     
     # Log what prompt is being used (for debugging)
-    print(f"Using Claude prompt with {len(orders[:20])} orders")
+    logger.info("Using Claude prompt summarizing %d orders in about %d tokens",
+                len(orders), prompt_builder.estimate_tokens(order_history_text))
+    log_config.save_debug_artifact('claude_prompt.txt', instructions + "\n\n" + order_history_text)
+    
+    return (instructions, order_history_text), cache_key
+
+def get_api_key():
+    # Use Claude API key from environment variable
+    api_key = os.getenv("ANTHROPIC_API_KEY")
+    
+    if not api_key:
+        logger.error(
+            "ANTHROPIC_API_KEY not found in .env file. Please create a .env file with your "
+            "Anthropic API key like:\nANTHROPIC_API_KEY=your_api_key_here"
+        )
+    return api_key
+
+def get_request_data(api_key, prompt, stream=False):
+    instructions, order_history_text = prompt
     
     headers = {
         "x-api-key": api_key,
@@ -74,44 +87,156 @@ Please be specific in your recommendations and explain your reasoning."""
     }
     
     data = {
-        "model": "claude-3-opus-20240229",
-        "max_tokens": 1000,
+        "model": CLAUDE_MODEL,
+        "max_tokens": CLAUDE_MAX_TOKENS,
         "messages": [
             {
                 "role": "user",
-                "content": prompt
+                "content": [
+                    # No cache_control: the instructions are a few hundred tokens, below the
+                    # 1024-token minimum prefix Anthropic's prompt caching accepts
+                    {"type": "text", "text": instructions},
+                    {"type": "text", "text": order_history_text}
+                ]
             }
         ]
     }
+    if stream:
+        data["stream"] = True
+    
+    return headers, data
+
+def report_api_error(e):
+    logger.error("Error calling Claude API: %s", e)
+    if hasattr(e, 'response') and e.response is not None:
+        logger.error("Response status code: %s", e.response.status_code)
+        log_config.save_debug_artifact('claude_error_response.txt', e.response.text)
+
+def get_food_recommendation(orders, refresh=False, cache_file=response_cache.CLAUDE_CACHE_DB):
+    """Get food recommendation from Claude AI based on order history.
+    
+    The same model, template, order history and token limit give the cached
+    answer instantly; refresh=True always asks Claude again.
+    """
     
-    print("Sending request to Claude AI...")
+    prompt, cache_key = build_request(orders)
+    if not refresh:
+        cached = response_cache.get(cache_key, cache_file)
+        if cached is not None:
+            logger.info("Using cached Claude recommendation (nothing changed since the last one)")
+            return cached
+    
+    api_key = get_api_key()
+    if not api_key:
+        return None
+    
+    headers, data = get_request_data(api_key, prompt)
+    
+    logger.info("Sending request to Claude AI...")
     
     try:
-        response = requests.post(api_url, headers=headers, json=data)
+        response = http_client.post(CLAUDE_API_URL, headers=headers, json=data, timeout=CLAUDE_TIMEOUT)
         response.raise_for_status()  # Raise exception for HTTP errors
         
         result = response.json()
         recommendation = result["content"][0]["text"]
         
+        response_cache.put(cache_key, recommendation, cache_file)
         return recommendation
     
     except requests.exceptions.RequestException as e:
-        print(f"Error calling Claude API: {e}")
-        if hasattr(e, 'response') and e.response:
-            print(f"Response status code: {e.response.status_code}")
-            print(f"Response body: {e.response.text}")
+        report_api_error(e)
         return None
 
-def main():
-    csv_file = "orders_summary.csv"
+def iter_sse_events(lines):
+    """Parse server-sent events into (event, data) pairs, data decoded from JSON"""
+    
+    event = None
+    data_lines = []
+    for line in lines:
+        if line:
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "event":
+                event = value
+            elif field == "data":
+                data_lines.append(value)
+            continue
+        
+        # A blank line ends the event
+        if data_lines:
+            yield event, json.loads("\n".join(data_lines))
+        event = None
+        data_lines = []
+    
+    if data_lines:
+        yield event, json.loads("\n".join(data_lines))
+
+def stream_food_recommendation(orders, refresh=False, cache_file=response_cache.CLAUDE_CACHE_DB):
+    """Like get_food_recommendation, but yields the text piece by piece as Claude writes it.
+    
+    A cached answer is yielded in one piece. If the call fails, before or
+    after part of the answer was yielded, RecommendationError is raised.
+    Nothing is yielded without an API key.
+    """
+    
+    prompt, cache_key = build_request(orders)
+    if not refresh:
+        cached = response_cache.get(cache_key, cache_file)
+        if cached is not None:
+            logger.info("Using cached Claude recommendation (nothing changed since the last one)")
+            yield cached
+            return
+    
+    api_key = get_api_key()
+    if not api_key:
+        return
+    
+    headers, data = get_request_data(api_key, prompt, stream=True)
+    
+    logger.info("Streaming response from Claude AI...")
     
-    # Read order history from CSV
-    orders = read_order_history(csv_file)
+    parts = []
+    complete = False
+    try:
+        with http_client.post(CLAUDE_API_URL, headers=headers, json=data, stream=True) as response:
+            response.raise_for_status()
+            
+            # Event streams are UTF-8 even when the header doesn't say so
+            response.encoding = "utf-8"
+            for event, payload in iter_sse_events(response.iter_lines(decode_unicode=True)):
+                if event == "content_block_delta" and payload.get("delta", {}).get("type") == "text_delta":
+                    parts.append(payload["delta"]["text"])
+                    yield payload["delta"]["text"]
+                elif event == "error":
+                    logger.error("Error from Claude API: %s", payload.get('error'))
+                    raise RecommendationError(f"Claude API error: {payload.get('error')}")
+                elif event == "message_stop":
+                    complete = True
+                    break
+    
+    except requests.exceptions.RequestException as e:
+        report_api_error(e)
+        raise RecommendationError(f"Claude API call failed: {e}") from e
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        # An event we couldn't read (bad JSON or an unexpected shape)
+        logger.error("Unreadable event in the Claude stream: %s", e)
+        raise RecommendationError(f"Unreadable Claude stream: {e}") from e
+    
+    if not complete:
+        raise RecommendationError("Claude stream ended before the answer was complete")
+    
+    # Only complete answers are cached
+    response_cache.put(cache_key, "".join(parts), cache_file)
+
+def main():
+    # Read order history from the order store
+    orders = read_order_history()
     if not orders:
         return
     
-    # Get food recommendation from Claude AI
-    recommendation = get_food_recommendation(orders)
+    # Get food recommendation from Claude AI (--refresh skips the cache)
+    recommendation = get_food_recommendation(orders, refresh="--refresh" in sys.argv)
     
     if recommendation:
         print("\n===== CLAUDE'S FOOD RECOMMENDATIONS =====\n")
@@ -123,8 +248,8 @@ def main():
         
         print("\nRecommendation saved to food_recommendation.txt")
     else:
-        print("Failed to get recommendation from Claude AI.")
-        print("Check your API key and internet connection.")
+        logger.error("Failed to get recommendation from Claude AI. Check your API key and internet connection.")
 
 if __name__ == "__main__":
+    log_config.setup_logging(log_config.CLI_FORMAT)
     main() 
\ No newline at end of file
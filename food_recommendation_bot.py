@@ -1,45 +1,150 @@
+import time
+
+# Start of the startup time reported once the bot is ready
+_started = time.perf_counter()
+
 import os
+import sys
+import asyncio
+import contextlib
+import contextvars
+import functools
 import logging
-import telebot
-from telebot import types
-from dotenv import load_dotenv
-import csv
-from collections import Counter
-import datetime
-import random
-import subprocess
-
-# Import functions from our existing scripts
-import parse_orders
-import food_recommendation_simple
-import food_recommendation  # Import the Claude AI version
-import login_flow  # Import login flow script for fetching data
+from concurrent.futures import ThreadPoolExecutor
+
+import config  # .env settings, read once per process
+import tenants  # Per-chat data partitions
+import jobs  # Background jobs (order data updates)
+import log_config  # Logging setup and debug mode
+
+# The Telegram client, order store, TGO and Claude clients and analysis code are
+# imported by the handlers that use them, so importing this module (in tests,
+# workers or a restarting bot) stays fast and has no side effects
 
 # Load environment variables
-load_dotenv()
+config.load()
 
-# Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 # Get API key from environment variables
 TELEGRAM_API_KEY = os.getenv("TELEGRAM_API_KEY")
 
-if not TELEGRAM_API_KEY:
-    logger.error("No TELEGRAM_API_KEY found in .env file")
-    print("Error: TELEGRAM_API_KEY not found in .env file.")
-    print("Please create a .env file with your Telegram Bot API key like:")
-    print("TELEGRAM_API_KEY=your_bot_token_here")
-    exit(1)
+# Created by create_bot() once the API key is known
+bot = None
+
+# Everything the bot sends goes through here, within Telegram's rate limits
+outbox = None
+
+# How many updates are handled at once, over all chats and within one chat
+MAX_CONCURRENT_HANDLERS = int(os.getenv("BOT_MAX_CONCURRENCY", "32"))
+MAX_HANDLERS_PER_CHAT = int(os.getenv("BOT_PER_CHAT_CONCURRENCY", "2"))
 
-# Initialize the bot
-bot = telebot.TeleBot(TELEGRAM_API_KEY)
+# How many Claude answers stream at once; they don't count against the handlers above
+MAX_CONCURRENT_STREAMS = int(os.getenv("BOT_MAX_STREAMS", "8"))
+
+# Threads for blocking network calls (TGO, Claude) and for analysis work
+IO_WORKERS = int(os.getenv("BOT_IO_WORKERS", "16"))
+CPU_WORKERS = int(os.getenv("BOT_CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="bot-io")
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="bot-cpu")
+
+# Created lazily so they belong to the running event loop
+_global_slots = None
+_chat_slots = {}
+_stream_slots = None
+
+# Set while a handler holds one of the global slots
+_holding_global_slot = contextvars.ContextVar("holding_global_slot", default=False)
+
+async def run_blocking(func, *args):
+    """Run a blocking network call without stalling the event loop"""
+    
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(func, *args))
+
+async def run_cpu(func, *args):
+    """Run analysis work off the event loop"""
+    
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, functools.partial(func, *args))
+
+# Order data updates run here, one at a time per chat. Created by run_bot(),
+# as opening it creates data/jobs.db
+job_queue = None
+
+async def stream_blocking(func, *args):
+    """Run a blocking generator in the network pool, yielding its items here as they come"""
+    
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+    
+    def produce():
+        try:
+            for item in func(*args):
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+    
+    future = loop.run_in_executor(io_executor, produce)
+    while (item := await queue.get()) is not done:
+        yield item
+    
+    # Raises whatever stopped the generator
+    await future
+
+def limited(handler):
+    """Cap how many handlers run at once, globally and per chat"""
+    
+    @functools.wraps(handler)
+    async def wrapper(message):
+        global _global_slots
+        if _global_slots is None:
+            _global_slots = asyncio.Semaphore(MAX_CONCURRENT_HANDLERS)
+        chat_slots = _chat_slots.get(message.chat.id)
+        if chat_slots is None:
+            chat_slots = _chat_slots.setdefault(message.chat.id, asyncio.Semaphore(MAX_HANDLERS_PER_CHAT))
+        
+        # A busy chat waits for its own slots without holding a global one
+        async with chat_slots:
+            async with _global_slots:
+                token = _holding_global_slot.set(True)
+                try:
+                    return await handler(message)
+                finally:
+                    _holding_global_slot.reset(token)
+    
+    return wrapper
+
+@contextlib.asynccontextmanager
+async def streaming_slot():
+    """Swap the handler's global slot for a streaming one while a long answer streams.
+    
+    A few slow Claude streams would otherwise hold the slots that quick
+    handlers (history, /top) need.
+    """
+    
+    global _stream_slots
+    if _stream_slots is None:
+        _stream_slots = asyncio.Semaphore(MAX_CONCURRENT_STREAMS)
+    
+    holding = _holding_global_slot.get()
+    if holding:
+        _global_slots.release()
+    try:
+        async with _stream_slots:
+            yield
+    finally:
+        # limited() gives the global slot back when the handler returns, so it
+        # has to be taken again, even if the handler is being cancelled
+        if holding:
+            await asyncio.shield(_global_slots.acquire())
 
 # Helper function to create the main menu
 def create_main_menu():
+    from telebot import types
+    
     markup = types.ReplyKeyboardMarkup(row_width=2, resize_keyboard=True)
     btn1 = types.KeyboardButton('📋 View Order History')
     btn2 = types.KeyboardButton('🔮 Get Food Recommendation')
@@ -51,127 +156,226 @@ def create_main_menu():
     return markup
 
 # Start command handler
-@bot.message_handler(commands=['start', 'help'])
-def send_welcome(message):
+@limited
+async def send_welcome(message):
     welcome_text = (
         "👋 *Welcome to Food Recommendation Bot!*\n\n"
         "I can help you analyze your food ordering history from TGO Yemek and provide personalized recommendations.\n\n"
+        "To get started, send your TGO Yemek login with /login email password, then tap '🔄 Update Order Data'.\n\n"
         "What would you like to do?"
     )
-    bot.send_message(
+    await outbox.send_message(
         message.chat.id, 
         welcome_text, 
         parse_mode="Markdown",
         reply_markup=create_main_menu()
     )
 
+# Store the chat's own TGO Yemek credentials
+@limited
+async def set_login(message):
+    import login_flow
+    
+    # The password is everything after the email, spaces included
+    parts = message.text.split(maxsplit=2)
+    
+    # Don't leave the password sitting in the chat
+    try:
+        await outbox.delete_message(message.chat.id, message.message_id)
+    except Exception as e:
+        logger.warning("Could not delete login message: %s", e)
+    
+    if len(parts) != 3:
+        await outbox.send_message(
+            message.chat.id,
+            "Usage: /login your_email@example.com your_password"
+        )
+        return
+    
+    tenant = tenants.get_tenant(message.chat.id)
+    tenant.set_credentials(parts[1], parts[2])
+    
+    # A cached login may belong to the previous account
+    login_flow.clear_auth_cache(tenant.auth_cache_file)
+    
+    await outbox.send_message(
+        message.chat.id,
+        "✅ Your TGO Yemek login has been saved. Use '🔄 Update Order Data' to fetch your orders.",
+        reply_markup=create_main_menu()
+    )
+
+# Forget the chat's TGO Yemek credentials
+@limited
+async def clear_login(message):
+    tenants.get_tenant(message.chat.id).clear_credentials()
+    await outbox.send_message(message.chat.id, "✅ Your TGO Yemek login has been removed.")
+
+# Show the state of the chat's latest update
+@limited
+async def show_update_status(message):
+    job = job_queue.latest_job(f"update:{message.chat.id}")
+    if not job:
+        await outbox.send_message(message.chat.id, "No order data update has been started yet.")
+        return
+    await outbox.send_message(message.chat.id, f"Last update (job {job.job_id}, {job.state}):\n\n{format_job_status(job)}")
+
+# Ask Claude again even if a cached recommendation is available
+@limited
+async def refresh_claude_ai_recommendation(message):
+    await send_claude_ai_recommendation(message, refresh=True)
+
 # Handle button clicks and messages
-@bot.message_handler(func=lambda message: True)
-def handle_message(message):
+@limited
+async def handle_message(message):
     if message.text == '📋 View Order History':
-        show_order_history(message)
+        await show_order_history(message)
     elif message.text == '🔮 Get Food Recommendation':
-        send_food_recommendation(message)
+        await send_food_recommendation(message)
     elif message.text == '🔄 Update Order Data':
-        update_order_data(message)
+        await update_order_data(message)
     elif message.text == '🍔 Top 5 Restaurants':
-        show_top_restaurants(message)
+        await show_top_restaurants(message)
     elif message.text == '🤖 AI Recommendation':
-        send_claude_ai_recommendation(message)
+        await send_claude_ai_recommendation(message)
     elif message.text == 'ℹ️ About':
-        send_about_info(message)
+        await send_about_info(message)
     else:
-        bot.reply_to(
+        await outbox.reply_to(
             message, 
             "I don't understand that command. Please use the menu options.",
             reply_markup=create_main_menu()
         )
 
+def format_order_history(orders):
+    history_text = "📋 *Your Recent Orders:*\n\n"
+    for i, order in enumerate(orders, 1):
+        history_text += (
+            f"{i}. *{order['Item Name']}*\n"
+            f"   🍽️ {order['Restaurant Name']} ({order['Restaurant Location']})\n"
+            f"   📅 {order['Date']} at {order['Time']}\n"
+            f"   💰 {order['Price (TL)']} TL\n"
+            f"   📌 Status: {order['Status']}\n\n"
+        )
+    return history_text
+
 # Function to show order history
-def show_order_history(message):
-    csv_file = "orders_summary.csv"
+async def show_order_history(message):
+    import snapshots
     
-    if not os.path.exists(csv_file):
-        bot.send_message(
+    tenant = tenants.get_tenant(message.chat.id)
+    
+    snapshot = await run_cpu(snapshots.get, tenant.db_file, tenant.snapshot_file)
+    if not snapshot:
+        await outbox.send_message(
             message.chat.id,
             "No order history found. Please update order data first."
         )
         return
     
-    # Read the first 10 orders to show
-    orders = []
-    with open(csv_file, 'r', encoding='utf-8') as f:
-        csv_reader = csv.DictReader(f)
-        for row in csv_reader:
-            orders.append(row)
-            if len(orders) >= 10:
-                break
+    # The 10 most recent orders, kept in the snapshot
+    orders = snapshot['recent_orders']
     
     if not orders:
-        bot.send_message(
+        await outbox.send_message(
             message.chat.id,
             "Your order history is empty."
         )
         return
     
-    # Format the message
-    history_text = "📋 *Your Recent Orders:*\n\n"
-    for i, order in enumerate(orders, 1):
-        history_text += (
-            f"{i}. *{order['Item Name']}*\n"
-            f"   🍽️ {order['Restaurant Name']} ({order['Restaurant Location']})\n"
-            f"   📅 {order['Date']} at {order['Time']}\n"
-            f"   💰 {order['Price (TL)']} TL\n"
-            f"   📌 Status: {order['Status']}\n\n"
-        )
+    history_text = format_order_history(orders)
     
     # Split message if it's too long for Telegram
     if len(history_text) > 4000:
         chunks = [history_text[i:i+4000] for i in range(0, len(history_text), 4000)]
-        for chunk in chunks:
-            bot.send_message(message.chat.id, chunk, parse_mode="Markdown")
+        await outbox.send_messages(message.chat.id, chunks, parse_mode="Markdown")
     else:
-        bot.send_message(message.chat.id, history_text, parse_mode="Markdown")
+        await outbox.send_message(message.chat.id, history_text, parse_mode="Markdown")
+
+def format_discoveries(discoveries, favorite=None, together=(), lookalikes=()):
+    sections = []
+    if discoveries:
+        sections.append("NEW FOR YOU:\nUsers with a taste like yours also order " + ", ".join(
+            item for item, score in discoveries
+        ) + ", which you haven't tried yet.")
+    if together:
+        sections.append(f"GOES WELL WITH {favorite}:\n" + ", ".join(item for item, count in together))
+    if lookalikes:
+        sections.append(f"IF YOU LIKE {favorite}:\n" + ", ".join(item for item, score in lookalikes))
+    return "\n\n".join(sections)
 
 # Function to send food recommendation
-def send_food_recommendation(message):
-    csv_file = "orders_summary.csv"
+async def send_food_recommendation(message):
+    import snapshots
+    import recommender
+    
+    tenant = tenants.get_tenant(message.chat.id)
     
-    if not os.path.exists(csv_file):
-        bot.send_message(
+    snapshot = await run_cpu(snapshots.get, tenant.db_file, tenant.snapshot_file)
+    if not snapshot:
+        await outbox.send_message(
             message.chat.id,
             "No order history found. Please update order data first."
         )
         return
     
-    # Show typing action while generating recommendation
-    bot.send_chat_action(message.chat.id, 'typing')
+    # Prepared when the order data was updated; only the time of day is added here
+    recommendation = snapshots.recommendation(snapshot)
     
-    # Get orders and analysis
-    orders = food_recommendation_simple.read_order_history(csv_file)
-    if not orders:
-        bot.send_message(
-            message.chat.id,
-            "Error reading order history."
-        )
-        return
-    
-    analysis = food_recommendation_simple.analyze_orders(orders)
-    recommendation = food_recommendation_simple.generate_recommendation(analysis)
+    # What users with similar taste order, and what goes with or is like the
+    # favourite item, from the shared recommender
+    favorites = snapshot['analysis']['most_common_items']
+    favorite = favorites[0][0] if favorites else None
+    try:
+        discoveries = await run_cpu(recommender.recommend, message.chat.id)
+        together = await run_cpu(recommender.similar_items, favorite, 3) if favorite else []
+        lookalikes = await run_cpu(recommender.similar_names, favorite, 3) if favorite else []
+    except Exception as e:
+        logger.warning("Recommender failed for chat %s: %s", message.chat.id, e)
+        discoveries, together, lookalikes = [], [], []
+    extra = format_discoveries(discoveries, favorite, together, lookalikes)
+    if extra:
+        recommendation += "\n\n" + extra
     
     # Send recommendation
-    bot.send_message(
+    await outbox.send_message(
         message.chat.id,
         f"🔮 *Food Recommendation Based on Your Order History*\n\n{recommendation}",
         parse_mode="Markdown"
     )
 
+def format_similar_items(item_name, items):
+    similar_text = f"🔎 *Items like {item_name}:*\n\n"
+    for i, (name, score) in enumerate(items, 1):
+        similar_text += f"{i}. {name}\n"
+    return similar_text
+
+# Items named like the given one, over every chat's orders: /similar item name
+@limited
+async def show_similar_items(message):
+    import recommender
+    
+    item_name = message.text.partition(' ')[2].strip()
+    if not item_name:
+        await outbox.send_message(message.chat.id, "Usage: /similar item name, e.g. /similar Adana Kebap")
+        return
+    
+    items = await run_cpu(recommender.similar_names, item_name)
+    if not items:
+        await outbox.send_message(message.chat.id, f"No items like {item_name} found.")
+        return
+    
+    await outbox.send_message(message.chat.id, format_similar_items(item_name, items), parse_mode="Markdown")
+
 # Function to send Claude AI food recommendation
-def send_claude_ai_recommendation(message):
-    csv_file = "orders_summary.csv"
+async def send_claude_ai_recommendation(message, refresh=False):
+    import order_store
+    import food_recommendation  # The Claude AI version
+    from telegram_dispatcher import StreamingMessage
+    
+    tenant = tenants.get_tenant(message.chat.id)
     
-    if not os.path.exists(csv_file):
-        bot.send_message(
+    if not await run_cpu(order_store.has_orders, tenant.db_file):
+        await outbox.send_message(
             message.chat.id,
             "No order history found. Please update order data first."
         )
@@ -179,7 +383,7 @@ def send_claude_ai_recommendation(message):
     
     # Check if Claude API key is available
     if not os.getenv("ANTHROPIC_API_KEY"):
-        bot.send_message(
+        await outbox.send_message(
             message.chat.id,
             "⚠️ Claude AI API key not found in .env file.\n\n"
             "To use AI recommendations, please add your Anthropic API key to the .env file:\n"
@@ -189,66 +393,63 @@ def send_claude_ai_recommendation(message):
         return
     
     # Show typing action to indicate processing
-    bot.send_chat_action(message.chat.id, 'typing')
+    await outbox.send_chat_action(message.chat.id, 'typing')
     
     # Send initial message
-    processing_msg = bot.send_message(
+    processing_msg = await outbox.send_message(
         message.chat.id,
         "🤖 *Asking Claude AI for recommendations...*\n"
         "This might take a moment as we analyze your order patterns.",
         parse_mode="Markdown"
     )
     
-    # Get orders from CSV
-    orders = food_recommendation.read_order_history(csv_file)
+    # Get orders from the order store
+    orders = await run_cpu(food_recommendation.read_order_history, tenant.db_file)
     if not orders:
-        bot.edit_message_text(
+        await outbox.edit_message_text(
             "Error reading order history.",
             message.chat.id,
             processing_msg.message_id
         )
         return
     
-    # Get Claude AI recommendation
-    recommendation = food_recommendation.get_food_recommendation(orders)
+    # Stream Claude AI's recommendation into the message as it is written;
+    # other chats are served while we wait. An unchanged history is answered
+    # from the chat's response cache
+    reply = StreamingMessage(
+        outbox, message.chat.id, processing_msg.message_id,
+        header="🤖 Claude AI Food Recommendation Analysis\n\n"
+    )
+    failed = False
+    try:
+        async with streaming_slot():
+            async for part in stream_blocking(
+                food_recommendation.stream_food_recommendation, orders, refresh, tenant.path("claude_cache.db")
+            ):
+                await reply.append(part)
+    except Exception as e:
+        logger.warning("Claude recommendation failed for chat %s: %s", message.chat.id, e)
+        failed = True
+    recommendation = reply.total
     
-    if recommendation:
-        # Save recommendation to file for future reference
-        with open("claude_recommendation.txt", "w", encoding="utf-8") as f:
-            f.write(recommendation)
-        
-        # Send as a new message (Claude responses can be long)
-        bot.delete_message(message.chat.id, processing_msg.message_id)
+    if recommendation and failed:
+        # Part of the answer is shown already; say it is cut off instead of keeping it
+        await reply.append("\n\n⚠️ The answer was cut off by an error. Send /ai_refresh to try again.")
+        await reply.finish()
+    elif recommendation:
+        await reply.finish()
         
-        # Send with header
-        header = "🤖 *Claude AI Food Recommendation Analysis*\n\n"
-        
-        # Split message if it's too long for Telegram
-        if len(header + recommendation) > 4000:
-            bot.send_message(
-                message.chat.id,
-                header,
-                parse_mode="Markdown"
-            )
-            
-            # Send chunks of the recommendation
-            chunks = [recommendation[i:i+4000] for i in range(0, len(recommendation), 4000)]
-            for chunk in chunks:
-                bot.send_message(message.chat.id, chunk)
-        else:
-            bot.send_message(
-                message.chat.id,
-                header + recommendation,
-                parse_mode="Markdown"
-            )
+        # Save recommendation to the chat's data folder for future reference
+        with open(tenant.path("claude_recommendation.txt"), "w", encoding="utf-8") as f:
+            f.write(recommendation)
         
         # Add a follow-up message
-        bot.send_message(
+        await outbox.send_message(
             message.chat.id,
-            "The full recommendation has also been saved to claude_recommendation.txt"
+            "The full recommendation has also been saved with your order data."
         )
     else:
-        bot.edit_message_text(
+        await outbox.edit_message_text(
             "❌ Failed to get recommendations from Claude AI.\n"
             "Please check your API key or try again later.",
             message.chat.id,
@@ -256,139 +457,192 @@ def send_claude_ai_recommendation(message):
         )
 
 # Function to update order data
-def update_order_data(message):
-    bot.send_message(
-        message.chat.id,
-        "🔄 Starting to update order data..."
-    )
+async def update_order_data(message):
+    tenant = tenants.get_tenant(message.chat.id)
     
-    # Show typing action
-    bot.send_chat_action(message.chat.id, 'typing')
+    try:
+        credentials = tenant.get_credentials()
+    except tenants.CredentialsError as e:
+        await outbox.send_message(message.chat.id, f"🔑 {e}")
+        return
+    if not credentials:
+        await outbox.send_message(
+            message.chat.id,
+            "🔑 I don't have your TGO Yemek login yet.\n\n"
+            "Send it like this (the message is deleted right away):\n"
+            "/login your_email@example.com your_password"
+        )
+        return
     
-    json_file = "orders_data.json"
-    csv_file = "orders_summary.csv"
+    # Only one update per chat at a time; more taps join the running one
+    key = f"update:{tenant.chat_id}"
+    job = job_queue.active_job(key)
+    if job:
+        await outbox.send_message(
+            message.chat.id,
+            f"⏳ Your order data is already being updated (job {job.job_id}), see the status message above."
+        )
+        return
     
-    # Always fetch fresh data from TGO Yemek
-    bot.send_message(
-        message.chat.id,
-        "📥 Fetching fresh data from TGO Yemek..."
+    # The update runs in the background and reports progress by editing this message
+    status_msg = await outbox.send_message(message.chat.id, "🔄 Update queued...")
+    job, created = job_queue.submit(
+        "update_orders", key, {"chat_id": tenant.chat_id},
+        chat_id=message.chat.id, message_id=status_msg.message_id
     )
+    if not created:
+        # Another tap got its job in while the status message was being sent
+        await outbox.edit_message_text(
+            f"⏳ Your order data is already being updated (job {job.job_id}), see the status message above.",
+            message.chat.id, status_msg.message_id
+        )
+        return
+    await show_job_status(job)
+
+async def run_order_update(job, progress):
+    """Background job: log in, fetch new orders and load them into the store"""
+    
+    import login_flow  # Fetching data from TGO Yemek
+    import snapshots  # What the menu buttons show, precomputed
+    import recommender
+    
+    tenant = tenants.get_tenant(job.payload["chat_id"])
+    
+    # Checked again here, the job may have been resumed after a restart
+    credentials = tenant.get_credentials()
+    if not credentials:
+        raise RuntimeError("Your TGO Yemek login is missing. Please send it with /login.")
+    
+    if not tenant.lock.acquire(blocking=False):
+        raise RuntimeError("Your order data is already being updated, please wait a moment.")
     
-    # Try to fetch data using login_flow
     try:
-        bot.send_message(
-            message.chat.id,
-            "🔑 Logging in to TGO Yemek..."
-        )
+        tenant.ensure_directory()
         
-        # Step 1: Get CSRF token
-        csrf_token, cookies, session = login_flow.get_csrf_token()
+        # Fetch new orders from TGO Yemek
+        await progress("📥 Fetching new orders from TGO Yemek...")
         
-        if not csrf_token or not cookies or not session:
-            bot.send_message(
-                message.chat.id,
-                "❌ Failed to get CSRF token from TGO Yemek. Please check your network connection."
+        try:
+            # Log in (the cached login is reused until it expires), fetch only
+            # the orders placed since the last update and store them
+            result = await run_blocking(
+                login_flow.run_with_auth,
+                lambda session, auth_data: login_flow.sync_orders(
+                    session, auth_data, tenant.json_file, tenant.sync_state_file, db_file=tenant.db_file
+                ),
+                tenant.auth_cache_file,
+                credentials
+            )
+        except Exception as e:
+            raise RuntimeError(
+                f"Error fetching data: {str(e)}\n\nPlease check your network connection and your TGO Yemek login (/login)."
             )
-            return
         
-        bot.send_message(
-            message.chat.id,
-            "✅ CSRF token obtained. Attempting login..."
-        )
+        if not result:
+            raise RuntimeError("Login failed. Please check your network connection and your TGO Yemek login (/login).")
         
-        # Step 2: Login with the token
-        login_response, auth_data = login_flow.login(csrf_token, cookies, session)
+        orders_data, added, updated = result
         
-        if not auth_data or 'access_token' not in auth_data:
-            bot.send_message(
-                message.chat.id,
-                "❌ Login failed. Please check your TGO credentials in the .env file."
-            )
-            return
+        if not orders_data:
+            raise RuntimeError("Failed to fetch order data.")
         
-        bot.send_message(
-            message.chat.id,
-            "✅ Login successful. Fetching order data..."
-        )
+        # Nothing new, the order store is still up to date
+        if not added and not updated:
+            return "Your order data is already up to date."
         
-        # Step 3: Fetch orders
-        orders_data = login_flow.fetch_orders(session, auth_data)
+        snapshots.forget(tenant.snapshot_file)
         
-        if not orders_data:
-            bot.send_message(
-                message.chat.id,
-                "❌ Failed to fetch order data."
-            )
-            return
+        # Precompute what the menu buttons show, so taps don't have to
+        await progress("📊 Preparing your recommendations...")
+        await run_cpu(snapshots.refresh, tenant.db_file, tenant.snapshot_file)
         
-        bot.send_message(
-            message.chat.id,
-            f"✅ Successfully fetched fresh order data from TGO Yemek and saved to {json_file}."
-        )
+        # The shared recommender picks up the new orders in the background
+        recommender.refresh()
         
-    except Exception as e:
-        bot.send_message(
-            message.chat.id,
-            f"❌ Error fetching data: {str(e)}\n\nPlease check your network connection and TGO credentials in the .env file."
+        return (
+            f"Order data updated successfully!\n{added} order(s) added, {updated} updated.\n\n"
+            "You can now view your order history and get recommendations."
         )
+    finally:
+        tenant.lock.release()
+
+def format_job_status(job):
+    if job.state == jobs.DONE:
+        return f"✅ {job.result}"
+    if job.state == jobs.FAILED:
+        return f"❌ {job.result}"
+    if job.state == jobs.RUNNING and job.progress:
+        return f"{job.progress}\n\n(job {job.job_id})"
+    return f"🔄 Update queued... (job {job.job_id})"
+
+async def show_job_status(job):
+    """Edit the job's status message to show where it is"""
+    
+    if job.message_id is None:
         return
     
-    # Now process the JSON file to CSV
-    try:
-        # Process the file using our parsing function
-        output_file = parse_orders.parse_orders_to_csv(json_file, csv_file)
-        bot.send_message(
-            message.chat.id,
-            f"✅ Order data updated successfully!\nSaved to: {output_file}\n\nYou can now view your order history and get recommendations."
-        )
-    except Exception as e:
-        bot.send_message(
+    # Quick successive updates are merged into one edit
+    outbox.update_status(job.chat_id, job.message_id, format_job_status(job))
+
+# How /top periods read in the message title
+PERIOD_NAMES = {'all': "", 'today': " Today", 'week': " This Week", 'month': " This Month", 'year': " This Year"}
+
+def format_top_restaurants(restaurants, period='all', totals=None):
+    title = PERIOD_NAMES.get(period, f" of the Last {period} Days")
+    top_text = f"🍔 *Your Top 5 Restaurants{title}:*\n\n"
+    for i, (name, location, count) in enumerate(restaurants, 1):
+        top_text += f"{i}. *{name} ({location})*\n   Ordered {count} time{'s' if count > 1 else ''}\n\n"
+    if totals is not None:
+        count, spend = totals
+        top_text += f"{count} order{'s' if count != 1 else ''}, {spend:,.2f} TL in total\n\n"
+    if period == 'all':
+        top_text += "For a period, send /top week, /top month, /top year or /top 30 (days)"
+    return top_text
+
+# Top restaurants of a period: /top [today|week|month|year|all|days]
+@limited
+async def show_windowed_top_restaurants(message):
+    parts = message.text.split()
+    period = parts[1].lower() if len(parts) > 1 else 'all'
+    
+    if period not in PERIOD_NAMES and not (period.isdigit() and int(period) > 0):
+        await outbox.send_message(
             message.chat.id,
-            f"❌ Error updating order data: {str(e)}"
+            "Usage: /top [today|week|month|year|all], or /top 30 for the last 30 days"
         )
+        return
+    
+    await show_top_restaurants(message, period)
 
 # Function to show top restaurants
-def show_top_restaurants(message):
-    csv_file = "orders_summary.csv"
+async def show_top_restaurants(message, period='all'):
+    import snapshots
     
-    if not os.path.exists(csv_file):
-        bot.send_message(
+    tenant = tenants.get_tenant(message.chat.id)
+    
+    snapshot = await run_cpu(snapshots.get, tenant.db_file, tenant.snapshot_file)
+    if not snapshot:
+        await outbox.send_message(
             message.chat.id,
             "No order history found. Please update order data first."
         )
         return
     
-    # Read order history
-    restaurants = []
-    with open(csv_file, 'r', encoding='utf-8') as f:
-        csv_reader = csv.DictReader(f)
-        for row in csv_reader:
-            restaurant_name = row['Restaurant Name']
-            location = row['Restaurant Location']
-            # Create a unique identifier for the restaurant
-            restaurant_id = f"{restaurant_name} ({location})"
-            restaurants.append(restaurant_id)
-    
-    # Count occurrences of each restaurant
-    counter = Counter(restaurants)
-    top_5 = counter.most_common(5)
+    # The snapshot keeps the all-time ranking and the time index for periods
+    top_5 = snapshots.top_restaurants(snapshot, period, 5)
+    totals = None if period == 'all' else snapshots.order_totals(snapshot, period)
     
     if not top_5:
-        bot.send_message(
+        await outbox.send_message(
             message.chat.id,
-            "No restaurant data found."
+            "No orders in this period." if period != 'all' else "No restaurant data found."
         )
         return
     
-    # Format the message
-    top_text = "🍔 *Your Top 5 Restaurants:*\n\n"
-    for i, (restaurant, count) in enumerate(top_5, 1):
-        top_text += f"{i}. *{restaurant}*\n   Ordered {count} time{'s' if count > 1 else ''}\n\n"
-    
-    bot.send_message(message.chat.id, top_text, parse_mode="Markdown")
+    await outbox.send_message(message.chat.id, format_top_restaurants(top_5, period, totals), parse_mode="Markdown")
 
 # Function to send about information
-def send_about_info(message):
+async def send_about_info(message):
     about_text = (
         "ℹ️ *About Food Recommendation Bot*\n\n"
         "This bot analyzes your food ordering history from TGO Yemek and provides personalized recommendations.\n\n"
@@ -396,24 +650,90 @@ def send_about_info(message):
         "For even more personalized recommendations, try the '🤖 AI Recommendation' option which uses Claude AI to provide deeper insights.\n\n"
         "Created with ❤️ using Python and TeleBot."
     )
-    bot.send_message(message.chat.id, about_text, parse_mode="Markdown")
+    await outbox.send_message(message.chat.id, about_text, parse_mode="Markdown")
+
+def create_bot(token):
+    """Create the Telegram client and register the handlers"""
+    
+    global bot, outbox
+    from telebot.async_telebot import AsyncTeleBot
+    from telegram_dispatcher import TelegramDispatcher
+    
+    bot = AsyncTeleBot(token)
+    outbox = TelegramDispatcher(bot)
+    
+    bot.register_message_handler(send_welcome, commands=['start', 'help'])
+    bot.register_message_handler(set_login, commands=['login'])
+    bot.register_message_handler(clear_login, commands=['logout'])
+    bot.register_message_handler(show_update_status, commands=['status'])
+    bot.register_message_handler(show_windowed_top_restaurants, commands=['top'])
+    bot.register_message_handler(show_similar_items, commands=['similar'])
+    bot.register_message_handler(refresh_claude_ai_recommendation, commands=['ai_refresh'])
+    
+    # Button clicks and everything else; registered last so commands match first
+    bot.register_message_handler(handle_message, func=lambda message: True)
+    return bot
+
+def warm_up_recommender():
+    try:
+        import recommender
+        recommender.refresh()
+    except Exception:
+        logger.exception("Could not start building the recommender")
+
+async def run_bot():
+    global job_queue
+    
+    if not tenants.CREDENTIALS_KEY:
+        logger.warning("BOT_CREDENTIALS_KEY is not set, TGO logins sent with /login are stored in plain text")
+    
+    # Updates left unfinished by the last run continue in the background
+    job_queue = jobs.JobQueue()
+    job_queue.register("update_orders", run_order_update)
+    job_queue.on_progress(show_job_status)
+    await job_queue.start()
+    
+    logger.info("Bot ready after %.3fs", time.perf_counter() - _started)
+    
+    # Start building the shared recommender now (in its own thread), so it's
+    # ready by the first recommendation
+    asyncio.get_running_loop().run_in_executor(cpu_executor, warm_up_recommender)
+    try:
+        await bot.polling(non_stop=True)
+    finally:
+        await job_queue.stop()
 
 # Main function
 def main():
+    # Configure logging (LOG_LEVEL / TGO_DEBUG, see log_config)
+    log_config.setup_logging()
+    
+    if not TELEGRAM_API_KEY:
+        logger.error(
+            "TELEGRAM_API_KEY not found in .env file. Please create a .env file with your "
+            "Telegram Bot API key like:\nTELEGRAM_API_KEY=your_bot_token_here"
+        )
+        sys.exit(1)
+    
     logger.info("Starting bot...")
     print("Starting Food Recommendation Bot...")
     
-    # Check if order data exists, if not prompt to update
-    csv_file = "orders_summary.csv"
-    if not os.path.exists(csv_file):
-        print("Order data not found. You may need to update order data when the bot starts.")
+    create_bot(TELEGRAM_API_KEY)
+    
+    # Every chat keeps its own order data under the tenants directory
+    logger.info("Chat data is stored in %s", tenants.TENANTS_DIR)
+    
+    logger.info("Handling up to %d updates at once, %d per chat", MAX_CONCURRENT_HANDLERS, MAX_HANDLERS_PER_CHAT)
     
-    # Start the bot
+    # Start the bot; handlers for different chats run concurrently
     try:
-        bot.polling(none_stop=True)
+        asyncio.run(run_bot())
     except Exception as e:
-        logger.error(f"Bot polling error: {e}")
+        logger.exception("Bot polling error")
         print(f"Error: {e}")
+    finally:
+        io_executor.shutdown(wait=False)
+        cpu_executor.shutdown(wait=False)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
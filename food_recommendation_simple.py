@@ -1,24 +1,16 @@
-import csv
-import os
 import datetime
+import logging
 import random
 from collections import Counter
 
-def read_order_history(csv_file):
-    """Read the order history from CSV file"""
-    
-    if not os.path.exists(csv_file):
-        print(f"Error: {csv_file} not found. Please run parse_orders.py first.")
-        return None
-    
-    orders = []
-    with open(csv_file, 'r', encoding='utf-8') as f:
-        csv_reader = csv.DictReader(f)
-        for row in csv_reader:
-            orders.append(row)
-    
-    print(f"Loaded {len(orders)} orders from {csv_file}")
-    return orders
+import order_store
+import food_classifier
+import log_config
+
+logger = logging.getLogger(__name__)
+
+# Shared, cached loader for the order history (see order_store.load_order_history)
+read_order_history = order_store.load_order_history
 
 def analyze_orders(orders):
     """Analyze order patterns and preferences"""
@@ -49,21 +41,12 @@ def analyze_orders(orders):
     avg_price = sum(prices) / len(prices) if prices else 0
     
     # Check if user prefers burgers, fast food, etc.
-    food_types = {
-        'burger': ['Burger', 'King', 'Secret'],
-        'pizza': ['Pizza'],
-        'sandwich': ['Sandwich', 'SANDWİCH', 'Tost'],
-        'tacos': ['Tacos'],
-        'chicken': ['Chicken', 'Tavuk'],
-        'coffee': ['Latte', 'Caffe']
-    }
-    
-    type_counts = {food_type: 0 for food_type in food_types}
+    type_counts = {food_type: 0 for food_type in food_classifier.get_food_types()}
     
-    for item in item_names:
-        for food_type, keywords in food_types.items():
-            if any(keyword in item for keyword in keywords):
-                type_counts[food_type] += 1
+    # Each distinct item is classified once, however often it was ordered
+    for item, count in item_counter.items():
+        for food_type in food_classifier.classify_food_types(item):
+            type_counts[food_type] += count
     
     # Sort by count
     preferred_types = sorted(type_counts.items(), key=lambda x: x[1], reverse=True)
@@ -75,61 +58,50 @@ def analyze_orders(orders):
         'preferred_types': preferred_types
     }
 
-def generate_recommendation(analysis):
-    """Generate food recommendations based on analysis"""
-    
-    recommendations = []
+# Food types to try next, for the favourite food type
+NEW_SUGGESTIONS = {
+    'burger': ['Smash Burger', 'Gourmet Burger', 'Vegetarian Burger', 'Lokma Burger'],
+    'pizza': ['Neapolitan Pizza', 'Chicago Deep Dish', 'New York Style Pizza', 'Turkish Pide'],
+    'sandwich': ['Cuban Sandwich', 'Banh Mi', 'Club Sandwich', 'Pastrami Sandwich'],
+    'tacos': ['Birria Tacos', 'Fish Tacos', 'Korean Fusion Tacos', 'Breakfast Tacos'],
+    'chicken': ['Korean Fried Chicken', 'Nashville Hot Chicken', 'Rotisserie Chicken', 'Chicken Tikka'],
+    'coffee': ['Specialty Pour Over', 'Cold Brew', 'Turkish Coffee', 'Flat White']
+}
+
+def prepare_recommendation(analysis):
+    """The parts of the recommendation that only depend on the analysis.
+
+    They can be computed once per order data update and stored;
+    render_recommendation() adds the parts that depend on the current time.
+    """
     
-    # Current time
-    now = datetime.datetime.now()
-    current_hour = now.hour
-    current_day = now.strftime('%A')
+    prepared = {'favorite': None, 'preferred_type': None, 'suggestions': None, 'hour': None,
+                'spending': None, 'preferences': None}
     
     # 1. What to order today
     if analysis['most_common_items']:
         favorite = analysis['most_common_items'][0][0]
-        recommendations.append(f"1. TODAY'S RECOMMENDATION:\n"
-                              f"Based on your ordering history, you might enjoy ordering {favorite} again. "
-                              f"It's your most frequently ordered item.")
+        prepared['favorite'] = (f"1. TODAY'S RECOMMENDATION:\n"
+                                f"Based on your ordering history, you might enjoy ordering {favorite} again. "
+                                f"It's your most frequently ordered item.")
     
     # 2. New restaurant or food type to try
     preferred_type = analysis['preferred_types'][0][0] if analysis['preferred_types'] else None
-    
-    # Suggestions based on preferred type
-    new_suggestions = {
-        'burger': ['Smash Burger', 'Gourmet Burger', 'Vegetarian Burger', 'Lokma Burger'],
-        'pizza': ['Neapolitan Pizza', 'Chicago Deep Dish', 'New York Style Pizza', 'Turkish Pide'],
-        'sandwich': ['Cuban Sandwich', 'Banh Mi', 'Club Sandwich', 'Pastrami Sandwich'],
-        'tacos': ['Birria Tacos', 'Fish Tacos', 'Korean Fusion Tacos', 'Breakfast Tacos'],
-        'chicken': ['Korean Fried Chicken', 'Nashville Hot Chicken', 'Rotisserie Chicken', 'Chicken Tikka'],
-        'coffee': ['Specialty Pour Over', 'Cold Brew', 'Turkish Coffee', 'Flat White']
-    }
-    
-    if preferred_type and preferred_type in new_suggestions:
-        suggestions = new_suggestions[preferred_type]
-        suggestion = random.choice(suggestions)
-        recommendations.append(f"2. NEW RECOMMENDATION:\n"
-                              f"Since you enjoy {preferred_type}, you might like to try {suggestion}. "
-                              f"It's a different take on your preferred food type.")
-    else:
-        recommendations.append("2. NEW RECOMMENDATION:\n"
-                              "You might enjoy trying Turkish cuisine like Iskender Kebab or Manti (Turkish dumplings).")
+    if preferred_type and preferred_type in NEW_SUGGESTIONS:
+        prepared['preferred_type'] = preferred_type
+        prepared['suggestions'] = NEW_SUGGESTIONS[preferred_type]
     
     # 3. Typical ordering time
     if analysis['avg_hour']:
-        hour = int(analysis['avg_hour'])
-        hour_str = f"{hour}:00" if hour < 10 else f"{hour}:00"
-        recommendations.append(f"3. ORDERING PATTERN:\n"
-                              f"You typically order food around {hour_str}. "
-                              f"{'That\'s coming up soon!' if abs(current_hour - hour) <= 2 else 'Plan ahead for your usual mealtime.'}")
+        prepared['hour'] = int(analysis['avg_hour'])
     
     # 4. Patterns and preferences
     min_price, max_price, avg_price = analysis['price_range']
     
     if avg_price > 0:
-        recommendations.append(f"4. SPENDING PATTERNS:\n"
-                              f"Your orders usually range from {min_price:.2f} TL to {max_price:.2f} TL, "
-                              f"with an average of {avg_price:.2f} TL per order.\n")
+        prepared['spending'] = (f"4. SPENDING PATTERNS:\n"
+                                f"Your orders usually range from {min_price:.2f} TL to {max_price:.2f} TL, "
+                                f"with an average of {avg_price:.2f} TL per order.\n")
     
     # Add food type preferences
     type_insights = []
@@ -138,8 +110,45 @@ def generate_recommendation(analysis):
             type_insights.append(f"{food_type} ({count} orders)")
     
     if type_insights:
-        recommendations.append(f"FOOD PREFERENCES:\n"
-                              f"Your favorite food types appear to be: {', '.join(type_insights[:3])}")
+        prepared['preferences'] = (f"FOOD PREFERENCES:\n"
+                                   f"Your favorite food types appear to be: {', '.join(type_insights[:3])}")
+    
+    return prepared
+
+def render_recommendation(prepared, now=None):
+    """Finish a prepared recommendation for the current time"""
+    
+    recommendations = []
+    
+    # Current time
+    now = now or datetime.datetime.now()
+    current_hour = now.hour
+    current_day = now.strftime('%A')
+    
+    if prepared['favorite']:
+        recommendations.append(prepared['favorite'])
+    
+    if prepared['suggestions']:
+        suggestion = random.choice(prepared['suggestions'])
+        recommendations.append(f"2. NEW RECOMMENDATION:\n"
+                              f"Since you enjoy {prepared['preferred_type']}, you might like to try {suggestion}. "
+                              f"It's a different take on your preferred food type.")
+    else:
+        recommendations.append("2. NEW RECOMMENDATION:\n"
+                              "You might enjoy trying Turkish cuisine like Iskender Kebab or Manti (Turkish dumplings).")
+    
+    if prepared['hour'] is not None:
+        hour = prepared['hour']
+        hour_str = f"{hour}:00" if hour < 10 else f"{hour}:00"
+        timing_note = "That's coming up soon!" if abs(current_hour - hour) <= 2 else "Plan ahead for your usual mealtime."
+        recommendations.append(f"3. ORDERING PATTERN:\n"
+                              f"You typically order food around {hour_str}. "
+                              f"{timing_note}")
+    
+    if prepared['spending']:
+        recommendations.append(prepared['spending'])
+    if prepared['preferences']:
+        recommendations.append(prepared['preferences'])
     
     # Day-specific recommendation
     if current_day in ['Saturday', 'Sunday']:
@@ -149,16 +158,18 @@ def generate_recommendation(analysis):
     
     return "\n\n".join(recommendations)
 
-def main():
-    csv_file = "orders_summary.csv"
+def generate_recommendation(analysis):
+    """Generate food recommendations based on analysis"""
     
-    # Read order history from CSV
-    orders = read_order_history(csv_file)
-    if not orders:
+    return render_recommendation(prepare_recommendation(analysis))
+
+def main():
+    # Analyze order patterns, using the stored running aggregates
+    if not order_store.has_orders():
+        logger.error("No orders in %s. Please run order_store.py first.", order_store.ORDERS_DB)
         return
     
-    # Analyze order patterns
-    analysis = analyze_orders(orders)
+    analysis = order_store.get_analysis()
     
     # Generate recommendations
     recommendation = generate_recommendation(analysis)
@@ -174,4 +185,5 @@ def main():
     print("\nRecommendation saved to food_recommendation.txt")
 
 if __name__ == "__main__":
+    log_config.setup_logging(log_config.CLI_FORMAT)
     main() 
\ No newline at end of file
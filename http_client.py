@@ -0,0 +1,215 @@
+import os
+import time
+import random
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+
+config.load()
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for a connection, and for the server between bytes of the answer
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+
+# Keep-alive pools: how many hosts to keep pools for, and connections kept per host
+POOL_HOSTS = 10
+POOL_CONNECTIONS_PER_HOST = 16
+
+# Retries for idempotent calls, with jittered exponential backoff (seconds)
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+# Methods that can safely be sent twice, and answers worth trying again
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Consecutive failures that open an upstream's circuit, and how long it stays open
+BREAKER_FAILURES = 5
+BREAKER_RESET_TIMEOUT = 30.0
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling an upstream that keeps failing"""
+
+class CircuitBreaker:
+    """Stops calls to an upstream after repeated failures.
+
+    After `failures` failures in a row the circuit opens and calls fail
+    immediately. Once `reset_timeout` has passed, a single trial call is let
+    through; its success closes the circuit again, a failure reopens it.
+    """
+
+    def __init__(self, name, failures=BREAKER_FAILURES, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+
+        self.lock = threading.Lock()
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        with self.lock:
+            state = self.state
+            if state == "open" or (state == "half-open" and self.trial_in_flight):
+                raise CircuitOpenError(f"{self.name} is failing, not calling it for now")
+            if state == "half-open":
+                self.trial_in_flight = True
+
+    def record_success(self):
+        with self.lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.trial_in_flight or self.consecutive_failures >= self.failures:
+                if self.opened_at is None:
+                    logger.warning("Opening circuit for %s after %d failures", self.name, self.consecutive_failures)
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+    def release_trial(self):
+        # The trial call ended without telling us anything about the upstream
+        with self.lock:
+            self.trial_in_flight = False
+
+# Connection pools shared by every session, so logins for different users
+# (each with its own cookies) still reuse the same keep-alive connections
+_adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_CONNECTIONS_PER_HOST)
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+_timing_hooks = []
+_shared_session = None
+
+def new_session():
+    """A session with its own cookies on top of the shared connection pools"""
+
+    session = requests.Session()
+    session.mount("https://", _adapter)
+    session.mount("http://", _adapter)
+    return session
+
+def get_session():
+    """The shared session for calls that don't need cookies"""
+
+    global _shared_session
+    if _shared_session is None:
+        with _breakers_lock:
+            if _shared_session is None:
+                _shared_session = new_session()
+    return _shared_session
+
+def get_breaker(url):
+    """The circuit breaker of the upstream (host) a URL belongs to"""
+
+    host = urlsplit(url).netloc
+    breaker = _breakers.get(host)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(host, CircuitBreaker(host))
+    return breaker
+
+def add_timing_hook(hook):
+    """Call hook(upstream, method, url, status, elapsed, attempt, error) after every HTTP call"""
+
+    _timing_hooks.append(hook)
+
+def remove_timing_hook(hook):
+    _timing_hooks.remove(hook)
+
+def _log_timing(upstream, method, url, status, elapsed, attempt, error):
+    logger.debug("%s %s -> %s in %.3fs (attempt %d)", method, url, error or status, elapsed, attempt)
+
+add_timing_hook(_log_timing)
+
+def _backoff_delay(attempt, response):
+    # Full jitter, but never sooner than a Retry-After the server asked for
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)))
+    if response is not None:
+        try:
+            delay = max(delay, float(response.headers.get("Retry-After", 0)))
+        except ValueError:
+            pass
+    return min(delay, BACKOFF_MAX)
+
+def request(method, url, session=None, timeout=None, retry=None, **kwargs):
+    """Send an HTTP request with timeouts, retries and the upstream's circuit breaker.
+
+    Idempotent methods are retried on connection errors, timeouts and
+    429/5xx answers; pass retry=True/False to override. Connection errors,
+    timeouts and 5xx answers count as failures for the circuit breaker.
+    """
+
+    method = method.upper()
+    session = session or get_session()
+    timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    if retry is None:
+        retry = method in IDEMPOTENT_METHODS
+
+    breaker = get_breaker(url)
+    attempt = 0
+    while True:
+        attempt += 1
+        breaker.before_call()
+
+        response = None
+        error = None
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            error = e
+        except Exception:
+            breaker.release_trial()
+            raise
+        elapsed = time.perf_counter() - started
+
+        if error is not None or response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        for hook in list(_timing_hooks):
+            try:
+                hook(breaker.name, method, url, response.status_code if response is not None else None,
+                     elapsed, attempt, error)
+            except Exception:
+                logger.exception("HTTP timing hook failed")
+
+        retryable = error is not None or response.status_code in RETRY_STATUSES
+        if not (retry and retryable and attempt <= MAX_RETRIES):
+            if error is not None:
+                raise error
+            return response
+
+        delay = _backoff_delay(attempt, response)
+        if response is not None:
+            response.close()
+        logger.info("Retrying %s %s in %.2fs (attempt %d failed: %s)",
+                    method, url, delay, attempt, error or response.status_code)
+        time.sleep(delay)
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
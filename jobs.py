@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import secrets
+import sqlite3
+
+import config
+
+config.load()
+logger = logging.getLogger(__name__)
+
+# SQLite database holding every background job, so a restart can pick them up again
+JOBS_DB = os.getenv("BOT_JOBS_DB", os.path.join("data", "jobs.db"))
+
+# How many jobs run at the same time
+JOB_WORKERS = int(os.getenv("BOT_JOB_WORKERS", "4"))
+
+# A job that was interrupted this many times (a crash mid-run, say) isn't resumed again
+JOB_MAX_ATTEMPTS = int(os.getenv("BOT_JOB_MAX_ATTEMPTS", "3"))
+
+# Finished jobs are kept this long (seconds) so their state can still be looked up
+JOB_RETENTION = 7 * 24 * 3600
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    job_key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    progress TEXT NOT NULL DEFAULT '',
+    result TEXT,
+    chat_id INTEGER,
+    message_id INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs (job_key, state);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, created_at);
+"""
+
+JOB_FIELDS = (
+    "job_id", "kind", "job_key", "payload", "state", "progress", "result",
+    "chat_id", "message_id", "attempts", "created_at", "updated_at"
+)
+
+class Job:
+    """One background job and its last known state"""
+
+    def __init__(self, job_id, kind, job_key, payload, state=QUEUED, progress="", result=None,
+                 chat_id=None, message_id=None, attempts=0, created_at=None, updated_at=None):
+        self.job_id = job_id
+        self.kind = kind
+        self.job_key = job_key
+        self.payload = payload
+        self.state = state
+        self.progress = progress
+        self.result = result
+
+        # Where progress is reported: the job's single status message
+        self.chat_id = chat_id
+        self.message_id = message_id
+
+        self.attempts = attempts
+        self.created_at = created_at if created_at is not None else time.time()
+        self.updated_at = updated_at if updated_at is not None else self.created_at
+
+    @property
+    def active(self):
+        return self.state in ACTIVE_STATES
+
+    @classmethod
+    def from_row(cls, row):
+        values = dict(zip(JOB_FIELDS, row))
+        values["payload"] = json.loads(values["payload"])
+        return cls(**values)
+
+class JobQueue:
+    """Background jobs run by a pool of asyncio workers.
+
+    Jobs with the same key are single-flight: submitting while one is queued
+    or running returns the existing job. Every state change is written to
+    SQLite, and jobs that were unfinished when the bot stopped are queued
+    again on start, unless they have already been tried max_attempts times.
+    """
+
+    def __init__(self, db_file=JOBS_DB, workers=JOB_WORKERS, max_attempts=JOB_MAX_ATTEMPTS):
+        self.db_file = db_file
+        self.workers = workers
+        self.max_attempts = max_attempts
+
+        self._handlers = {}
+        self._on_progress = None
+        self._active = {}
+        self._queue = None
+        self._tasks = []
+
+        directory = os.path.dirname(db_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_file)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def register(self, kind, handler):
+        """Set the coroutine run for jobs of a kind: handler(job, progress)"""
+
+        self._handlers[kind] = handler
+
+    def on_progress(self, callback):
+        """Set the coroutine told about every progress update: callback(job)"""
+
+        self._on_progress = callback
+
+    async def start(self):
+        """Start the workers and queue the jobs left over from the last run"""
+
+        self._queue = asyncio.Queue()
+
+        cutoff = time.time() - JOB_RETENTION
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE state NOT IN (?, ?) AND updated_at < ?",
+                ACTIVE_STATES + (cutoff,)
+            )
+
+        for job in self._select("WHERE state IN (?, ?) ORDER BY created_at", ACTIVE_STATES):
+            if job.attempts >= self.max_attempts:
+                # Resuming it again would most likely just take the bot down again
+                logger.warning("Giving up on job %s (%s) after %d attempts", job.job_id, job.kind, job.attempts)
+                job.state = FAILED
+                job.result = f"Stopped after {job.attempts} interrupted attempts. Please try again."
+                self._save(job)
+                await self._notify(job)
+                continue
+
+            logger.info("Resuming job %s (%s, was %s)", job.job_id, job.kind, job.state)
+            job.state = QUEUED
+            self._save(job)
+            self._active[job.job_key] = job
+            self._queue.put_nowait(job)
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, kind, key, payload, chat_id=None, message_id=None):
+        """Queue a job, or return the one already in flight for the key.
+
+        Returns (job, created).
+        """
+
+        job = self._active.get(key)
+        if job is not None:
+            return job, False
+
+        job = Job(secrets.token_hex(4), kind, key, payload, chat_id=chat_id, message_id=message_id)
+        self._save(job)
+        self._active[key] = job
+        self._queue.put_nowait(job)
+        return job, True
+
+    def get(self, job_id):
+        jobs = self._select("WHERE job_id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    def active_job(self, key):
+        """The queued or running job for a key, if any"""
+
+        return self._active.get(key)
+
+    def latest_job(self, key):
+        """The most recent job for a key, finished or not"""
+
+        jobs = self._select("WHERE job_key = ? ORDER BY created_at DESC LIMIT 1", (key,))
+        return jobs[0] if jobs else None
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job):
+        handler = self._handlers.get(job.kind)
+        job.state = RUNNING
+        job.attempts += 1
+        self._save(job)
+
+        async def progress(text):
+            job.progress = text
+            self._save(job)
+            await self._notify(job)
+
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for job kind {job.kind!r}")
+            job.result = await handler(job, progress)
+            job.state = DONE
+        except asyncio.CancelledError:
+            # Stopped with the bot; it stays queued in the database for the next start
+            job.state = QUEUED
+            self._save(job)
+            raise
+        except Exception as e:
+            logger.exception("Job %s failed", job.job_id)
+            job.state = FAILED
+            job.result = str(e)
+        finally:
+            if job.state != QUEUED:
+                self._active.pop(job.job_key, None)
+
+        self._save(job)
+        await self._notify(job)
+
+    async def _notify(self, job):
+        if self._on_progress is None:
+            return
+        try:
+            await self._on_progress(job)
+        except Exception as e:
+            logger.warning("Could not report progress of job %s: %s", job.job_id, e)
+
+    def _save(self, job):
+        job.updated_at = time.time()
+        values = (
+            job.job_id, job.kind, job.job_key, json.dumps(job.payload), job.state, job.progress,
+            job.result, job.chat_id, job.message_id, job.attempts, job.created_at, job.updated_at
+        )
+        with self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(JOB_FIELDS)}) "
+                f"VALUES ({', '.join('?' for _ in JOB_FIELDS)})",
+                values
+            )
+
+    def _select(self, where, params=()):
+        rows = self._conn.execute(f"SELECT {', '.join(JOB_FIELDS)} FROM jobs {where}", params).fetchall()
+        return [Job.from_row(row) for row in rows]
@@ -0,0 +1,50 @@
+import os
+import json
+import logging
+
+import config
+
+# Debug settings may come from the .env file
+config.load()
+
+logger = logging.getLogger(__name__)
+
+# Debug mode: debug-level logs plus debug artifacts (login page HTML, full API payloads)
+DEBUG_MODE = os.getenv("TGO_DEBUG", "").lower() in ("1", "true", "yes")
+
+# Where debug artifacts are written
+DEBUG_DIR = os.getenv("TGO_DEBUG_DIR", "debug")
+
+# Log level when not in debug mode
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Plain messages for the command line scripts
+CLI_FORMAT = '%(message)s'
+
+def setup_logging(fmt=LOG_FORMAT):
+    """Configure the root logger once, at the level chosen by the environment"""
+
+    logging.basicConfig(format=fmt, level=logging.DEBUG if DEBUG_MODE else LOG_LEVEL)
+
+def save_debug_artifact(name, content):
+    """Write content (text, or data as JSON) to the debug directory, only in debug mode.
+
+    Outside debug mode nothing is serialized or written, so callers can pass
+    large payloads freely. Returns the file path, or None.
+    """
+
+    if not DEBUG_MODE:
+        return None
+
+    if not isinstance(content, str):
+        content = json.dumps(content, indent=2, ensure_ascii=False)
+
+    os.makedirs(DEBUG_DIR, exist_ok=True)
+    path = os.path.join(DEBUG_DIR, name)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+    logger.debug("Saved debug artifact %s", path)
+    return path
@@ -1,16 +1,52 @@
-import requests
 import re
 import json
 import time
 import os
-from dotenv import load_dotenv
+import sys
+import math
+import base64
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from parse_orders import get_order_key
+import config
+import http_client
+import log_config
+import order_store
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
-load_dotenv()
+config.load()
+
+# Orders API endpoint (can be pointed at a local stub server for offline runs)
+ORDERS_API_URL = os.getenv("TGO_ORDERS_API_URL", "https://api.tgoapis.com/web-checkout-apicheckout-santral/orders")
+
+# Paging settings for the orders API
+ORDERS_PAGE_SIZE = 50
+MAX_FETCH_WORKERS = 8
+
+# Cached access token and cookies, reused until they expire
+AUTH_CACHE_FILE = "auth_cache.json"
+
+# Token lifetime to assume when the login response doesn't tell us
+AUTH_DEFAULT_TTL = 3600
+
+# Treat tokens as expired a little early so they don't run out mid-sync
+AUTH_EXPIRY_MARGIN = 60
+
+# Raised when the API rejects our access token (HTTP 401)
+class AuthExpiredError(Exception):
+    pass
+
+# Watermark of the newest orders already stored locally
+SYNC_STATE_FILE = "orders_sync_state.json"
+
+# How many of the newest order keys to remember in the watermark
+SYNC_RECENT_KEYS = 50
 
 # Step 1: Send request to the login page without cookies to get the CSRF token
 def get_csrf_token():
-    print("Step 1: Getting CSRF token from login page...")
+    logger.info("Step 1: Getting CSRF token from login page...")
     
     url = "https://tgoyemek.com/giris"
     
@@ -21,62 +57,65 @@ def get_csrf_token():
         "Referer": "https://tgoyemek.com/"
     }
     
-    # Create a session to maintain cookies
-    session = requests.Session()
+    # Create a session to maintain cookies (connections come from the shared pools)
+    session = http_client.new_session()
     
     # Send request without cookies
-    response = session.get(url, headers=headers)
+    response = http_client.get(url, session=session, headers=headers)
     
-    print(f"Status code: {response.status_code}")
+    logger.debug("Login page status code: %s", response.status_code)
     
     # Check if we received the response with the login form
     if response.status_code == 200:
-        # Save the HTML response for examination
-        with open('login_page.html', 'w', encoding='utf-8') as f:
-            f.write(response.text)
-        
-        print(f"Response saved to login_page.html")
+        # Keep the HTML for examination (debug mode only)
+        log_config.save_debug_artifact('login_page.html', response.text)
         
         # Extract cookies from the response
         cookies = session.cookies.get_dict()
         
-        print(f"Cookies received from login page: {json.dumps(cookies, indent=2)}")
+        # Cookie values are session secrets, only their names are logged
+        logger.debug("Cookies received from login page: %s", list(cookies))
         
         # Get CSRF token from API
-        csrf_response = session.get("https://tgoyemek.com/api/auth/csrf", cookies=cookies)
+        csrf_response = http_client.get("https://tgoyemek.com/api/auth/csrf", session=session, cookies=cookies)
         
         if csrf_response.status_code == 200:
             try:
                 csrf_data = csrf_response.json()
                 csrf_token = csrf_data.get("csrfToken")
-                print(f"CSRF token obtained: {csrf_token}")
+                logger.debug("CSRF token obtained")
                 
                 # Add the CSRF token to cookies
                 cookies["tgo-csrf-token"] = csrf_token
                 
                 return csrf_token, cookies, session
             except Exception as e:
-                print(f"Error parsing CSRF response: {str(e)}")
+                logger.error("Error parsing CSRF response: %s", e)
         else:
-            print(f"Failed to get CSRF token. Status: {csrf_response.status_code}")
+            logger.error("Failed to get CSRF token. Status: %s", csrf_response.status_code)
+    else:
+        logger.error("Failed to load the login page. Status: %s", response.status_code)
     
-    print("Could not obtain necessary tokens")
+    logger.error("Could not obtain necessary tokens")
     return None, None, None
 
 # Step 2: Send login request with the CSRF token
-def login(csrf_token, cookies, session):
-    print("\nStep 2: Attempting login with the CSRF token and cookies...")
+def login(csrf_token, cookies, session, credentials=None):
+    logger.info("Step 2: Attempting login with the CSRF token and cookies...")
     
-    # Get login credentials from environment variables
-    tgo_username = os.getenv("TGO_USERNAME")
-    tgo_password = os.getenv("TGO_PASSWORD")
+    # Use the given (username, password), or the login credentials from environment variables
+    if credentials:
+        tgo_username, tgo_password = credentials
+    else:
+        tgo_username = os.getenv("TGO_USERNAME")
+        tgo_password = os.getenv("TGO_PASSWORD")
     
     # Check if credentials are available
     if not tgo_username or not tgo_password:
-        print("Error: TGO_USERNAME or TGO_PASSWORD not found in .env file.")
-        print("Please add your TGO Yemek credentials to your .env file:")
-        print("TGO_USERNAME=your_email@example.com")
-        print("TGO_PASSWORD=your_password")
+        logger.error(
+            "TGO_USERNAME or TGO_PASSWORD not found in .env file. Please add your TGO Yemek credentials "
+            "to your .env file:\nTGO_USERNAME=your_email@example.com\nTGO_PASSWORD=your_password"
+        )
         return None, None
     
     url = "https://tgoyemek.com/api/auth/login"
@@ -103,71 +142,170 @@ def login(csrf_token, cookies, session):
         "username": tgo_username
     }
     
-    # Log the payload we're using (but mask the password)
-    masked_payload = {
-        "csrfToken": csrf_token,
-        "password": "********",
-        "username": tgo_username
-    }
-    print(f"Login payload: {json.dumps(masked_payload, indent=2)}")
+    # Log who we're logging in as (never the password or the CSRF token)
+    logger.debug("Logging in as %s", tgo_username)
     
     # Send login request with cookies and payload
-    response = session.post(url, headers=headers, json=payload)
+    response = http_client.post(url, session=session, headers=headers, json=payload)
     
-    print(f"Login status code: {response.status_code}")
+    logger.info("Login status code: %s", response.status_code)
     
     # Try to parse the response
     try:
         response_json = response.json()
-        print(f"Login response: {json.dumps(response_json, indent=2)}")
+        
+        # The full response holds the access token, it is only kept in debug mode
+        log_config.save_debug_artifact('login_response.json', response_json)
         
         # Check for specific error messages
         if response.status_code == 403:
             if "errorDetails" in response_json:
                 error_msg = response_json["errorDetails"][0].get("errorMessage", "")
                 if "Beklenmeyen bir hata" in error_msg:
-                    print("Error suggests trying again or refreshing the page")
+                    logger.warning("Login error suggests trying again or refreshing the page: %s", error_msg)
                     
                     # Let's try another API endpoint format
-                    print("\nAttempting alternative login endpoint...")
+                    logger.info("Attempting alternative login endpoint...")
                     alt_url = "https://tgoyemek.com/api/auth/signin"
-                    alt_response = session.post(alt_url, headers=headers, json=payload)
+                    alt_response = http_client.post(alt_url, session=session, headers=headers, json=payload)
                     
-                    print(f"Alternative login status code: {alt_response.status_code}")
+                    logger.info("Alternative login status code: %s", alt_response.status_code)
                     try:
                         alt_json = alt_response.json()
-                        print(f"Alternative login response: {json.dumps(alt_json, indent=2)}")
+                        log_config.save_debug_artifact('login_alternative_response.json', alt_json)
                     except:
-                        print(f"Alternative login response (text): {alt_response.text[:500]}...")
+                        log_config.save_debug_artifact('login_alternative_response.txt', alt_response.text)
     except:
-        print(f"Login response (text): {response.text[:500]}...")
+        logger.warning("Login response is not JSON (status %s)", response.status_code)
+        log_config.save_debug_artifact('login_response.txt', response.text)
     
-    # Save cookies for future use
-    with open('login_cookies.json', 'w', encoding='utf-8') as f:
-        json.dump(session.cookies.get_dict(), f, indent=2)
+    return response, response_json if 'response_json' in locals() else None
+
+# Work out when an access token stops being valid (epoch seconds)
+def get_token_expiry(auth_data):
+    now = time.time()
     
-    print("Login cookies saved to login_cookies.json")
+    # Use the lifetime from the login response if there is one
+    for key in ("expires_in", "expiresIn"):
+        if isinstance(auth_data.get(key), (int, float)):
+            return now + auth_data[key]
+    for key in ("expires_at", "expiresAt"):
+        if isinstance(auth_data.get(key), (int, float)):
+            return auth_data[key]
     
-    return response, response_json if 'response_json' in locals() else None
+    # Otherwise read the exp claim if the token is a JWT
+    parts = auth_data.get('access_token', '').split('.')
+    if len(parts) == 3:
+        try:
+            payload = parts[1] + "=" * (-len(parts[1]) % 4)
+            claims = json.loads(base64.urlsafe_b64decode(payload))
+            if isinstance(claims.get("exp"), (int, float)):
+                return claims["exp"]
+        except (ValueError, TypeError):
+            pass
+    
+    return now + AUTH_DEFAULT_TTL
 
-# Step 3: Fetch orders from the API
-def fetch_orders(session, auth_data):
-    print("\nStep 3: Fetching orders from API...")
+# Save the access token and session cookies so the next run can skip the login
+def save_auth_cache(session, auth_data, cache_file=AUTH_CACHE_FILE):
+    cookies = [
+        {
+            "name": cookie.name,
+            "value": cookie.value,
+            "domain": cookie.domain,
+            "path": cookie.path,
+            "expires": cookie.expires
+        }
+        for cookie in session.cookies
+    ]
     
-    # Check if we have the access token
+    cache = {
+        "auth_data": auth_data,
+        "cookies": cookies,
+        "expires_at": get_token_expiry(auth_data)
+    }
+    
+    # The cache holds a live token, keep it readable by the owner only
+    fd = os.open(cache_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2)
+    
+    logger.info("Login session cached in %s", cache_file)
+
+# Forget the cached login, e.g. after the API rejected the token
+def clear_auth_cache(cache_file=AUTH_CACHE_FILE):
+    if os.path.exists(cache_file):
+        os.remove(cache_file)
+
+# Rebuild a logged in session from the cache, returns (None, None) if there is no valid one
+def load_cached_session(cache_file=AUTH_CACHE_FILE):
+    if not os.path.exists(cache_file):
+        return None, None
+    
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable auth cache %s: %s", cache_file, e)
+        return None, None
+    
+    now = time.time()
+    auth_data = cache.get("auth_data") or {}
+    if 'access_token' not in auth_data or cache.get("expires_at", 0) - AUTH_EXPIRY_MARGIN <= now:
+        logger.info("Cached login has expired")
+        return None, None
+    
+    session = http_client.new_session()
+    for cookie in cache.get("cookies", []):
+        if cookie.get("expires") and cookie["expires"] <= now:
+            continue
+        session.cookies.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie.get("domain", ""),
+            path=cookie.get("path", "/"),
+            expires=cookie.get("expires")
+        )
+    
+    logger.info("Reusing cached login session")
+    return session, auth_data
+
+# Run the full CSRF + login flow and cache the result, returns (None, None) on failure
+def login_fresh(cache_file=AUTH_CACHE_FILE, credentials=None):
+    csrf_token, cookies, session = get_csrf_token()
+    if not csrf_token or not cookies or not session:
+        logger.error("Failed to extract necessary tokens. Cannot proceed with login.")
+        return None, None
+    
+    login_response, auth_data = login(csrf_token, cookies, session, credentials)
     if not auth_data or 'access_token' not in auth_data:
-        print("No access token available. Cannot fetch orders.")
-        return None
+        logger.error("Login failed.")
+        return None, None
     
-    access_token = auth_data['access_token']
+    save_auth_cache(session, auth_data, cache_file)
+    return session, auth_data
+
+# Call action(session, auth_data) with a logged in session, logging in only when needed.
+# credentials is an optional (username, password), by default the ones from .env are used.
+def run_with_auth(action, cache_file=AUTH_CACHE_FILE, credentials=None):
+    # Try the cached session first
+    session, auth_data = load_cached_session(cache_file)
+    if auth_data:
+        try:
+            return action(session, auth_data)
+        except AuthExpiredError:
+            logger.info("Cached login was rejected, logging in again")
+            clear_auth_cache(cache_file)
     
-    url = "https://api.tgoapis.com/web-checkout-apicheckout-santral/orders"
-    params = {
-        "page": 1,
-        "pageSize": 50
-    }
+    session, auth_data = login_fresh(cache_file, credentials)
+    if not auth_data:
+        return None
     
-    headers = {
+    return action(session, auth_data)
+
+# Headers for calls to the orders API
+def get_orders_headers(access_token):
+    return {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36",
         "Accept": "application/json, text/plain, */*",
         "Accept-Language": "en-US,en;q=0.9",
@@ -175,61 +313,242 @@ def fetch_orders(session, auth_data):
         "Referer": "https://tgoyemek.com/",
         "Authorization": f"Bearer {access_token}"
     }
+
+# Work out how many pages the orders API has from the first page's response
+def get_total_pages(orders_data, page_size):
+    # Paging info may sit at the top level or in a nested pagination object
+    candidates = [orders_data]
+    for key in ("pagination", "pageInfo", "paging", "meta"):
+        if isinstance(orders_data.get(key), dict):
+            candidates.append(orders_data[key])
     
-    print(f"Using authorization: Bearer {access_token[:20]}...")
+    for info in candidates:
+        for key in ("totalPageCount", "totalPages", "pageCount"):
+            if isinstance(info.get(key), int):
+                return max(info[key], 1)
+        for key in ("totalCount", "totalElements", "totalOrderCount", "totalItems"):
+            if isinstance(info.get(key), int):
+                return max(math.ceil(info[key] / page_size), 1)
     
-    # Send request to get orders
-    response = session.get(url, headers=headers, params=params)
+    # Unknown - caller has to probe until it sees a short page
+    return None
+
+# Fetch a single page of orders, returns the parsed JSON or None
+def fetch_orders_page(session, headers, page, page_size=ORDERS_PAGE_SIZE, url=ORDERS_API_URL):
+    params = {
+        "page": page,
+        "pageSize": page_size
+    }
     
-    print(f"Orders API status code: {response.status_code}")
+    response = http_client.get(url, session=session, headers=headers, params=params)
     
-    # Handle the response
-    if response.status_code == 200:
-        try:
-            orders_data = response.json()
-            # Save to file
-            with open('orders_data.json', 'w', encoding='utf-8') as f:
-                json.dump(orders_data, f, indent=2, ensure_ascii=False)
-            
-            print("Orders data saved to orders_data.json")
-            
-            # Print in pretty format
-            print("\nOrders Data:")
-            print(json.dumps(orders_data, indent=2, ensure_ascii=False))
-            
-            return orders_data
-        except Exception as e:
-            print(f"Error parsing orders response: {str(e)}")
-            print(f"Response text: {response.text[:500]}...")
+    if response.status_code == 401:
+        raise AuthExpiredError(f"Orders API rejected the access token (page {page})")
+    
+    if response.status_code != 200:
+        logger.error("Failed to fetch orders page %s. Status: %s", page, response.status_code)
+        log_config.save_debug_artifact(f'orders_page_{page}_error.txt', response.text)
+        return None
+    
+    try:
+        return response.json()
+    except Exception as e:
+        logger.error("Error parsing orders page %s: %s", page, e)
+        log_config.save_debug_artifact(f'orders_page_{page}.txt', response.text)
+        return None
+
+# Fetch a list of pages concurrently, results come back in page order
+def fetch_pages_concurrently(session, headers, pages, page_size=ORDERS_PAGE_SIZE, url=ORDERS_API_URL, max_workers=MAX_FETCH_WORKERS):
+    if not pages:
+        return []
+    
+    # The shared pools keep up to http_client.POOL_CONNECTIONS_PER_HOST connections per host
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(pages))) as executor:
+        return list(executor.map(lambda page: fetch_orders_page(session, headers, page, page_size, url), pages))
+
+# Step 3: Fetch orders from the API
+def fetch_orders(session, auth_data, json_file="orders_data.json", url=ORDERS_API_URL, page_size=ORDERS_PAGE_SIZE, max_workers=MAX_FETCH_WORKERS):
+    logger.info("Step 3: Fetching orders from API...")
+    
+    # Check if we have the access token
+    if not auth_data or 'access_token' not in auth_data:
+        logger.error("No access token available. Cannot fetch orders.")
+        return None
+    
+    headers = get_orders_headers(auth_data['access_token'])
+    
+    # The first page tells us how many pages there are in total
+    orders_data = fetch_orders_page(session, headers, 1, page_size, url)
+    if orders_data is None:
+        return None
+    
+    orders = list(orders_data.get('orders', []))
+    total_pages = get_total_pages(orders_data, page_size)
+    
+    if total_pages is not None:
+        # Pull all remaining pages at once
+        logger.info("Orders API reports %d page(s)", total_pages)
+        pages = fetch_pages_concurrently(session, headers, list(range(2, total_pages + 1)), page_size, url, max_workers)
+        if any(page_data is None for page_data in pages):
+            logger.error("Failed to fetch all order pages.")
+            return None
+        for page_data in pages:
+            orders.extend(page_data.get('orders', []))
     else:
-        print(f"Failed to fetch orders. Status: {response.status_code}")
-        try:
-            error_data = response.json()
-            print(f"Error response: {json.dumps(error_data, indent=2)}")
-        except:
-            print(f"Response text: {response.text[:500]}...")
+        # No page count in the response, fetch batches of pages until a short page shows up
+        next_page = 2
+        last_page_full = len(orders) >= page_size
+        while last_page_full:
+            batch = list(range(next_page, next_page + max_workers))
+            pages = fetch_pages_concurrently(session, headers, batch, page_size, url, max_workers)
+            for page_data in pages:
+                if page_data is None:
+                    logger.error("Failed to fetch all order pages.")
+                    return None
+                page_orders = page_data.get('orders', [])
+                orders.extend(page_orders)
+                if len(page_orders) < page_size:
+                    last_page_full = False
+                    break
+            next_page += max_workers
     
-    return None
+    # Reassemble everything into a single response
+    orders_data['orders'] = orders
+    logger.info("Fetched %d orders", len(orders))
+    
+    # Save to file
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump(orders_data, f, indent=2, ensure_ascii=False)
+    
+    logger.info("Orders data saved to %s", json_file)
+    
+    # A second, pretty-printed copy for inspection (debug mode only)
+    log_config.save_debug_artifact('orders_data.json', orders_data)
+    
+    return orders_data
+
+# Load the sync watermark, returns None if there isn't a usable one
+def load_sync_state(state_file=SYNC_STATE_FILE):
+    if not os.path.exists(state_file):
+        return None
+    
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable sync state %s: %s", state_file, e)
+        return None
+    
+    if not state.get("recent_keys"):
+        return None
+    
+    return state
+
+# Remember the newest orders we have so the next sync knows where to stop.
+# After a delta sync, orders are only the new ones, on top of the previous state
+def save_sync_state(orders, state_file=SYNC_STATE_FILE, previous=None):
+    recent_keys = [get_order_key(order) for order in orders[:SYNC_RECENT_KEYS]]
+    order_count = len(orders)
+    newest_order_date = orders[0].get('orderDate', '') if orders else None
+    if previous:
+        recent_keys += [key for key in previous["recent_keys"] if key not in recent_keys]
+        recent_keys = recent_keys[:SYNC_RECENT_KEYS]
+        order_count += previous.get("order_count", 0)
+        newest_order_date = newest_order_date or previous.get("newest_order_date")
+    
+    state = {
+        "newest_order_key": recent_keys[0] if recent_keys else None,
+        "newest_order_date": newest_order_date,
+        "recent_keys": recent_keys,
+        "order_count": order_count,
+        "synced_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+    
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    
+    return state
+
+# Step 3 (incremental): Fetch only the orders placed since the last sync and store them
+def sync_orders(session, auth_data, json_file="orders_data.json", state_file=SYNC_STATE_FILE, url=ORDERS_API_URL,
+                page_size=ORDERS_PAGE_SIZE, db_file=order_store.ORDERS_DB):
+    """Bring the order store up to date, returns (orders_data, added, updated).
+    
+    Without a watermark or stored orders the full history is fetched into
+    json_file and imported. After that only the orders newer than the
+    watermark are fetched (plus the known ones on the same page, their status
+    may have changed) and only those are written to the store, json_file is
+    left alone. orders_data holds the fetched orders, None if fetching failed.
+    The watermark only moves once the orders are stored.
+    """
+    
+    logger.info("Step 3: Syncing new orders from API...")
+    
+    # Check if we have the access token
+    if not auth_data or 'access_token' not in auth_data:
+        logger.error("No access token available. Cannot fetch orders.")
+        return None, 0, 0
+    
+    # Without stored orders and a watermark there is nothing to sync against
+    state = load_sync_state(state_file)
+    if state is None or not order_store.has_orders(db_file):
+        logger.info("No previous sync found, fetching the full order history")
+        return fetch_full_history(session, auth_data, json_file, state_file, url, page_size, db_file)
+    
+    headers = get_orders_headers(auth_data['access_token'])
+    known_keys = set(state["recent_keys"])
+    
+    # The API lists orders newest first, so walk pages until we reach an order we already have
+    new_orders = []
+    seen_orders = []
+    page = 1
+    reached_known = False
+    while True:
+        page_data = fetch_orders_page(session, headers, page, page_size, url)
+        if page_data is None:
+            return None, 0, 0
+        
+        page_orders = page_data.get('orders', [])
+        for order in page_orders:
+            if get_order_key(order) in known_keys:
+                # Already stored, but it may have changed since (e.g. its status)
+                reached_known = True
+                seen_orders.append(order)
+            elif not reached_known:
+                new_orders.append(order)
+        
+        if reached_known or len(page_orders) < page_size:
+            break
+        page += 1
+    
+    logger.info("Found %d new order(s) in %d page(s)", len(new_orders), page)
+    
+    # The store tells changed orders from ones that are the same as before
+    added, updated = order_store.ingest_orders(new_orders + seen_orders, db_file)
+    if new_orders:
+        save_sync_state(new_orders, state_file, previous=state)
+    
+    return {"orders": new_orders + seen_orders}, added, updated
+
+# Step 3 (full): Re-download the whole history, import it and reset the sync watermark
+def fetch_full_history(session, auth_data, json_file="orders_data.json", state_file=SYNC_STATE_FILE, url=ORDERS_API_URL,
+                       page_size=ORDERS_PAGE_SIZE, db_file=order_store.ORDERS_DB):
+    orders_data = fetch_orders(session, auth_data, json_file, url, page_size)
+    if not orders_data:
+        return None, 0, 0
+    added, updated = order_store.ingest_json(json_file, db_file)
+    save_sync_state(orders_data.get('orders', []), state_file)
+    return orders_data, added, updated
 
 # Main execution
 if __name__ == "__main__":
+    log_config.setup_logging(log_config.CLI_FORMAT)
+    
     try:
-        # Step 1: Get CSRF token
-        csrf_token, cookies, session = get_csrf_token()
+        # Log in (or reuse the cached login) and fetch orders, only new ones unless --full is given
+        result = run_with_auth(fetch_full_history if "--full" in sys.argv else sync_orders)
         
-        if csrf_token and cookies and session:
-            # Add a delay to simulate human behavior
-            time.sleep(1)
-            
-            # Step 2: Login with the token
-            login_response, auth_data = login(csrf_token, cookies, session)
-            
-            # Add a delay before fetching orders
-            time.sleep(1)
-            
-            # Step 3: Fetch orders
-            orders_data = fetch_orders(session, auth_data)
-        else:
-            print("Failed to extract necessary tokens. Cannot proceed with login.")
+        if not result or not result[0]:
+            logger.error("Failed to fetch orders.")
     except Exception as e:
-        print(f"An error occurred: {str(e)}") 
\ No newline at end of file
+        logger.exception("An error occurred: %s", e)
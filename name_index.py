@@ -0,0 +1,253 @@
+import re
+import math
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from food_classifier import turkish_fold
+
+# Turkish letters without their marks, so "Menu" finds "Menü" and "Sis" finds "Şiş"
+_UNMARKED = str.maketrans('çğöşüâîû', 'cgosuaiu')
+
+_WORD = re.compile(r'\w+')
+_NUMBER = re.compile(r'\d+')
+
+# Names are compared by character trigrams of their words
+NGRAM_SIZE = 3
+
+# Most similar names a new name is checked against for being a respelling of one
+MERGE_CANDIDATES = 10
+
+# Words shorter than this have to match exactly, a typo in them makes another word
+MIN_TYPO_LENGTH = 4
+
+# Stored name norms are recomputed once the index grew by this share
+NORM_REFRESH_GROWTH = 0.1
+
+def normalize(text):
+    """Lowercase, Turkish-folded words of a text, without letter marks or punctuation"""
+
+    return _WORD.findall(turkish_fold(text).translate(_UNMARKED))
+
+def ngrams(text):
+    """Character trigrams of every word (padded, so word starts and ends count), with counts"""
+
+    grams = Counter()
+    for word in normalize(text):
+        padded = f" {word} "
+        for start in range(max(1, len(padded) - NGRAM_SIZE + 1)):
+            grams[padded[start:start + NGRAM_SIZE]] += 1
+    return grams
+
+def _one_edit_apart(word, other):
+    # One letter inserted, removed or replaced
+    if len(word) > len(other):
+        word, other = other, word
+    if len(other) - len(word) > 1:
+        return False
+    for i, (a, b) in enumerate(zip(word, other)):
+        if a != b:
+            skip = 1 if len(word) == len(other) else 0
+            return word[i + skip:] == other[i + 1:]
+    return True
+
+def is_respelling(name, other):
+    """Whether two names are spellings of the same thing.
+
+    That is the same words after normalization ("KARIŞIK PİZZA", "Karisik
+    Pizza"), in any order or run together ("Pizza Margarita", "Cheese Burger"
+    and "Cheeseburger"), or a typo of one letter in one word ("Whoper Menü").
+    Extra words always make another product ("Double Whopper Menü"), and so
+    do other numbers ("100gr" and "150gr", "2'li" and "3'lü").
+    """
+
+    words, other_words = normalize(name), normalize(other)
+    if sorted(_NUMBER.findall(' '.join(words))) != sorted(_NUMBER.findall(' '.join(other_words))):
+        return False
+    if sorted(words) == sorted(other_words) or ''.join(words) == ''.join(other_words):
+        return True
+    if len(words) != len(other_words):
+        return False
+
+    differing = [(word, other_word) for word, other_word in zip(words, other_words) if word != other_word]
+    if len(differing) != 1:
+        return False
+    word, other_word = differing[0]
+    return min(len(word), len(other_word)) >= MIN_TYPO_LENGTH and _one_edit_apart(word, other_word)
+
+class NameIndex:
+    """TF-IDF weighted character trigram index over names (items or restaurants).
+
+    Every name ever added stays in the index. Each gram has a posting list
+    (name ids and term weights, in growable arrays), so a lookup only
+    touches the names sharing a gram with the query, and adds up their
+    scores with NumPy. Respellings of one name ("Whopper Menü", "WHOPPER
+    MENU", "Whoper Menü", see is_respelling) are merged into one group when
+    they are added. The index pickles as is, posting lists included.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+        self.postings = {}
+
+        # Group of every name (the id of its first spelling), and the names in each group
+        self.group_of = []
+        self.groups = {}
+
+        # Length of every name's vector, for cosine similarity. IDF moves a
+        # little with every name added, so they are refreshed once it drifted
+        self.norms = array('d')
+        self._norms_size = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def _idf(self, gram):
+        postings = self.postings.get(gram)
+        return math.log((len(self.names) + 1) / ((len(postings[0]) if postings else 0) + 1)) + 1
+
+    def _query_weights(self, grams):
+        return {gram: (1 + math.log(count)) * self._idf(gram) for gram, count in grams.items()}
+
+    def _refresh_norms(self):
+        if not self.postings:
+            # Only names without letters or digits ("-", "🍔") so far, nothing to weigh
+            self.norms = array('d', [1.0] * len(self.names))
+            self._norms_size = len(self.names)
+            return
+
+        ids = np.concatenate([np.frombuffer(name_ids, dtype=np.int64) for name_ids, _ in self.postings.values()])
+        weights = np.concatenate([
+            np.frombuffer(weights, dtype=np.float64) * self._idf(gram) for gram, (_, weights) in self.postings.items()
+        ])
+        norms = np.sqrt(np.bincount(ids, weights * weights, minlength=len(self.names)))
+        norms[norms == 0] = 1.0
+        self.norms = array('d', norms.tobytes())
+        self._norms_size = len(self.names)
+
+    def _best(self, grams, limit, exclude=()):
+        # Cosine of the query against every name sharing one of its grams, best first as (score, id)
+        known = []
+        query_norm = 0.0
+        for gram, count in grams.items():
+            idf = self._idf(gram)
+            weight = (1 + math.log(count)) * idf
+            query_norm += weight * weight
+            if gram in self.postings:
+                known.append((self.postings[gram], weight * idf))
+        if not known:
+            return []
+        query_norm = math.sqrt(query_norm)
+
+        ids = np.concatenate([np.frombuffer(name_ids, dtype=np.int64) for (name_ids, _), _ in known])
+        products = np.concatenate([np.frombuffer(weights, dtype=np.float64) * factor for (_, weights), factor in known])
+        scores = np.bincount(ids, products, minlength=len(self.names))
+        if exclude:
+            scores[np.asarray(exclude, dtype=np.int64)] = 0
+
+        found = np.flatnonzero(scores)
+        # Norms lag a little behind the IDF, which can push a perfect match just over 1
+        scores = np.minimum(scores[found] / (query_norm * np.frombuffer(self.norms, dtype=np.float64)[found]), 1.0)
+        if len(found) > limit:
+            top = np.argpartition(-scores, limit)[:limit]
+            found, scores = found[top], scores[top]
+        order = np.lexsort((found, -scores))
+        return [(float(scores[i]), int(found[i])) for i in order]
+
+    def add(self, name, merge=True):
+        """Add a name (no-op if known), returns the first spelling of its group.
+
+        With merge, a respelling of a known name joins its group.
+        """
+
+        name_id = self.ids.get(name)
+        if name_id is not None:
+            return self.names[self.group_of[name_id]]
+
+        grams = ngrams(name)
+        group = None
+        if merge:
+            # Respellings share most grams, so they are among the most similar names
+            for score, other in self._best(grams, MERGE_CANDIDATES):
+                if is_respelling(name, self.names[other]):
+                    group = self.group_of[other]
+                    break
+
+        name_id = len(self.names)
+        self.names.append(name)
+        self.ids[name] = name_id
+        for gram, count in grams.items():
+            postings = self.postings.get(gram)
+            if postings is None:
+                postings = self.postings[gram] = (array('q'), array('d'))
+            postings[0].append(name_id)
+            postings[1].append(1 + math.log(count))
+
+        if group is None:
+            group = name_id
+        self.group_of.append(group)
+        self.groups.setdefault(group, []).append(name_id)
+
+        if len(self.names) > self._norms_size * (1 + NORM_REFRESH_GROWTH):
+            self._refresh_norms()
+        else:
+            norm = math.sqrt(sum(w * w for w in self._query_weights(grams).values()))
+            self.norms.append(norm or 1.0)
+        return self.names[group]
+
+    def canonical(self, name):
+        """The first spelling seen of this name (the name itself if unknown)"""
+
+        name_id = self.ids.get(name)
+        return name if name_id is None else self.names[self.group_of[name_id]]
+
+    def spellings(self, name):
+        """Every spelling merged with this name"""
+
+        name_id = self.ids.get(name)
+        if name_id is None:
+            return [name]
+        return [self.names[member] for member in self.groups[self.group_of[name_id]]]
+
+    def similar(self, name, limit=5, min_score=0.3):
+        """Names most similar to this one, known or not, as (name, score).
+
+        Spellings of the name itself are left out, and only the best
+        spelling of every other group is listed.
+        """
+
+        name_id = self.ids.get(name)
+        exclude = self.groups[self.group_of[name_id]] if name_id is not None else ()
+
+        results = []
+        seen_groups = set()
+        # Fetch extra in case several spellings of one group rank high
+        for score, other in self._best(ngrams(name), limit * 3, exclude):
+            if score < min_score:
+                break
+            group = self.group_of[other]
+            if group in seen_groups:
+                continue
+            seen_groups.add(group)
+            results.append((self.names[other], score))
+            if len(results) == limit:
+                break
+        return results
+
+    def merge_counts(self, counts):
+        """Counts per name with respellings added up under the most counted one"""
+
+        totals = Counter()
+        best = {}
+        for name, count in counts.items():
+            name_id = self.ids.get(name)
+            group = self.group_of[name_id] if name_id is not None else name
+            totals[group] += count
+            if group not in best or count > counts[best[group]]:
+                best[group] = name
+        return Counter({best[group]: total for group, total in totals.items()})
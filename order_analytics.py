@@ -0,0 +1,162 @@
+import datetime
+import math
+from collections import Counter
+
+from food_classifier import classify_food_types, get_classifier, get_food_types
+
+def get_order_hour(time_str):
+    """Hour of day from an "HH:MM" order time, or None if it can't be read"""
+
+    try:
+        return int(time_str.split(':')[0])
+    except (ValueError, IndexError, AttributeError):
+        return None
+
+def _bump(counter, key, sign):
+    # Counters never keep keys that dropped back to zero
+    counter[key] += sign
+    if counter[key] <= 0:
+        del counter[key]
+
+class OrderAggregates:
+    """Running statistics over the order history, updated one order at a time"""
+
+    def __init__(self):
+        self.order_count = 0
+
+        # Frequency counters
+        self.item_counts = Counter()
+        self.restaurant_counts = Counter()
+        self.type_counts = Counter()
+
+        # Price statistics (Welford's online mean/variance)
+        self.price_count = 0
+        self.price_mean = 0.0
+        self.price_m2 = 0.0
+        self.price_min = None
+        self.price_max = None
+
+        # Time histograms
+        self.hour_counts = Counter()
+        self.weekday_counts = [0] * 7
+
+        # Set when a removal made min/max unreliable; a rebuild clears it
+        self.needs_rebuild = False
+
+    def add(self, order, timestamp=None):
+        """Add one order (a row keyed like the CSV columns)"""
+
+        self._apply(order, timestamp, 1)
+
+        price = float(order['Price (TL)'])
+        self.price_count += 1
+        delta = price - self.price_mean
+        self.price_mean += delta / self.price_count
+        self.price_m2 += delta * (price - self.price_mean)
+        self.price_min = price if self.price_min is None else min(self.price_min, price)
+        self.price_max = price if self.price_max is None else max(self.price_max, price)
+
+    def remove(self, order, timestamp=None):
+        """Take back an order added earlier, e.g. before re-adding its updated version"""
+
+        self._apply(order, timestamp, -1)
+
+        price = float(order['Price (TL)'])
+        if self.price_count <= 1:
+            self.price_count = 0
+            self.price_mean = 0.0
+            self.price_m2 = 0.0
+            self.price_min = None
+            self.price_max = None
+            return
+
+        old_mean = (self.price_count * self.price_mean - price) / (self.price_count - 1)
+        self.price_m2 -= (price - old_mean) * (price - self.price_mean)
+        self.price_m2 = max(self.price_m2, 0.0)
+        self.price_mean = old_mean
+        self.price_count -= 1
+
+        # Min/max can't be undone incrementally
+        if price == self.price_min or price == self.price_max:
+            self.needs_rebuild = True
+
+    def _apply(self, order, timestamp, sign):
+        self.order_count += sign
+
+        item = order['Item Name']
+        _bump(self.item_counts, item, sign)
+        _bump(self.restaurant_counts, f"{order['Restaurant Name']} ({order['Restaurant Location']})", sign)
+        for food_type in classify_food_types(item):
+            _bump(self.type_counts, food_type, sign)
+
+        hour = get_order_hour(order['Time'])
+        if hour is not None:
+            _bump(self.hour_counts, hour, sign)
+
+        if timestamp is not None:
+            self.weekday_counts[datetime.datetime.fromtimestamp(timestamp).weekday()] += sign
+
+    @property
+    def price_stddev(self):
+        return math.sqrt(self.price_m2 / self.price_count) if self.price_count else 0.0
+
+    def to_analysis(self):
+        """The same analysis dict food_recommendation_simple.analyze_orders returns"""
+
+        hours = sum(self.hour_counts.values())
+        avg_hour = sum(hour * count for hour, count in self.hour_counts.items()) / hours if hours else None
+
+        if self.price_count:
+            price_range = (self.price_min, self.price_max, self.price_mean)
+        else:
+            price_range = (0, 0, 0)
+
+        type_counts = {food_type: self.type_counts.get(food_type, 0) for food_type in get_food_types()}
+        preferred_types = sorted(type_counts.items(), key=lambda x: x[1], reverse=True)
+
+        return {
+            'most_common_items': self.item_counts.most_common(3),
+            'avg_hour': avg_hour,
+            'price_range': price_range,
+            'preferred_types': preferred_types
+        }
+
+    def to_dict(self):
+        return {
+            'order_count': self.order_count,
+            'item_counts': list(self.item_counts.items()),
+            'restaurant_counts': list(self.restaurant_counts.items()),
+            'type_counts': list(self.type_counts.items()),
+            'price': [self.price_count, self.price_mean, self.price_m2, self.price_min, self.price_max],
+            'hour_counts': list(self.hour_counts.items()),
+            'weekday_counts': self.weekday_counts,
+            'needs_rebuild': self.needs_rebuild,
+            'classifier': get_classifier().fingerprint
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregates = cls()
+        aggregates.order_count = data['order_count']
+        aggregates.item_counts = Counter(dict(data['item_counts']))
+        aggregates.restaurant_counts = Counter(dict(data['restaurant_counts']))
+        aggregates.type_counts = Counter(dict(data['type_counts']))
+        (aggregates.price_count, aggregates.price_mean, aggregates.price_m2,
+         aggregates.price_min, aggregates.price_max) = data['price']
+        aggregates.hour_counts = Counter(dict(data['hour_counts']))
+        aggregates.weekday_counts = list(data['weekday_counts'])
+        aggregates.needs_rebuild = data.get('needs_rebuild', False)
+
+        # Food type counts from a different keyword table are stale
+        if data.get('classifier') != get_classifier().fingerprint:
+            aggregates.needs_rebuild = True
+        return aggregates
+
+    @classmethod
+    def from_orders(cls, orders):
+        """Build the aggregates from scratch, e.g. to verify the incremental state"""
+
+        aggregates = cls()
+        for order in orders:
+            aggregates.add(order, order.get('Timestamp'))
+        return aggregates
@@ -0,0 +1,191 @@
+import sys
+import json
+import math
+import bisect
+import random
+import datetime
+
+# Synthetic order histories in the exact shape of the TGO orders API, for
+# testing and benchmarking at scale without a TGO account
+
+# Restaurants by cuisine, with the menu and typical price range (TL) of each cuisine
+CUISINES = {
+    'burger': {
+        'restaurants': ["Burger King", "Secret Burger", "Big Chefs Burger", "Zula Burger", "Kasap Burger", "Shake Shack"],
+        'items': ["Whopper Menü", "Double Secret Burger Menü", "Cheeseburger", "Tavuklu Burger Menü",
+                  "Mantarlı Burger", "Çıtır Tavuk Burger", "Patates Kızartması"],
+        'prices': (180, 480)
+    },
+    'pizza': {
+        'restaurants': ["Pizza Bulls", "Domino's Pizza", "Little Caesars", "Pizza Locale", "Pasaport Pizza"],
+        'items': ["Margarita Pizza", "Karışık Pizza", "Sucuklu Pizza", "Dört Peynirli Pizza",
+                  "Ton Balıklı Pizza", "Vejetaryen Pizza"],
+        'prices': (160, 520)
+    },
+    'döner': {
+        'restaurants': ["Tavuk Dünyası", "Dönerci Şahin Usta", "Bereket Döner", "Komagene", "Baydöner"],
+        'items': ["Tavuk Şiş Dürüm", "Et Döner Dürüm", "İskender", "Tavuk Döner Porsiyon",
+                  "Çiğ Köfte Dürüm", "Pilav Üstü Döner"],
+        'prices': (120, 420)
+    },
+    'kebap': {
+        'restaurants': ["Adana Ocakbaşı", "Hacıbaba Kebap", "Köşebaşı", "Urfalı Hacı Usta"],
+        'items': ["Adana Kebap", "Urfa Kebap", "Lahmacun", "Karışık Izgara", "Beyti Sarma", "Kuşbaşılı Pide"],
+        'prices': (220, 650)
+    },
+    'ev yemeği': {
+        'restaurants': ["Tostçu Erol", "Çiya Sofrası", "Hünkar Lokantası", "Kardeşler Pide"],
+        'items': ["Karışık Tost", "Mercimek Çorbası", "Kuru Fasulye Pilav", "Mantı",
+                  "Karnıyarık", "Kaşarlı Pide", "Tavuk Sote"],
+        'prices': (80, 320)
+    },
+    'dünya mutfağı': {
+        'restaurants': ["Chicken Tacos Co.", "Sushico", "Wok & Go", "Bamboo Noodle Bar"],
+        'items': ["Chicken Tacos", "Beef Burrito", "Sushi Set", "Tavuklu Noodle", "Pad Thai", "California Roll"],
+        'prices': (200, 700)
+    },
+    'kahve': {
+        'restaurants': ["Starbucks", "Kahve Dünyası", "Espresso Lab", "Caribou Coffee"],
+        'items': ["Caffe Latte", "Türk Kahvesi", "Iced Americano", "Club Sandwich", "Cheesecake", "Brownie"],
+        'prices': (70, 260)
+    },
+    'tatlı': {
+        'restaurants': ["Hafız Mustafa", "Karaköy Güllüoğlu", "Mado", "Saray Muhallebicisi"],
+        'items': ["Fıstıklı Baklava", "Künefe", "Sütlaç", "Trileçe", "Dondurma", "Kazandibi"],
+        'prices': (90, 380)
+    }
+}
+
+LOCATIONS = [
+    "Kadıköy", "Beşiktaş", "Moda", "Cihangir", "Ataşehir", "Bağdat Caddesi", "Şişli", "Üsküdar",
+    "Bakırköy", "Levent", "Maslak", "Nişantaşı", "Etiler", "Fenerbahçe", "Karaköy", "Sarıyer"
+]
+
+# Relative order volume by hour of day: lunch and dinner peaks, a late-night tail
+HOUR_WEIGHTS = [
+    2, 1, 1, 0, 0, 0, 0, 1, 3, 4, 5, 9, 16, 15, 8, 5, 5, 8, 14, 18, 16, 10, 6, 4
+]
+
+# Monday first; weekends are busier
+WEEKDAY_WEIGHTS = [10, 10, 10, 11, 13, 16, 15]
+
+# Histories never go back further than this; big ones get more orders per day instead
+MAX_HISTORY_DAYS = 10 * 365
+
+STATUSES = [("Teslim Edildi", 0.94), ("İptal Edildi", 0.04), ("İade Edildi", 0.02)]
+
+TURKISH_MONTH_NAMES = [
+    "Ocak", "Şubat", "Mart", "Nisan", "Mayıs", "Haziran",
+    "Temmuz", "Ağustos", "Eylül", "Ekim", "Kasım", "Aralık"
+]
+
+def _weighted_sampler(rng, weights):
+    # Cumulative weights, so every draw is a bisect instead of a scan
+    total = 0
+    cumulative = []
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return lambda: bisect.bisect_right(cumulative, rng.random() * total)
+
+class CustomerProfile:
+    """One user's habits: favourite restaurants and items, and how often they order"""
+
+    def __init__(self, rng, restaurant_count=25):
+        self.restaurants = []
+        for cuisine, info in CUISINES.items():
+            for name in info['restaurants']:
+                self.restaurants.append((cuisine, f"{name} ({rng.choice(LOCATIONS)})"))
+        rng.shuffle(self.restaurants)
+        self.restaurants = self.restaurants[:restaurant_count]
+
+        # A few favourites take most orders (Zipf-like), and every restaurant has its usual dishes
+        self.pick_restaurant = _weighted_sampler(rng, [1 / (rank + 1) ** 1.1 for rank in range(len(self.restaurants))])
+        self.menus = {}
+        for cuisine, store in self.restaurants:
+            items = list(CUISINES[cuisine]['items'])
+            rng.shuffle(items)
+            self.menus[store] = (items, _weighted_sampler(rng, [1 / (rank + 1) for rank in range(len(items))]))
+
+        self.pick_hour = _weighted_sampler(rng, HOUR_WEIGHTS)
+        self.weekday_weights = WEEKDAY_WEIGHTS
+        self.orders_per_day = rng.uniform(0.3, 1.5)
+
+def iter_orders(count, seed=0, end=None, turkish_dates=0.0):
+    """Yield count fake orders in the TGO response shape, newest first.
+
+    Orders follow one customer's habits (favourite restaurants, lunch and
+    dinner peaks, busier weekends) going back from `end` (default now).
+    A `turkish_dates` fraction of them spells the month out ("12 Mart 2024").
+    """
+
+    rng = random.Random(seed)
+    profile = CustomerProfile(rng)
+    pick_status = _weighted_sampler(rng, [weight for _, weight in STATUSES])
+
+    orders_per_day = max(profile.orders_per_day, count / MAX_HISTORY_DAYS)
+
+    day = (end or datetime.datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    remaining = count
+    while remaining > 0:
+        # Orders on this day: Poisson around the customer's rate, scaled by the weekday
+        rate = orders_per_day * profile.weekday_weights[day.weekday()] / 12
+        if rate > 30:
+            orders_today = max(0, round(rng.gauss(rate, math.sqrt(rate))))
+        else:
+            orders_today = 0
+            threshold = math.exp(-rate)
+            product = rng.random()
+            while product > threshold:
+                orders_today += 1
+                product *= rng.random()
+
+        times = sorted(
+            ((profile.pick_hour(), rng.randint(0, 59)) for _ in range(min(orders_today, remaining))),
+            reverse=True
+        )
+        for hour, minute in times:
+            cuisine, store = profile.restaurants[profile.pick_restaurant()]
+            items, pick_item = profile.menus[store]
+            low, high = CUISINES[cuisine]['prices']
+
+            if turkish_dates and rng.random() < turkish_dates:
+                date = f"{day.day} {TURKISH_MONTH_NAMES[day.month - 1]} {day.year}"
+            else:
+                date = day.strftime('%d.%m.%Y')
+
+            yield {
+                "orderId": f"SYN{seed:03d}{remaining:09d}",
+                "orderDate": f"{date} / {hour:02d}:{minute:02d}",
+                "product": {"name": items[pick_item()]},
+                "store": {"name": store},
+                "price": {"totalPrice": round(rng.triangular(low, high, low + (high - low) / 3), 2)},
+                "status": {"statusText": STATUSES[pick_status()][0]}
+            }
+            remaining -= 1
+
+        day -= datetime.timedelta(days=1)
+
+def make_orders(count, seed=0, **kwargs):
+    """A list of count fake orders, newest first (see iter_orders)"""
+
+    return list(iter_orders(count, seed, **kwargs))
+
+def write_orders_json(json_file, count, seed=0, **kwargs):
+    """Write an orders_data.json export with count fake orders, one order at a time"""
+
+    with open(json_file, 'w', encoding='utf-8') as f:
+        f.write('{"orders": [')
+        for i, order in enumerate(iter_orders(count, seed, **kwargs)):
+            f.write(',\n  ' if i else '\n  ')
+            f.write(json.dumps(order, ensure_ascii=False))
+        f.write('\n]}\n')
+    return json_file
+
+if __name__ == "__main__":
+    # python order_generator.py [count] [output file]
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    json_file = sys.argv[2] if len(sys.argv) > 2 else "orders_data.json"
+
+    write_orders_json(json_file, count)
+    print(f"Wrote {count} synthetic orders to {json_file}")
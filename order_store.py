@@ -0,0 +1,602 @@
+import os
+import sys
+import json
+import math
+import pickle
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+import log_config
+import name_index
+import parse_orders
+import time_index
+from order_analytics import OrderAggregates
+
+logger = logging.getLogger(__name__)
+
+# SQLite database holding the order history
+ORDERS_DB = "orders.db"
+
+# Rows are written in batches of this size during a full import
+INGEST_BATCH_SIZE = 1000
+
+# Tables whose names are indexed for similarity lookups and near-duplicate merging
+NAME_TABLES = ('items', 'restaurants')
+
+# A stored name index is only saved again once this share of names (and at
+# least NAME_INDEX_MIN_BACKLOG) is missing from it; readers index the rest in memory
+NAME_INDEX_SAVE_GROWTH = 0.25
+NAME_INDEX_MIN_BACKLOG = 500
+
+# Query results cached in memory per database, for the most recently used
+# databases (one per chat in the bot). They are dropped when the store's
+# version changes, which every write bumps
+CACHE_MAX_STORES = int(os.getenv("ORDER_CACHE_MAX_STORES", "16"))
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS restaurants (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    location TEXT NOT NULL,
+    order_count INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (name, location)
+);
+
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    order_key TEXT PRIMARY KEY,
+    item_id INTEGER NOT NULL REFERENCES items (id),
+    restaurant_id INTEGER NOT NULL REFERENCES restaurants (id),
+    ordered_at INTEGER,
+    order_date TEXT NOT NULL,
+    order_time TEXT NOT NULL,
+    price REAL NOT NULL,
+    status TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_orders_ordered_at ON orders (ordered_at);
+CREATE INDEX IF NOT EXISTS idx_orders_restaurant ON orders (restaurant_id, ordered_at);
+CREATE INDEX IF NOT EXISTS idx_restaurants_order_count ON restaurants (order_count);
+
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS name_indexes (
+    name_table TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+"""
+
+# Orders joined with their dimensions, using the CSV column names as keys
+ORDER_COLUMNS = """
+    o.order_key AS "Order ID",
+    i.name AS "Item Name",
+    r.name AS "Restaurant Name",
+    r.location AS "Restaurant Location",
+    o.order_date AS "Date",
+    o.order_time AS "Time",
+    o.price AS "Price (TL)",
+    o.status AS "Status",
+    o.ordered_at AS "Timestamp"
+"""
+
+ORDER_JOINS = """
+    FROM orders o
+    JOIN items i ON i.id = o.item_id
+    JOIN restaurants r ON r.id = o.restaurant_id
+"""
+
+def connect(db_file=ORDERS_DB):
+    """Open the order store, creating the schema if needed"""
+
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+
+    # WAL lets readers (the bot handlers) keep going while an update writes
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+def get_meta(conn, key, default=None):
+    row = conn.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+def set_meta(conn, key, value):
+    conn.execute(
+        "INSERT INTO store_meta (key, value) VALUES (?, ?) "
+        "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+        (key, str(value))
+    )
+
+def _bump_version(conn):
+    set_meta(conn, 'version', int(get_meta(conn, 'version', 0)) + 1)
+
+def _get_item_id(conn, name, cache):
+    if name not in cache:
+        conn.execute("INSERT OR IGNORE INTO items (name) VALUES (?)", (name,))
+        cache[name] = conn.execute("SELECT id FROM items WHERE name = ?", (name,)).fetchone()[0]
+    return cache[name]
+
+def _get_restaurant_id(conn, name, location, cache):
+    key = (name, location)
+    if key not in cache:
+        conn.execute("INSERT OR IGNORE INTO restaurants (name, location) VALUES (?, ?)", key)
+        cache[key] = conn.execute(
+            "SELECT id FROM restaurants WHERE name = ? AND location = ?", key
+        ).fetchone()[0]
+    return cache[key]
+
+def _refresh_restaurant_counts(conn, restaurant_ids):
+    # Keep the per-restaurant order count in sync so "top restaurants" is an index lookup
+    ids = list(restaurant_ids)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        conn.execute(
+            f"UPDATE restaurants SET order_count = "
+            f"(SELECT COUNT(*) FROM orders WHERE orders.restaurant_id = restaurants.id) "
+            f"WHERE id IN ({placeholders})",
+            chunk
+        )
+
+def upsert_rows(conn, rows, aggregates=None):
+    """Insert new orders and update changed ones, returns (added, updated).
+
+    If aggregates are given they are kept in step with every change.
+    """
+
+    item_ids = {}
+    restaurant_ids = {}
+    touched_restaurants = set()
+    added = 0
+    updated = 0
+
+    for row in rows:
+        item_id = _get_item_id(conn, row['Item Name'], item_ids)
+        restaurant_id = _get_restaurant_id(conn, row['Restaurant Name'], row['Restaurant Location'], restaurant_ids)
+        values = (
+            item_id,
+            restaurant_id,
+            parse_orders.parse_order_timestamp(row['Date'], row['Time']),
+            row['Date'],
+            row['Time'],
+            float(row['Price (TL)'] or 0),
+            row['Status']
+        )
+
+        existing = conn.execute(
+            "SELECT o.item_id, o.restaurant_id, o.ordered_at, o.order_date, o.order_time, o.price, o.status, "
+            "i.name, r.name, r.location "
+            f"{ORDER_JOINS} WHERE o.order_key = ?",
+            (row['Order ID'],)
+        ).fetchone()
+
+        if existing is None:
+            conn.execute(
+                "INSERT INTO orders (order_key, item_id, restaurant_id, ordered_at, order_date, order_time, price, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (row['Order ID'],) + values
+            )
+            added += 1
+        elif tuple(existing)[:7] != values:
+            conn.execute(
+                "UPDATE orders SET item_id = ?, restaurant_id = ?, ordered_at = ?, order_date = ?, "
+                "order_time = ?, price = ?, status = ? WHERE order_key = ?",
+                values + (row['Order ID'],)
+            )
+            touched_restaurants.add(existing['restaurant_id'])
+            updated += 1
+
+            if aggregates is not None:
+                old_row = {
+                    'Item Name': existing[7],
+                    'Restaurant Name': existing[8],
+                    'Restaurant Location': existing[9],
+                    'Time': existing['order_time'],
+                    'Price (TL)': existing['price']
+                }
+                aggregates.remove(old_row, existing['ordered_at'])
+        else:
+            continue
+
+        touched_restaurants.add(restaurant_id)
+        if aggregates is not None:
+            aggregates.add(row, values[2])
+
+    _refresh_restaurant_counts(conn, touched_restaurants)
+    return added, updated
+
+def _load_aggregates(conn):
+    data = get_meta(conn, 'aggregates')
+    return OrderAggregates.from_dict(json.loads(data)) if data else None
+
+def _save_aggregates(conn, aggregates):
+    set_meta(conn, 'aggregates', json.dumps(aggregates.to_dict(), ensure_ascii=False))
+
+def _rebuild_aggregates(conn):
+    rows = conn.execute(f"SELECT {ORDER_COLUMNS} {ORDER_JOINS} ORDER BY o.ordered_at DESC, o.rowid DESC")
+    return OrderAggregates.from_orders(dict(row) for row in rows)
+
+def _load_name_index(conn, table):
+    # The stored index, posting lists included, and the id of the last name in it
+    row = conn.execute("SELECT last_id, data FROM name_indexes WHERE name_table = ?", (table,)).fetchone()
+    if row is None:
+        return name_index.NameIndex(), 0
+    return pickle.loads(row['data']), row['last_id']
+
+def _index_new_names(conn, index, table, last_id):
+    # Names are never deleted and get increasing ids, so only the ones past last_id are new
+    for name_id, name in conn.execute(f"SELECT id, name FROM {table} WHERE id > ? ORDER BY id", (last_id,)):
+        index.add(name)
+        last_id = name_id
+    return last_id
+
+def _update_name_indexes(conn):
+    # Pickling the whole index on every import would cost as much as the history is long
+    for table in NAME_TABLES:
+        row = conn.execute("SELECT last_id FROM name_indexes WHERE name_table = ?", (table,)).fetchone()
+        saved_id = row['last_id'] if row else 0
+        newest_id = conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0
+        if newest_id - saved_id < max(NAME_INDEX_MIN_BACKLOG, saved_id * NAME_INDEX_SAVE_GROWTH):
+            continue
+
+        index, last_id = _load_name_index(conn, table)
+        new_last_id = _index_new_names(conn, index, table, last_id)
+        if new_last_id != last_id:
+            conn.execute(
+                "INSERT INTO name_indexes (name_table, last_id, data) VALUES (?, ?, ?) "
+                "ON CONFLICT (name_table) DO UPDATE SET last_id = excluded.last_id, data = excluded.data",
+                (table, new_last_id, pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL))
+            )
+
+def _save_changes(conn, aggregates):
+    # Aggregates missing (older store) or unreliable after a removal get rebuilt
+    if aggregates is None or aggregates.needs_rebuild:
+        aggregates = _rebuild_aggregates(conn)
+    _save_aggregates(conn, aggregates)
+
+    # The stored name indexes catch up once enough new names piled up
+    _update_name_indexes(conn)
+
+    _bump_version(conn)
+
+def ingest_json(json_file, db_file=ORDERS_DB):
+    """Load the full JSON export into the store, replacing what was there.
+
+    Returns (added, updated).
+    """
+
+    source_hash = parse_orders.get_file_hash(json_file)
+    conn = connect(db_file)
+    try:
+        # Nothing to do if the export hasn't changed since the last import
+        if get_meta(conn, 'source_hash') == source_hash:
+            logger.info("%s unchanged, %s is already up to date", json_file, db_file)
+            return 0, 0
+
+        with conn:
+            conn.execute("DELETE FROM orders")
+            conn.execute("UPDATE restaurants SET order_count = 0")
+            aggregates = OrderAggregates()
+            added = updated = 0
+            batch = []
+            for row in parse_orders.iter_order_rows(json_file):
+                batch.append(row)
+                if len(batch) >= INGEST_BATCH_SIZE:
+                    batch_added, batch_updated = upsert_rows(conn, batch, aggregates)
+                    added += batch_added
+                    updated += batch_updated
+                    batch = []
+            batch_added, batch_updated = upsert_rows(conn, batch, aggregates)
+            added += batch_added
+            updated += batch_updated
+
+            _save_changes(conn, aggregates)
+            set_meta(conn, 'source_hash', source_hash)
+
+        # Readers have to see the new orders straight away
+        invalidate_cache(db_file)
+
+        logger.info("Order store updated: %s (%d added, %d updated)", db_file, added, updated)
+        return added, updated
+    finally:
+        conn.close()
+
+def ingest_orders(orders, db_file=ORDERS_DB):
+    """Write new or changed orders (as the TGO API returns them) into the store.
+
+    For the delta of a sync (login_flow.sync_orders): only these orders are
+    read and written, however long the stored history is. Returns (added, updated).
+    """
+
+    rows = [parse_orders.normalize_order(order) for order in orders]
+    conn = connect(db_file)
+    try:
+        with conn:
+            aggregates = _load_aggregates(conn)
+            added, updated = upsert_rows(conn, rows, aggregates)
+            if added or updated:
+                _save_changes(conn, aggregates)
+
+        if added or updated:
+            invalidate_cache(db_file)
+
+        logger.info("Order store updated: %s (%d added, %d updated)", db_file, added, updated)
+        return added, updated
+    finally:
+        conn.close()
+
+def _get_store_version(conn):
+    # The store's connection sees writes from other processes too, even
+    # while they are only in the WAL
+    try:
+        rows = conn.execute("SELECT value FROM store_meta WHERE key = 'version'").fetchall()
+    except sqlite3.OperationalError:
+        # No schema yet
+        return None
+    return rows[0][0] if rows else None
+
+def _cached(db_file, key, loader):
+    path = os.path.abspath(db_file)
+    try:
+        inode = os.stat(path).st_ino
+    except FileNotFoundError:
+        return loader()
+
+    with _cache_lock:
+        entry = _cache.get(path)
+        if entry is not None and entry['inode'] != inode:
+            # The file was replaced, the old connection still reads the old one
+            _cache.pop(path)['conn'].close()
+            entry = None
+        if entry is None:
+            # Kept open, checking the version on it is much cheaper than connecting
+            entry = {'inode': inode, 'conn': sqlite3.connect(path, check_same_thread=False),
+                     'version': None, 'results': None}
+            _cache[path] = entry
+            while len(_cache) > CACHE_MAX_STORES:
+                _cache.popitem(last=False)[1]['conn'].close()
+        _cache.move_to_end(path)
+
+        version = _get_store_version(entry['conn'])
+        if entry['results'] is None or entry['version'] != version:
+            entry['version'] = version
+            entry['results'] = {}
+        results = entry['results']
+        if key in results:
+            return results[key]
+
+    result = loader()
+
+    with _cache_lock:
+        # Don't store a result computed against a store that changed meanwhile
+        if entry['results'] is results:
+            results[key] = result
+    return result
+
+def invalidate_cache(db_file=None):
+    """Forget cached query results for one database, or all of them"""
+
+    with _cache_lock:
+        if db_file is None:
+            entries = list(_cache.values())
+            _cache.clear()
+        else:
+            entry = _cache.pop(os.path.abspath(db_file), None)
+            entries = [entry] if entry else []
+        for entry in entries:
+            entry['conn'].close()
+
+def _query(db_file, query, params=()):
+    conn = connect(db_file)
+    try:
+        return conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+
+def has_orders(db_file=ORDERS_DB):
+    """Check whether the store exists and holds at least one order"""
+
+    if not os.path.exists(db_file):
+        return False
+
+    return _cached(db_file, ('has_orders',), lambda: bool(
+        _query(db_file, "SELECT 1 FROM orders LIMIT 1")
+    ))
+
+def read_orders(db_file=ORDERS_DB, limit=None):
+    """Read orders newest first, as dicts keyed like the CSV columns.
+
+    Results are cached and shared between callers, treat them as read-only.
+    """
+
+    query = f"SELECT {ORDER_COLUMNS} {ORDER_JOINS} ORDER BY o.ordered_at DESC, o.rowid DESC"
+    if limit is not None:
+        loader = lambda: [dict(row) for row in _query(db_file, query + " LIMIT ?", (limit,))]
+    else:
+        loader = lambda: [dict(row) for row in _query(db_file, query)]
+    return _cached(db_file, ('read_orders', limit), loader)
+
+def recent_orders(db_file=ORDERS_DB, limit=10):
+    """Most recent orders, served from the ordered_at index"""
+
+    return read_orders(db_file, limit)
+
+def top_restaurants(db_file=ORDERS_DB, limit=5):
+    """Restaurants ordered from most often, as (name, location, count)"""
+
+    return _cached(db_file, ('top_restaurants', limit), lambda: [
+        tuple(row) for row in _query(
+            db_file,
+            "SELECT name, location, order_count FROM restaurants "
+            "WHERE order_count > 0 ORDER BY order_count DESC, id DESC LIMIT ?",
+            (limit,)
+        )
+    ])
+
+def get_time_index(db_file=ORDERS_DB):
+    """Day-by-day index of the stored orders for windowed queries (see time_index.TimeIndex)"""
+
+    def loader():
+        conn = connect(db_file)
+        try:
+            rows = conn.execute(
+                "SELECT o.ordered_at, o.price, r.name, r.location "
+                "FROM orders o JOIN restaurants r ON r.id = o.restaurant_id WHERE o.ordered_at IS NOT NULL"
+            )
+            return time_index.TimeIndex.from_orders(
+                (timestamp, price, (name, location)) for timestamp, price, name, location in rows
+            )
+        finally:
+            conn.close()
+
+    return _cached(db_file, ('time_index',), loader)
+
+def top_restaurants_in(db_file=ORDERS_DB, period='all', limit=5):
+    """Restaurants ordered from most often within a period (see time_index.window), as (name, location, count)"""
+
+    if period == 'all':
+        return top_restaurants(db_file, limit)
+
+    start, end = time_index.window(period)
+    return [
+        (name, location, count)
+        for (name, location), count in get_time_index(db_file).top_restaurants(limit, start, end)
+    ]
+
+def order_totals(db_file=ORDERS_DB, period='all'):
+    """Number of orders and money spent (TL) within a period (see time_index.window)"""
+
+    start, end = time_index.window(period)
+    index = get_time_index(db_file)
+    return index.count(start, end), index.spend(start, end)
+
+def load_order_history(db_file=ORDERS_DB):
+    """Shared loader for the full order history, newest first"""
+
+    if not has_orders(db_file):
+        logger.error("No orders in %s. Please run order_store.py first.", db_file)
+        return None
+
+    orders = read_orders(db_file)
+
+    logger.info("Loaded %d orders from %s", len(orders), db_file)
+    return orders
+
+def load_aggregates(db_file=ORDERS_DB):
+    """Running aggregates persisted alongside the orders (None if there are none)"""
+
+    def loader():
+        conn = connect(db_file)
+        try:
+            return _load_aggregates(conn)
+        finally:
+            conn.close()
+
+    return _cached(db_file, ('aggregates',), loader)
+
+def get_name_index(db_file=ORDERS_DB, table='items'):
+    """Index of the store's item or restaurant names (see name_index.NameIndex)"""
+
+    def loader():
+        conn = connect(db_file)
+        try:
+            # Names added since the index was last saved are indexed in memory
+            index, last_id = _load_name_index(conn, table)
+            _index_new_names(conn, index, table, last_id)
+            return index
+        finally:
+            conn.close()
+
+    return _cached(db_file, ('name_index', table), loader)
+
+def get_analysis(db_file=ORDERS_DB):
+    """Order analysis served from the stored aggregates instead of the full history"""
+
+    def loader():
+        aggregates = load_aggregates(db_file)
+        if aggregates is None or aggregates.needs_rebuild:
+            aggregates = rebuild_aggregates(db_file)
+        analysis = aggregates.to_analysis()
+
+        # Respellings of one item ("Whopper Menü", "WHOPPER MENU") count as one
+        item_counts = get_name_index(db_file, 'items').merge_counts(aggregates.item_counts)
+        analysis['most_common_items'] = item_counts.most_common(3)
+        return analysis
+
+    return _cached(db_file, ('analysis',), loader)
+
+def rebuild_aggregates(db_file=ORDERS_DB):
+    """Recompute the aggregates from every stored order and save them"""
+
+    conn = connect(db_file)
+    try:
+        with conn:
+            aggregates = _rebuild_aggregates(conn)
+            _save_aggregates(conn, aggregates)
+            _bump_version(conn)
+    finally:
+        conn.close()
+
+    invalidate_cache(db_file)
+    return aggregates
+
+def verify_aggregates(db_file=ORDERS_DB):
+    """Check the incrementally maintained aggregates against a rebuild from scratch"""
+
+    conn = connect(db_file)
+    try:
+        stored = _load_aggregates(conn)
+        rebuilt = _rebuild_aggregates(conn)
+    finally:
+        conn.close()
+
+    if stored is None:
+        return False
+
+    stored_data = stored.to_dict()
+    rebuilt_data = rebuilt.to_dict()
+    stored_count, stored_mean, stored_m2, stored_min, stored_max = stored_data.pop('price')
+    rebuilt_count, rebuilt_mean, rebuilt_m2, rebuilt_min, rebuilt_max = rebuilt_data.pop('price')
+
+    # Counters must match exactly, running float statistics up to rounding
+    for key in stored_data:
+        if isinstance(stored_data[key], list) and key != 'weekday_counts':
+            stored_data[key] = sorted(stored_data[key], key=str)
+            rebuilt_data[key] = sorted(rebuilt_data[key], key=str)
+
+    return (
+        stored_data == rebuilt_data
+        and stored_count == rebuilt_count
+        and (stored_min, stored_max) == (rebuilt_min, rebuilt_max)
+        and math.isclose(stored_mean, rebuilt_mean, rel_tol=1e-9, abs_tol=1e-9)
+        and math.isclose(stored_m2, rebuilt_m2, rel_tol=1e-6, abs_tol=1e-6)
+    )
+
+if __name__ == "__main__":
+    log_config.setup_logging(log_config.CLI_FORMAT)
+
+    # Import the JSON export into the order store
+    json_file = "orders_data.json"
+
+    if not os.path.exists(json_file):
+        logger.error("%s not found. Please run login_flow.py first.", json_file)
+    else:
+        ingest_json(json_file)
+        logger.info("Orders have been imported into %s", ORDERS_DB)
+
+        if "--verify" in sys.argv:
+            print(f"Aggregates match a rebuild: {verify_aggregates()}")
@@ -1,65 +1,253 @@
 import json
 import csv
 import os
+import hashlib
+import datetime
+import logging
 
-def parse_orders_to_csv(json_file, csv_file):
-    # Load the JSON data
+import log_config
+
+logger = logging.getLogger(__name__)
+
+# Month names as TGO shows them in Turkish order dates (e.g. "12 Mart 2024")
+TURKISH_MONTHS = {
+    'ocak': 1, 'şubat': 2, 'mart': 3, 'nisan': 4, 'mayıs': 5, 'haziran': 6,
+    'temmuz': 7, 'ağustos': 8, 'eylül': 9, 'ekim': 10, 'kasım': 11, 'aralık': 12
+}
+
+# Numeric date layouts we've seen in order dates
+DATE_FORMATS = ['%d.%m.%Y', '%d/%m/%Y', '%d-%m-%Y', '%Y-%m-%d']
+
+# Stable key for an order, used to tell new orders from ones we already have
+def get_order_key(order):
+    # Prefer the id the API gives us
+    for key in ('orderId', 'orderNumber', 'id', 'orderNo'):
+        value = order.get(key)
+        if value not in (None, ''):
+            return str(value)
+    
+    # Fall back to a hash of the fields we read from the order
+    fields = [
+        order.get('orderDate', ''),
+        order.get('store', {}).get('name', ''),
+        order.get('product', {}).get('name', ''),
+        str(order.get('price', {}).get('totalPrice', ''))
+    ]
+    return hashlib.sha1('|'.join(fields).encode('utf-8')).hexdigest()[:16]
+
+# Parse the date and time split from orderDate into epoch seconds (local time),
+# returns None if the date isn't in a format we know
+def parse_order_timestamp(date, time):
+    date = (date or '').strip()
+    if not date:
+        return None
+    
+    parsed = None
+    for date_format in DATE_FORMATS:
+        try:
+            parsed = datetime.datetime.strptime(date, date_format)
+            break
+        except ValueError:
+            pass
+    
+    # Try "day month-name year" with a Turkish month name
+    if parsed is None:
+        parts = date.replace('I', 'ı').replace('İ', 'i').lower().split()
+        if len(parts) >= 3 and parts[1] in TURKISH_MONTHS:
+            try:
+                parsed = datetime.datetime(int(parts[2]), TURKISH_MONTHS[parts[1]], int(parts[0]))
+            except ValueError:
+                return None
+        else:
+            return None
+    
+    # Add the time of day if there is one
+    try:
+        hour, minute = (time or '').strip().split(':')[:2]
+        parsed = parsed.replace(hour=int(hour), minute=int(minute))
+    except ValueError:
+        pass
+    
+    return int(parsed.timestamp())
+
+# Columns of the exported CSV, in order
+CSV_FIELDS = ['Order ID', 'Item Name', 'Restaurant Name', 'Restaurant Location', 'Date', 'Time', 'Price (TL)', 'Status']
+
+# How much of the JSON file to read at a time while streaming
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+_NUMBER_CHARS = '0123456789+-.eE'
+
+# Incrementally walk the top-level "orders" array of a JSON export,
+# yielding one order at a time without loading the whole file
+def iter_orders(json_file, chunk_size=STREAM_CHUNK_SIZE):
     with open(json_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+        buffer = ''
+        pos = 0
+        eof = False
+        
+        # Make sure there is unread data in the buffer, returns False at end of file
+        def fill():
+            nonlocal buffer, pos, eof
+            # Drop what we've already consumed so memory stays bounded
+            if pos > chunk_size:
+                buffer = buffer[pos:]
+                pos = 0
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buffer += chunk
+            return True
+        
+        # Advance past whitespace, returns the next character or '' at end of file
+        def peek():
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                    pos += 1
+                if pos < len(buffer):
+                    return buffer[pos]
+                if not fill():
+                    return ''
+        
+        # Decode one complete JSON value, reading more data if it is cut off
+        def decode():
+            nonlocal pos
+            peek()
+            while True:
+                try:
+                    value, end = _decoder.raw_decode(buffer, pos)
+                    # A number cut off by the end of the buffer continues in the next chunk
+                    if eof or (end < len(buffer) and buffer[end] not in _NUMBER_CHARS):
+                        pos = end
+                        return value
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill()
+        
+        def expect(char):
+            nonlocal pos
+            if peek() != char:
+                raise ValueError(f"Unexpected JSON in {json_file}: expected '{char}' at offset {pos}")
+            pos += 1
+        
+        expect('{')
+        if peek() == '}':
+            return
+        
+        while True:
+            key = decode()
+            expect(':')
+            
+            if key == 'orders' and peek() == '[':
+                pos += 1
+                if peek() == ']':
+                    pos += 1
+                else:
+                    while True:
+                        yield decode()
+                        if peek() == ',':
+                            pos += 1
+                            continue
+                        expect(']')
+                        break
+            else:
+                # Skip any other top-level value
+                decode()
+            
+            if peek() == ',':
+                pos += 1
+                continue
+            expect('}')
+            return
+
+# Turn a raw TGO order into a flat row keyed by the CSV column names
+def normalize_order(order):
+    # Extract item name
+    item_name = order.get('product', {}).get('name', 'Unknown')
+    
+    # Extract restaurant info
+    restaurant = order.get('store', {})
+    restaurant_name = restaurant.get('name', 'Unknown')
     
-    # Create CSV file
+    # Extract location from restaurant name if available (usually in parentheses)
+    restaurant_location = 'Unknown'
+    if '(' in restaurant_name and ')' in restaurant_name:
+        start_idx = restaurant_name.find('(')
+        end_idx = restaurant_name.find(')')
+        if start_idx < end_idx:
+            restaurant_location = restaurant_name[start_idx+1:end_idx].strip()
+            # Clean up restaurant name by removing the location part
+            restaurant_name = restaurant_name[:start_idx].strip()
+    
+    # Extract date and time
+    order_date = order.get('orderDate', '')
+    date_parts = order_date.split(' / ')
+    date = date_parts[0] if len(date_parts) > 0 else ''
+    time = date_parts[1] if len(date_parts) > 1 else ''
+    
+    # Extract price
+    price = order.get('price', {}).get('totalPrice', 0)
+    
+    # Extract status
+    status_text = order.get('status', {}).get('statusText', '')
+    
+    return {
+        'Order ID': get_order_key(order),
+        'Item Name': item_name,
+        'Restaurant Name': restaurant_name,
+        'Restaurant Location': restaurant_location,
+        'Date': date,
+        'Time': time,
+        'Price (TL)': price,
+        'Status': status_text
+    }
+
+# Stream normalized rows straight from the JSON export
+def iter_order_rows(json_file):
+    for order in iter_orders(json_file):
+        yield normalize_order(order)
+
+# Hash of the JSON export, used to skip imports when nothing changed
+def get_file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Export the JSON to CSV, one order at a time. New and changed orders are
+# upserted into the order store (order_store.ingest_orders), not here; the CSV
+# is a plain export of the last full download
+def parse_orders_to_csv(json_file, csv_file):
     with open(csv_file, 'w', encoding='utf-8', newline='') as f:
         csv_writer = csv.writer(f)
         
         # Write header
-        csv_writer.writerow(['Item Name', 'Restaurant Name', 'Restaurant Location', 'Date', 'Time', 'Price (TL)', 'Status'])
+        csv_writer.writerow(CSV_FIELDS)
         
-        # Process each order
-        for order in data.get('orders', []):
-            # Extract item name
-            item_name = order.get('product', {}).get('name', 'Unknown')
-            
-            # Extract restaurant info
-            restaurant = order.get('store', {})
-            restaurant_name = restaurant.get('name', 'Unknown')
-            
-            # Extract location from restaurant name if available (usually in parentheses)
-            restaurant_location = 'Unknown'
-            if '(' in restaurant_name and ')' in restaurant_name:
-                start_idx = restaurant_name.find('(')
-                end_idx = restaurant_name.find(')')
-                if start_idx < end_idx:
-                    restaurant_location = restaurant_name[start_idx+1:end_idx].strip()
-                    # Clean up restaurant name by removing the location part
-                    restaurant_name = restaurant_name[:start_idx].strip()
-            
-            # Extract date and time
-            order_date = order.get('orderDate', '')
-            date_parts = order_date.split(' / ')
-            date = date_parts[0] if len(date_parts) > 0 else ''
-            time = date_parts[1] if len(date_parts) > 1 else ''
-            
-            # Extract price
-            price = order.get('price', {}).get('totalPrice', 0)
-            
-            # Extract status
-            status_text = order.get('status', {}).get('statusText', '')
-            
-            # Write to CSV
-            csv_writer.writerow([item_name, restaurant_name, restaurant_location, date, time, price, status_text])
+        # Write each order as soon as it has been parsed
+        for row in iter_order_rows(json_file):
+            csv_writer.writerow([row[field] for field in CSV_FIELDS])
     
-    print(f"CSV file created successfully: {csv_file}")
+    logger.info("CSV file created successfully: %s", csv_file)
     return csv_file
 
 if __name__ == "__main__":
+    log_config.setup_logging(log_config.CLI_FORMAT)
+    
     # Input and output file paths
     json_file = "orders_data.json"
     csv_file = "orders_summary.csv"
     
     # Check if the input file exists
     if not os.path.exists(json_file):
-        print(f"Error: {json_file} not found. Please make sure the file exists.")
+        logger.error("%s not found. Please make sure the file exists.", json_file)
     else:
         # Process the file
         output_file = parse_orders_to_csv(json_file, csv_file)
-        print(f"Orders have been exported to {output_file}") 
\ No newline at end of file
+        logger.info("Orders have been exported to %s", output_file) 
\ No newline at end of file
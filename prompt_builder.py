@@ -0,0 +1,177 @@
+import os
+import heapq
+import datetime
+from collections import Counter
+
+import config
+from order_analytics import get_order_hour
+
+config.load()
+
+# Rough size of the order history section sent to Claude, in tokens
+PROMPT_TOKEN_BUDGET = int(os.getenv("CLAUDE_PROMPT_TOKEN_BUDGET", "1500"))
+
+# Turkish text averages about 3 characters per token; erring low keeps us under budget
+CHARS_PER_TOKEN = 3
+
+# Most lines any one list section can get, however much budget is left
+MAX_LIST_LINES = 25
+
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def _quantiles(sorted_values, fractions):
+    # Linear interpolation between the closest ranks, like numpy's default
+    last = len(sorted_values) - 1
+    result = []
+    for fraction in fractions:
+        position = fraction * last
+        low = int(position)
+        high = min(low + 1, last)
+        result.append(sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low))
+    return result
+
+def _format_price(value):
+    return f"{value:,.0f}"
+
+def summarize_orders(orders):
+    """Compact statistics over the whole order history, in one pass"""
+
+    restaurant_counts = Counter()
+    restaurant_spend = Counter()
+    item_counts = Counter()
+    hour_counts = Counter()
+    weekday_counts = [0] * 7
+    prices = []
+    timestamps = []
+
+    # Each distinct time string is parsed once, and the weekday looked up once
+    # per quarter hour (every timezone offset and DST switch falls on one)
+    hour_of = {}
+    weekday_of = {}
+
+    for order in orders:
+        restaurant = f"{order['Restaurant Name']} ({order['Restaurant Location']})"
+        price = float(order['Price (TL)'])
+
+        restaurant_counts[restaurant] += 1
+        restaurant_spend[restaurant] += price
+        item_counts[order['Item Name']] += 1
+        prices.append(price)
+
+        time_str = order['Time']
+        hour = hour_of.get(time_str, -1)
+        if hour == -1:
+            hour = hour_of[time_str] = get_order_hour(time_str)
+        if hour is not None:
+            hour_counts[hour] += 1
+
+        timestamp = order.get('Timestamp')
+        if timestamp is not None:
+            timestamps.append(timestamp)
+            slot = timestamp // 900
+            weekday = weekday_of.get(slot)
+            if weekday is None:
+                weekday = weekday_of[slot] = datetime.datetime.fromtimestamp(timestamp).weekday()
+            weekday_counts[weekday] += 1
+
+    prices.sort()
+
+    # Most recent first; orders without a timestamp keep their place at the end
+    recent = heapq.nlargest(MAX_LIST_LINES, orders, key=lambda order: order.get('Timestamp') or 0)
+
+    return {
+        'order_count': len(orders),
+        'first_order': min(timestamps) if timestamps else None,
+        'last_order': max(timestamps) if timestamps else None,
+        'total_spend': sum(prices),
+        'price_quantiles': _quantiles(prices, (0, 0.25, 0.5, 0.75, 1)) if prices else [],
+        'restaurants': [
+            (restaurant, count, restaurant_spend[restaurant])
+            for restaurant, count in restaurant_counts.most_common(MAX_LIST_LINES)
+        ],
+        'restaurant_count': len(restaurant_counts),
+        'items': item_counts.most_common(MAX_LIST_LINES),
+        'item_count': len(item_counts),
+        'hour_counts': sorted(hour_counts.items()),
+        'weekday_counts': weekday_counts,
+        'recent': recent
+    }
+
+def render_summary(summary, token_budget=PROMPT_TOKEN_BUDGET):
+    """The order history section of the prompt, kept within the token budget.
+
+    Overview, price and time distributions always come first. Restaurants,
+    items and recent orders then get one line each in turn until the budget
+    is used up, so none of them crowds out the others.
+    """
+
+    def format_date(timestamp):
+        return datetime.datetime.fromtimestamp(timestamp).strftime('%d.%m.%Y')
+
+    header = [f"Orders: {summary['order_count']}"
+              f" from {summary['restaurant_count']} restaurants, {summary['item_count']} different items,"
+              f" {_format_price(summary['total_spend'])} TL in total"]
+    if summary['first_order'] is not None:
+        header[0] += f", between {format_date(summary['first_order'])} and {format_date(summary['last_order'])}"
+
+    if summary['price_quantiles']:
+        low, q1, median, q3, high = summary['price_quantiles']
+        header.append(
+            f"Order price (TL): min {_format_price(low)}, 25% {_format_price(q1)}, median {_format_price(median)},"
+            f" 75% {_format_price(q3)}, max {_format_price(high)}"
+        )
+    if summary['hour_counts']:
+        header.append("Orders by hour: " + ", ".join(f"{hour:02d}h {count}" for hour, count in summary['hour_counts']))
+    if any(summary['weekday_counts']):
+        header.append("Orders by weekday: " + ", ".join(
+            f"{day} {count}" for day, count in zip(WEEKDAYS, summary['weekday_counts'])
+        ))
+
+    sections = [
+        ("Most ordered restaurants (orders, spend):", [
+            f"- {restaurant}: {count}x, {_format_price(spend)} TL"
+            for restaurant, count, spend in summary['restaurants']
+        ]),
+        ("Most ordered items:", [
+            f"- {item}: {count}x" for item, count in summary['items']
+        ]),
+        ("Most recent orders:", [
+            f"- {order['Item Name']} from {order['Restaurant Name']} ({order['Restaurant Location']})"
+            f" on {order['Date']} at {order['Time']} for {order['Price (TL)']} TL"
+            for order in summary['recent']
+        ])
+    ]
+
+    budget = token_budget - estimate_tokens("\n".join(header))
+    budget -= sum(estimate_tokens(title) for title, lines in sections if lines)
+
+    # Hand out lines round-robin while they fit
+    taken = [0] * len(sections)
+    progress = True
+    while progress:
+        progress = False
+        for index, (title, lines) in enumerate(sections):
+            if taken[index] < len(lines):
+                cost = estimate_tokens(lines[taken[index]])
+                if cost <= budget:
+                    budget -= cost
+                    taken[index] += 1
+                    progress = True
+
+    text = "\n".join(header)
+    for (title, lines), count in zip(sections, taken):
+        if count:
+            text += "\n\n" + title + "\n" + "\n".join(lines[:count])
+    return text
+
+def build_prompt(template, orders, token_budget=PROMPT_TOKEN_BUDGET):
+    """Split the prompt into the static instructions and the order history section"""
+
+    history = render_summary(summarize_orders(orders), token_budget)
+    instructions = template.replace(
+        "{order_history}", "(My order history is summarized at the end of this message.)"
+    )
+    return instructions, "My order history:\n\n" + history
@@ -0,0 +1,280 @@
+import os
+import time
+import logging
+import threading
+
+import numpy as np
+from scipy import sparse
+
+import name_index
+import order_store
+import tenants
+from food_classifier import turkish_fold
+
+logger = logging.getLogger(__name__)
+
+# How old (seconds) the model may get before it is rebuilt in the background
+RECOMMENDER_MAX_AGE = int(os.getenv("RECOMMENDER_MAX_AGE", "3600"))
+
+# Least time (seconds) between two rebuilds; imports arriving meanwhile are picked up by one rebuild
+RECOMMENDER_REBUILD_INTERVAL = int(os.getenv("RECOMMENDER_REBUILD_INTERVAL", "60"))
+
+# How many items to recommend
+TOP_N = 5
+
+# Recommendations cached per model, beyond this many users the oldest are dropped
+MAX_CACHED_RESULTS = 10000
+
+class ItemModel:
+    """Sparse item matrices over every chat's order history.
+
+    - Co-occurrence (items x items): how often two items were ordered from
+      the same restaurant on the same day, by anyone.
+    - A name index over the items, for items named like a given one.
+    - Users x items, for item-based collaborative filtering. Item similarity
+      is the cosine of the (log-damped) item columns. The item x item
+      similarity matrix is never built: a user's scores are two sparse
+      products, normalized.T @ (normalized @ user), so scoring costs the
+      nonzeros touched, not items squared.
+    """
+
+    def __init__(self, item_names, user_ids, user_items, baskets):
+        self.item_names = item_names
+        self.item_ids = {turkish_fold(name): item for item, name in enumerate(item_names)}
+        self.user_rows = {user: row for row, user in enumerate(user_ids)}
+        self.user_items = user_items.tocsr()
+
+        # Names aren't merged here, items spelled alike already share one column
+        self.names = name_index.NameIndex()
+        for name in item_names:
+            self.names.add(name, merge=False)
+
+        cooccurrence = (baskets.T @ baskets).tocsr()
+        cooccurrence.setdiag(0)
+        cooccurrence.eliminate_zeros()
+        self.cooccurrence = cooccurrence
+
+        weighted = self.user_items.astype(np.float64)
+        weighted.data = np.log1p(weighted.data)
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=0)).ravel())
+        norms[norms == 0] = 1.0
+        self.normalized = (weighted @ sparse.diags(1.0 / norms)).tocsr()
+        self.normalized_t = self.normalized.T.tocsr()
+
+        self.built_at = time.monotonic()
+        self._results = {}
+        self._results_lock = threading.Lock()
+
+    @property
+    def age(self):
+        return time.monotonic() - self.built_at
+
+    def _top(self, scores, n, exclude=()):
+        scores = scores.copy()
+        scores[np.asarray(exclude, dtype=np.int64)] = 0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > n:
+            candidates = candidates[np.argpartition(scores[candidates], -n)[-n:]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(self.item_names[item], float(scores[item])) for item in candidates]
+
+    def recommend(self, user, n=TOP_N):
+        """Items this user hasn't ordered that users with similar tastes order, as (item, score)"""
+
+        key = (str(user), n)
+        cached = self._results.get(key)
+        if cached is not None:
+            return cached
+
+        row = self.user_rows.get(str(user))
+        if row is None:
+            return []
+
+        # How much every other user's taste overlaps with this one's...
+        user_vector = self.normalized[row]
+        overlap = np.asarray((self.normalized @ user_vector.T).todense()).ravel()
+        overlap[row] = 0
+
+        # ...and what those users order, weighted by the overlap
+        scores = self.normalized_t @ overlap
+        tried = self.user_items.indices[self.user_items.indptr[row]:self.user_items.indptr[row + 1]]
+        result = self._top(scores, n, tried)
+
+        with self._results_lock:
+            if len(self._results) >= MAX_CACHED_RESULTS:
+                self._results.pop(next(iter(self._results)))
+            self._results[key] = result
+        return result
+
+    def similar_items(self, item_name, n=TOP_N):
+        """Items most often ordered together with this one, as (item, times together)"""
+
+        item = self.item_ids.get(turkish_fold(item_name))
+        if item is None:
+            return []
+        row = self.cooccurrence.getrow(item)
+        scores = np.zeros(len(self.item_names))
+        scores[row.indices] = row.data
+        return [(name, int(count)) for name, count in self._top(scores, n)]
+
+    def similar_names(self, item_name, n=TOP_N):
+        """Items named most like this one (e.g. "Tavuk Döner Dürüm" for "Et Döner Dürüm"), as (item, score)"""
+
+        return self.names.similar(item_name, n)
+
+def build_model(histories):
+    """Build the model from (user, orders) pairs, orders being (item name, date, restaurant) tuples"""
+
+    item_ids = {}
+    item_names = []
+    user_ids = []
+    user_rows, user_cols = [], []
+    basket_ids = {}
+    basket_rows, basket_cols = [], []
+
+    folded = {}
+
+    for user, orders in histories:
+        row = len(user_ids)
+        user_ids.append(str(user))
+        for item_name, date, restaurant in orders:
+            key = folded.get(item_name)
+            if key is None:
+                key = folded[item_name] = turkish_fold(item_name)
+            item = item_ids.get(key)
+            if item is None:
+                item = item_ids[key] = len(item_names)
+                item_names.append(item_name)
+
+            user_rows.append(row)
+            user_cols.append(item)
+
+            # A basket is one user's orders from one restaurant on one day
+            basket = basket_ids.setdefault((row, date, restaurant), len(basket_ids))
+            basket_rows.append(basket)
+            basket_cols.append(item)
+
+    shape = (len(user_ids), len(item_names))
+    user_items = sparse.coo_matrix((np.ones(len(user_rows), dtype=np.int32), (user_rows, user_cols)), shape=shape)
+
+    # Each item counts once per basket
+    baskets = sparse.coo_matrix(
+        (np.ones(len(basket_rows), dtype=np.int32), (basket_rows, basket_cols)),
+        shape=(len(basket_ids), len(item_names))
+    ).tocsr()
+    baskets.data[:] = 1
+
+    return ItemModel(item_names, user_ids, user_items, baskets)
+
+# Order history of every chat read by the last build, as chat id -> (store version, rows)
+_histories = {}
+
+def _read_history(db_file, cached=None):
+    # The cached rows while the store's version is unchanged, otherwise the store's rows
+    conn = order_store.connect(db_file)
+    try:
+        version = order_store.get_meta(conn, 'version', '0')
+        if cached is not None and cached[0] == version:
+            return cached
+        return version, conn.execute(
+            "SELECT i.name, o.order_date, o.restaurant_id FROM orders o JOIN items i ON i.id = o.item_id"
+        ).fetchall()
+    finally:
+        conn.close()
+
+def build_model_from_tenants(root=tenants.TENANTS_DIR):
+    """Build the model over every chat's order store.
+
+    Only the stores that changed since the last build are read again.
+    """
+
+    global _histories
+
+    started = time.perf_counter()
+    histories = {}
+    read = 0
+    for chat_id in tenants.iter_chat_ids(root):
+        cached = _histories.get(chat_id)
+        histories[chat_id] = _read_history(tenants.Tenant(chat_id, root).db_file, cached)
+        read += histories[chat_id] is not cached
+    _histories = histories
+
+    model = build_model((chat_id, rows) for chat_id, (_, rows) in histories.items())
+    logger.info("Built recommender over %d users (%d read again) and %d items in %.2fs",
+                len(model.user_rows), read, len(model.item_names), time.perf_counter() - started)
+    return model
+
+_model = None
+_model_lock = threading.Lock()
+_rebuilding = False
+_rebuild_again = False
+
+# When the last build started (monotonic), whether it worked or not
+_last_build = None
+
+def _rebuild(root):
+    global _model, _rebuilding, _rebuild_again, _last_build
+    while True:
+        # Imports in quick succession (in any chat) wait for one later rebuild
+        if _last_build is not None:
+            time.sleep(max(0.0, _last_build + RECOMMENDER_REBUILD_INTERVAL - time.monotonic()))
+
+        _last_build = time.monotonic()
+        try:
+            _model = build_model_from_tenants(root)
+        except Exception:
+            logger.exception("Rebuilding the recommender failed")
+
+        # Orders that changed while building may have been missed, build once more
+        with _model_lock:
+            if not _rebuild_again:
+                _rebuilding = False
+                return
+            _rebuild_again = False
+
+def _start_rebuild(root, again=False):
+    global _rebuilding, _rebuild_again
+    with _model_lock:
+        if _rebuilding:
+            _rebuild_again = _rebuild_again or again
+            return
+        _rebuilding = True
+    threading.Thread(target=_rebuild, args=(root,), daemon=True).start()
+
+def refresh(root=tenants.TENANTS_DIR):
+    """Rebuild the model in the background, e.g. after a chat imported new orders.
+
+    At most one rebuild runs every RECOMMENDER_REBUILD_INTERVAL seconds.
+    """
+
+    _start_rebuild(root, again=True)
+
+def get_model(root=tenants.TENANTS_DIR):
+    """The shared model, None until it was first built.
+
+    It is built in the background, on first use and again once it's too old.
+    A model over no orders is kept like any other, and a failed build is
+    only retried once the model would have been too old.
+    """
+
+    if _last_build is None or time.monotonic() - _last_build > RECOMMENDER_MAX_AGE:
+        _start_rebuild(root)
+    return _model
+
+def recommend(chat_id, n=TOP_N):
+    """Items similar users order that this chat hasn't tried yet, as (item, score)"""
+
+    model = get_model()
+    return model.recommend(chat_id, n) if model else []
+
+def similar_items(item_name, n=TOP_N):
+    """Items most often ordered together with this one, as (item, times together)"""
+
+    model = get_model()
+    return model.similar_items(item_name, n) if model else []
+
+def similar_names(item_name, n=TOP_N):
+    """Items named most like this one, over every chat's orders, as (item, score)"""
+
+    model = get_model()
+    return model.similar_names(item_name, n) if model else []
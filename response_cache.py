@@ -0,0 +1,92 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+
+import config
+
+config.load()
+
+# SQLite file holding cached Claude responses
+CLAUDE_CACHE_DB = os.getenv("CLAUDE_CACHE_DB", "claude_cache.db")
+
+# Responses older than this (seconds) are fetched again
+CACHE_TTL = int(os.getenv("CLAUDE_CACHE_TTL", str(24 * 3600)))
+
+# Least recently used responses are dropped beyond this many
+CACHE_MAX_ENTRIES = int(os.getenv("CLAUDE_CACHE_MAX_ENTRIES", "200"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_responses_used_at ON responses (used_at);
+"""
+
+def make_key(*parts):
+    """Content hash of everything that shapes a response (model, prompt, limits, ...)"""
+
+    data = json.dumps(parts, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+def _connect(cache_file):
+    conn = sqlite3.connect(cache_file)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def get(key, cache_file=CLAUDE_CACHE_DB, ttl=CACHE_TTL):
+    """The cached response for a key, or None if missing or expired"""
+
+    if not os.path.exists(cache_file):
+        return None
+
+    now = time.time()
+    conn = _connect(cache_file)
+    try:
+        with conn:
+            row = conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created_at >= ?",
+                (key, now - ttl)
+            ).fetchone()
+            if row:
+                conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+def put(key, response, cache_file=CLAUDE_CACHE_DB, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+    """Store a response, dropping expired and least recently used ones"""
+
+    now = time.time()
+    conn = _connect(cache_file)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            conn.execute("DELETE FROM responses WHERE created_at < ?", (now - ttl,))
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (max_entries,)
+            )
+    finally:
+        conn.close()
+
+def clear(cache_file=CLAUDE_CACHE_DB):
+    """Drop every cached response"""
+
+    if os.path.exists(cache_file):
+        conn = _connect(cache_file)
+        try:
+            with conn:
+                conn.execute("DELETE FROM responses")
+        finally:
+            conn.close()
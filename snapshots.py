@@ -0,0 +1,141 @@
+import os
+import pickle
+import logging
+import threading
+
+import order_store
+import time_index
+import food_recommendation_simple
+
+logger = logging.getLogger(__name__)
+
+# File next to the order store holding its snapshot
+SNAPSHOT_FILE = "snapshot.pickle"
+
+# How many restaurants and recent orders the snapshot keeps
+TOP_RESTAURANTS = 10
+RECENT_ORDERS = 10
+
+# Bumped whenever the snapshot's layout changes, older files are rebuilt
+SNAPSHOT_VERSION = 2
+
+# Snapshots loaded in this process, by file
+_snapshots = {}
+_lock = threading.Lock()
+
+def build(db_file=order_store.ORDERS_DB):
+    """Everything the bot shows from the order store, computed in one go.
+
+    Time-dependent parts (the current hour, weekends, "this month") are left
+    out and applied when serving, so the snapshot stays valid until the
+    order data changes.
+    """
+
+    conn = order_store.connect(db_file)
+    try:
+        store_version = order_store.get_meta(conn, 'version', '0')
+    finally:
+        conn.close()
+
+    analysis = order_store.get_analysis(db_file)
+    return {
+        'snapshot_version': SNAPSHOT_VERSION,
+        'store_version': store_version,
+        'analysis': analysis,
+        'recommendation': food_recommendation_simple.prepare_recommendation(analysis),
+        'top_restaurants': order_store.top_restaurants(db_file, TOP_RESTAURANTS),
+        'recent_orders': order_store.recent_orders(db_file, RECENT_ORDERS),
+        'time_index': order_store.get_time_index(db_file)
+    }
+
+def save(snapshot, snapshot_file):
+    # Written next to the old one and swapped in, so readers never see half a file
+    temp_file = f"{snapshot_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_file, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_file, snapshot_file)
+
+def refresh(db_file=order_store.ORDERS_DB, snapshot_file=SNAPSHOT_FILE):
+    """Rebuild the snapshot after the order data changed, and store it on disk"""
+
+    snapshot = build(db_file)
+    save(snapshot, snapshot_file)
+    with _lock:
+        _snapshots[os.path.abspath(snapshot_file)] = snapshot
+
+    logger.info("Snapshot of %s saved to %s", db_file, snapshot_file)
+    return snapshot
+
+def _load(snapshot_file):
+    try:
+        with open(snapshot_file, 'rb') as f:
+            snapshot = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Ignoring unreadable snapshot %s: %s", snapshot_file, e)
+        return None
+
+    if not isinstance(snapshot, dict) or snapshot.get('snapshot_version') != SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+def get(db_file=order_store.ORDERS_DB, snapshot_file=SNAPSHOT_FILE):
+    """The current snapshot of the order store, or None if it has no orders.
+
+    Served from memory; the first call in a process loads it from disk,
+    and it is only rebuilt if it is missing or older than the store.
+    """
+
+    path = os.path.abspath(snapshot_file)
+    snapshot = _snapshots.get(path)
+    if snapshot is not None:
+        return snapshot
+
+    if not order_store.has_orders(db_file):
+        return None
+
+    snapshot = _load(snapshot_file)
+    if snapshot is not None:
+        conn = order_store.connect(db_file)
+        try:
+            if order_store.get_meta(conn, 'version', '0') != snapshot['store_version']:
+                snapshot = None
+        finally:
+            conn.close()
+
+    if snapshot is None:
+        return refresh(db_file, snapshot_file)
+
+    with _lock:
+        _snapshots.setdefault(path, snapshot)
+    return snapshot
+
+def forget(snapshot_file=SNAPSHOT_FILE):
+    """Drop a snapshot from memory (the file stays)"""
+
+    with _lock:
+        _snapshots.pop(os.path.abspath(snapshot_file), None)
+
+def recommendation(snapshot, now=None):
+    """The simple recommendation, finished for the current time"""
+
+    return food_recommendation_simple.render_recommendation(snapshot['recommendation'], now)
+
+def top_restaurants(snapshot, period='all', limit=5):
+    """Top restaurants of a period (see time_index.window), as (name, location, count)"""
+
+    if period == 'all':
+        return snapshot['top_restaurants'][:limit]
+
+    start, end = time_index.window(period)
+    return [
+        (name, location, count)
+        for (name, location), count in snapshot['time_index'].top_restaurants(limit, start, end)
+    ]
+
+def order_totals(snapshot, period='all'):
+    """Number of orders and money spent (TL) within a period"""
+
+    start, end = time_index.window(period)
+    return snapshot['time_index'].count(start, end), snapshot['time_index'].spend(start, end)
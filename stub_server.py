@@ -0,0 +1,342 @@
+import json
+import random
+import threading
+import time
+import tempfile
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Local stand-in for the TGO orders API so paging can be exercised offline
+
+RESTAURANTS = [
+    "Burger King (Kadıköy)",
+    "Pizza Bulls (Beşiktaş)",
+    "Tostçu Erol (Moda)",
+    "Secret Burger (Cihangir)",
+    "Tavuk Dünyası (Ataşehir)",
+    "Starbucks (Bağdat Caddesi)"
+]
+
+ITEMS = [
+    "Double Secret Burger Menü",
+    "Whopper Menü",
+    "Margarita Pizza",
+    "Karışık Tost",
+    "Chicken Tacos",
+    "Tavuk Şiş Dürüm",
+    "Caffe Latte",
+    "Club Sandwich"
+]
+
+def make_orders(count, seed=0):
+    """Build a newest-first list of fake orders in the TGO response shape"""
+
+    rng = random.Random(seed)
+    orders = []
+    timestamp = time.time()
+    for i in range(count):
+        timestamp -= rng.randint(3600, 3 * 86400)
+        order_time = time.localtime(timestamp)
+        orders.append({
+            "orderId": f"STUB{count - i:08d}",
+            "orderDate": time.strftime("%d.%m.%Y / %H:%M", order_time),
+            "product": {"name": rng.choice(ITEMS)},
+            "store": {"name": rng.choice(RESTAURANTS)},
+            "price": {"totalPrice": round(rng.uniform(80, 600), 2)},
+            "status": {"statusText": "Teslim Edildi"}
+        })
+    return orders
+
+class StubOrdersServer(ThreadingHTTPServer):
+    """Threaded HTTP server that serves pages of fake orders"""
+
+    daemon_threads = True
+
+    def __init__(self, orders, delay=0.0, report_total=True, accepted_token=None, port=0, fail_requests=0,
+                 fail_status=503, retry_after=None):
+        super().__init__(("127.0.0.1", port), StubOrdersHandler)
+        self.orders = orders
+        self.delay = delay
+        self.report_total = report_total
+
+        # The first fail_requests requests are answered fail_status (with a
+        # Retry-After header when retry_after is set), to exercise retries
+        self.fail_requests = fail_requests
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+
+        # When set, any other bearer token is rejected with 401
+        self.accepted_token = accepted_token
+
+        # Request statistics
+        self.lock = threading.Lock()
+        self.requests_served = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def orders_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/orders"
+
+class StubOrdersHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real API
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        parsed = urlparse(self.path)
+
+        if parsed.path != "/orders":
+            self.send_error(404)
+            return
+
+        authorization = self.headers.get("Authorization", "")
+        if not authorization.startswith("Bearer "):
+            self.send_error(401)
+            return
+        if server.accepted_token and authorization != f"Bearer {server.accepted_token}":
+            self.send_error(401)
+            return
+
+        with server.lock:
+            server.requests_served += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            failing = server.fail_requests > 0
+            if failing:
+                server.fail_requests -= 1
+
+        try:
+            if failing:
+                self.send_response(server.fail_status)
+                if server.retry_after is not None:
+                    self.send_header("Retry-After", str(server.retry_after))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            # Simulate network latency
+            if server.delay:
+                time.sleep(server.delay)
+
+            query = parse_qs(parsed.query)
+            page = int(query.get("page", ["1"])[0])
+            page_size = int(query.get("pageSize", ["50"])[0])
+
+            start = (page - 1) * page_size
+            body = {"orders": server.orders[start:start + page_size]}
+            if server.report_total:
+                body["totalCount"] = len(server.orders)
+
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        # Keep the console quiet
+        pass
+
+def start_stub_server(orders, delay=0.0, report_total=True, accepted_token=None, port=0, fail_requests=0,
+                      fail_status=503, retry_after=None):
+    """Start the stub server in a background thread and return it"""
+
+    server = StubOrdersServer(orders, delay=delay, report_total=report_total, accepted_token=accepted_token,
+                              port=port, fail_requests=fail_requests, fail_status=fail_status, retry_after=retry_after)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+# Local stand-in for the Claude messages API, streaming its answer as server-sent events
+
+STUB_RECOMMENDATION = (
+    "Bugün öğle yemeği için Double Secret Burger Menü öneririm; son siparişlerinin çoğu burger.\n\n"
+    "Yeni bir şey denemek istersen Tavuk Dünyası'nın Tavuk Şiş Dürüm'ü fiyat aralığına uyuyor.\n\n"
+    "Genellikle 12:00-14:00 arası sipariş veriyorsun ve hafta sonları daha fazla harcıyorsun."
+)
+
+class StubClaudeServer(ThreadingHTTPServer):
+    """Threaded HTTP server answering /v1/messages with a canned text"""
+
+    daemon_threads = True
+
+    def __init__(self, text=STUB_RECOMMENDATION, chunk_size=8, chunk_delay=0.05, first_delay=0.0, port=0,
+                 error_after=None, fail_requests=0):
+        super().__init__(("127.0.0.1", port), StubClaudeHandler)
+        self.text = text
+        self.chunk_size = chunk_size
+
+        # The first fail_requests requests are answered 503
+        self.fail_requests = fail_requests
+
+        # When set, the stream sends an error event after this many chunks and stops
+        self.error_after = error_after
+
+        # Delay before the first token and between streamed chunks
+        self.first_delay = first_delay
+        self.chunk_delay = chunk_delay
+
+        self.lock = threading.Lock()
+        self.requests_served = 0
+
+    @property
+    def messages_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/messages"
+
+class StubClaudeHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        if urlparse(self.path).path != "/v1/messages":
+            self.send_error(404)
+            return
+        if not self.headers.get("x-api-key"):
+            self.send_error(401)
+            return
+
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))) or b"{}")
+        with server.lock:
+            server.requests_served += 1
+            failing = server.fail_requests > 0
+            if failing:
+                server.fail_requests -= 1
+        if failing:
+            self.send_error(503)
+            return
+
+        if server.first_delay:
+            time.sleep(server.first_delay)
+
+        if not request.get("stream"):
+            # Whole answer at once, after the time streaming would have taken
+            chunks = len(server.text) // server.chunk_size + 1
+            time.sleep(server.chunk_delay * chunks)
+            payload = json.dumps({
+                "type": "message",
+                "content": [{"type": "text", "text": server.text}]
+            }, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        self._send_event("message_start", {"type": "message_start", "message": {"content": []}})
+        self._send_event("content_block_start", {"type": "content_block_start", "index": 0,
+                                                 "content_block": {"type": "text", "text": ""}})
+        for chunk, start in enumerate(range(0, len(server.text), server.chunk_size)):
+            if server.error_after is not None and chunk >= server.error_after:
+                self._send_event("error", {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}})
+                return
+            self._send_event("content_block_delta", {
+                "type": "content_block_delta", "index": 0,
+                "delta": {"type": "text_delta", "text": server.text[start:start + server.chunk_size]}
+            })
+            time.sleep(server.chunk_delay)
+        self._send_event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        self._send_event("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn"}})
+        self._send_event("message_stop", {"type": "message_stop"})
+
+    def _send_event(self, event, data):
+        self.wfile.write(f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_claude_server(text=STUB_RECOMMENDATION, chunk_size=8, chunk_delay=0.05, first_delay=0.0, port=0,
+                             error_after=None, fail_requests=0):
+    """Start the Claude stub in a background thread and return it"""
+
+    server = StubClaudeServer(text, chunk_size=chunk_size, chunk_delay=chunk_delay, first_delay=first_delay, port=port,
+                              error_after=error_after, fail_requests=fail_requests)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+if __name__ == "__main__":
+    import http_client
+    import login_flow
+
+    total_orders = 1000
+    page_size = 50
+    delay = 0.2
+
+    # Run the fetcher against the stub, once with a page count and once without
+    for report_total in (True, False):
+        server = start_stub_server(make_orders(total_orders), delay=delay, report_total=report_total)
+        json_file = os.path.join(tempfile.gettempdir(), "stub_orders_data.json")
+
+        started = time.perf_counter()
+        orders_data = login_flow.fetch_orders(
+            http_client.new_session(),
+            {"access_token": "stub-token-0123456789abcdef"},
+            json_file=json_file,
+            url=server.orders_url,
+            page_size=page_size
+        )
+        elapsed = time.perf_counter() - started
+        server.shutdown()
+
+        fetched = len(orders_data['orders']) if orders_data else 0
+        print(f"\n===== STUB RUN (page count reported: {report_total}) =====")
+        print(f"Fetched {fetched}/{total_orders} orders in {elapsed:.2f}s")
+        print(f"Requests served: {server.requests_served}, max concurrent: {server.max_in_flight}")
+        print(f"Sequential fetching would take about {server.requests_served * delay:.2f}s")
+
+    # Fetch from a stub whose first answers fail; the client retries them
+    server = start_stub_server(make_orders(total_orders), fail_requests=3)
+    timings = []
+    http_client.add_timing_hook(lambda upstream, method, url, status, elapsed, attempt, error: timings.append(status))
+    orders_data = login_flow.fetch_orders(
+        http_client.new_session(),
+        {"access_token": "stub-token-0123456789abcdef"},
+        json_file=os.path.join(tempfile.gettempdir(), "stub_orders_data.json"),
+        url=server.orders_url,
+        page_size=page_size
+    )
+    server.shutdown()
+
+    fetched = len(orders_data['orders']) if orders_data else 0
+    print("\n===== STUB RUN (first 3 requests fail) =====")
+    print(f"Fetched {fetched}/{total_orders} orders, {timings.count(503)} failed call(s) retried, "
+          f"{len(timings)} HTTP calls in total")
+
+    # Stream a recommendation from the Claude stub and compare time to first content
+    import food_recommendation
+
+    claude = start_stub_claude_server(chunk_delay=0.05)
+    food_recommendation.CLAUDE_API_URL = claude.messages_url
+    os.environ.setdefault("ANTHROPIC_API_KEY", "stub-key")
+    orders = [{
+        'Item Name': order['product']['name'], 'Restaurant Name': order['store']['name'],
+        'Restaurant Location': '', 'Date': '', 'Time': '', 'Price (TL)': order['price']['totalPrice']
+    } for order in make_orders(20)]
+    cache_file = os.path.join(tempfile.gettempdir(), "stub_claude_cache.db")
+
+    started = time.perf_counter()
+    first = None
+    for part in food_recommendation.stream_food_recommendation(orders, refresh=True, cache_file=cache_file):
+        if first is None:
+            first = time.perf_counter() - started
+    streamed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    food_recommendation.get_food_recommendation(orders, refresh=True, cache_file=cache_file)
+    blocking = time.perf_counter() - started
+    claude.shutdown()
+
+    print("\n===== CLAUDE STUB RUN =====")
+    print(f"Streaming: first content after {first:.2f}s, complete after {streamed:.2f}s")
+    print(f"Blocking: complete answer after {blocking:.2f}s")
@@ -0,0 +1,207 @@
+import os
+import time
+import asyncio
+import logging
+
+from telebot.asyncio_helper import ApiTelegramException
+
+import config
+
+config.load()
+logger = logging.getLogger(__name__)
+
+# Telegram allows about 30 messages a second overall and 1 a second per chat
+GLOBAL_RATE = float(os.getenv("BOT_GLOBAL_RATE", "30"))
+CHAT_RATE = float(os.getenv("BOT_CHAT_RATE", "1"))
+
+# Short bursts allowed on top of the steady rate
+GLOBAL_BURST = 30
+CHAT_BURST = 3
+
+# How many times a call is retried after Telegram answers 429 Too Many Requests
+MAX_RETRIES = 5
+
+# Idle per-chat buckets are dropped once there are more than this many
+MAX_CHAT_BUCKETS = 10000
+
+class TokenBucket:
+    """Allows `rate` calls a second on average, with bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    @property
+    def idle(self):
+        self._refill()
+        return self.tokens >= self.capacity
+
+    async def wait(self):
+        """Wait until a call would be allowed, without using it up"""
+
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def hold(self, seconds):
+        """Make every caller wait at least `seconds`, e.g. after a 429"""
+
+        self._refill()
+        self.tokens = min(self.tokens, 1) - seconds * self.rate
+
+class TelegramDispatcher:
+    """Sends everything the bot says through per-chat and global rate limits.
+
+    Calls wait for a token from the chat's bucket and then from the global
+    one, and are retried after the server's retry_after when Telegram
+    answers 429. Status updates for the same message are coalesced: only
+    the latest text is sent once the chat has a token free.
+    """
+
+    def __init__(self, bot, global_rate=GLOBAL_RATE, chat_rate=CHAT_RATE):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.global_bucket = TokenBucket(global_rate, GLOBAL_BURST)
+        self._chat_buckets = {}
+
+        # Latest wanted text of each status message, and the text last sent while it is being updated
+        self._pending_status = {}
+        self._sent_status = {}
+        self._status_tasks = {}
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= MAX_CHAT_BUCKETS:
+                self._chat_buckets = {
+                    key: value for key, value in self._chat_buckets.items() if not value.idle
+                }
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, CHAT_BURST)
+        return bucket
+
+    async def call(self, chat_id, method, *args, **kwargs):
+        """Call a bot API method that talks to a chat, within the rate limits"""
+
+        chat_bucket = self._chat_bucket(chat_id)
+        for attempt in range(MAX_RETRIES + 1):
+            await chat_bucket.acquire()
+            await self.global_bucket.acquire()
+            try:
+                return await method(*args, **kwargs)
+            except ApiTelegramException as e:
+                if e.error_code != 429 or attempt == MAX_RETRIES:
+                    raise
+                retry_after = (e.result_json.get('parameters') or {}).get('retry_after', 1)
+                logger.warning("Telegram rate limit hit for chat %s, retrying in %ss", chat_id, retry_after)
+                chat_bucket.hold(retry_after)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        return await self.call(chat_id, self.bot.send_message, chat_id, text, **kwargs)
+
+    async def send_messages(self, chat_id, texts, **kwargs):
+        """Send several messages in order, paced by the chat's rate limit"""
+
+        return [await self.send_message(chat_id, text, **kwargs) for text in texts]
+
+    async def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        return await self.call(chat_id, self.bot.edit_message_text, text, chat_id, message_id, **kwargs)
+
+    async def delete_message(self, chat_id, message_id):
+        return await self.call(chat_id, self.bot.delete_message, chat_id, message_id)
+
+    async def send_chat_action(self, chat_id, action):
+        return await self.call(chat_id, self.bot.send_chat_action, chat_id, action)
+
+    async def reply_to(self, message, text, **kwargs):
+        return await self.call(message.chat.id, self.bot.reply_to, message, text, **kwargs)
+
+    def update_status(self, chat_id, message_id, text):
+        """Show `text` in a status message; updates in quick succession become one edit"""
+
+        key = (chat_id, message_id)
+        self._pending_status[key] = text
+        if key not in self._status_tasks:
+            self._status_tasks[key] = asyncio.create_task(self._flush_status(key))
+        return self._status_tasks[key]
+
+    async def _flush_status(self, key):
+        chat_id, message_id = key
+        try:
+            while key in self._pending_status:
+                # Wait until the chat may be written to; newer text may arrive meanwhile
+                await self._chat_bucket(chat_id).wait()
+
+                text = self._pending_status.pop(key)
+                if text == self._sent_status.get(key):
+                    continue
+                try:
+                    await self.edit_message_text(text, chat_id, message_id)
+                    self._sent_status[key] = text
+                except Exception as e:
+                    logger.warning("Could not update status message in chat %s: %s", chat_id, e)
+        finally:
+            del self._status_tasks[key]
+            self._sent_status.pop(key, None)
+
+# Telegram rejects messages longer than 4096 characters; keep some room
+MESSAGE_LIMIT = 4000
+
+class StreamingMessage:
+    """A message that grows as text streams in.
+
+    Edits go through the dispatcher's status coalescing, so they follow the
+    chat's rate limit however fast text arrives. When the text outgrows one
+    message, the full part is left behind and a new message continues it.
+    """
+
+    def __init__(self, dispatcher, chat_id, message_id, header="", limit=MESSAGE_LIMIT):
+        self.dispatcher = dispatcher
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.limit = limit
+
+        self.text = header
+        self.total = ""
+
+    async def append(self, part):
+        self.total += part
+        self.text += part
+
+        while len(self.text) > self.limit:
+            # Break at the last line end (or space) that fits
+            cut = self.text.rfind("\n", 0, self.limit)
+            if cut <= 0:
+                cut = self.text.rfind(" ", 0, self.limit)
+            if cut <= 0:
+                cut = self.limit
+            head, self.text = self.text[:cut], self.text[cut:].lstrip()
+
+            await self.dispatcher.update_status(self.chat_id, self.message_id, head)
+
+            # The rest is filled in by the next edit
+            message = await self.dispatcher.send_message(self.chat_id, "…")
+            self.message_id = message.message_id
+
+        self.dispatcher.update_status(self.chat_id, self.message_id, self.text)
+
+    async def finish(self):
+        """Wait until the last text is shown"""
+
+        await self.dispatcher.update_status(self.chat_id, self.message_id, self.text)
@@ -0,0 +1,155 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+
+import config
+
+# Load environment variables from .env file
+config.load()
+logger = logging.getLogger(__name__)
+
+# Root directory holding every chat's data partition
+TENANTS_DIR = os.getenv("BOT_DATA_DIR", os.path.join("data", "tenants"))
+
+# Chats allowed to use the TGO credentials from .env (comma separated chat ids)
+OWNER_CHAT_IDS = {
+    chat_id.strip() for chat_id in os.getenv("BOT_OWNER_CHAT_IDS", "").split(",") if chat_id.strip()
+}
+
+# Fernet key the chats' TGO passwords are encrypted with (needs the cryptography
+# package). Without one they are stored in plain text
+CREDENTIALS_KEY = os.getenv("BOT_CREDENTIALS_KEY")
+
+def _get_fernet():
+    if not CREDENTIALS_KEY:
+        return None
+    from cryptography.fernet import Fernet
+    return Fernet(CREDENTIALS_KEY)
+
+def _encrypt(text):
+    return _get_fernet().encrypt(text.encode('utf-8')).decode('ascii')
+
+def _decrypt(token):
+    fernet = _get_fernet()
+    if fernet is None:
+        raise ValueError("BOT_CREDENTIALS_KEY is needed to read encrypted credentials")
+
+    from cryptography.fernet import InvalidToken
+    try:
+        return fernet.decrypt(token.encode('ascii')).decode('utf-8')
+    except InvalidToken as e:
+        raise ValueError("Credentials were encrypted with another key") from e
+
+class CredentialsError(Exception):
+    """A chat's saved login exists but can't be read (e.g. the key changed)"""
+
+class Tenant:
+    """One chat's data partition: its own files, credentials, caches and lock"""
+
+    def __init__(self, chat_id, root=TENANTS_DIR):
+        self.chat_id = str(chat_id)
+
+        # Partitions are spread over 256 shard directories so no single
+        # directory grows to thousands of entries
+        shard = hashlib.sha1(self.chat_id.encode('utf-8')).hexdigest()[:2]
+        self.directory = os.path.join(root, shard, self.chat_id)
+
+        self.json_file = self.path("orders_data.json")
+        self.sync_state_file = self.path("orders_sync_state.json")
+        self.auth_cache_file = self.path("auth_cache.json")
+        self.credentials_file = self.path("credentials.json")
+        self.db_file = self.path("orders.db")
+        self.snapshot_file = self.path("snapshot.pickle")
+
+        # Held while this chat's data is being updated; readers never take it
+        self.lock = threading.Lock()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def ensure_directory(self):
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    def get_credentials(self):
+        """(username, password) for TGO Yemek, or None if this chat has none.
+
+        Raises CredentialsError if the chat saved a login that can't be read;
+        that never falls back to the owner's login from .env.
+        """
+
+        try:
+            with open(self.credentials_file, 'r', encoding='utf-8') as f:
+                credentials = json.load(f)
+            if "encrypted_password" in credentials:
+                return credentials["username"], _decrypt(credentials["encrypted_password"])
+            return credentials["username"], credentials["password"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Could not read the credentials of chat %s: %s", self.chat_id, e)
+            raise CredentialsError(
+                "Your saved TGO Yemek login can't be read anymore. Please send it again with /login."
+            ) from e
+
+        # Without a saved login of its own, the bot owner can use the credentials in .env
+        if self.chat_id in OWNER_CHAT_IDS and os.getenv("TGO_USERNAME") and os.getenv("TGO_PASSWORD"):
+            return os.getenv("TGO_USERNAME"), os.getenv("TGO_PASSWORD")
+
+        return None
+
+    def set_credentials(self, username, password):
+        self.ensure_directory()
+
+        if CREDENTIALS_KEY:
+            credentials = {"username": username, "encrypted_password": _encrypt(password)}
+        else:
+            logger.warning("BOT_CREDENTIALS_KEY is not set, the TGO login of chat %s is stored in plain text",
+                           self.chat_id)
+            credentials = {"username": username, "password": password}
+
+        # Only readable by the bot's own user
+        fd = os.open(self.credentials_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(credentials, f)
+
+    def clear_credentials(self):
+        """Forget this chat's credentials and cached login"""
+
+        for path in (self.credentials_file, self.auth_cache_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+_tenants = {}
+_tenants_lock = threading.Lock()
+
+def iter_chat_ids(root=TENANTS_DIR):
+    """Chat ids of every partition that has an order store"""
+
+    if not os.path.isdir(root):
+        return
+    for shard in sorted(os.listdir(root)):
+        shard_dir = os.path.join(root, shard)
+        if not os.path.isdir(shard_dir):
+            continue
+        for chat_id in sorted(os.listdir(shard_dir)):
+            if os.path.exists(os.path.join(shard_dir, chat_id, "orders.db")):
+                yield chat_id
+
+def get_tenant(chat_id):
+    """The partition for a chat, created on first use"""
+
+    chat_id = str(chat_id)
+
+    # Fast path without taking the registry lock
+    tenant = _tenants.get(chat_id)
+    if tenant is not None:
+        return tenant
+
+    with _tenants_lock:
+        tenant = _tenants.get(chat_id)
+        if tenant is None:
+            tenant = Tenant(chat_id)
+            _tenants[chat_id] = tenant
+        return tenant
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_client
+
+@pytest.fixture(autouse=True)
+def fresh_http_client(monkeypatch):
+    # Every test starts with closed circuits and retries that don't wait long
+    monkeypatch.setattr(http_client, "_breakers", {})
+    monkeypatch.setattr(http_client, "BACKOFF_BASE", 0.01)
+
+@pytest.fixture
+def stub_servers():
+    # Servers appended here are shut down after the test
+    servers = []
+    yield servers
+    for server in servers:
+        server.shutdown()
+        server.server_close()
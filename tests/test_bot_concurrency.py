@@ -0,0 +1,95 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import food_recommendation_bot as bot_module
+
+def message(chat_id):
+    return SimpleNamespace(chat=SimpleNamespace(id=chat_id))
+
+@pytest.fixture(autouse=True)
+def fresh_slots(monkeypatch):
+    monkeypatch.setattr(bot_module, "MAX_CONCURRENT_HANDLERS", 1)
+    monkeypatch.setattr(bot_module, "MAX_HANDLERS_PER_CHAT", 1)
+    monkeypatch.setattr(bot_module, "_global_slots", None)
+    monkeypatch.setattr(bot_module, "_chat_slots", {})
+    monkeypatch.setattr(bot_module, "_stream_slots", None)
+
+def run(scenario):
+    asyncio.run(asyncio.wait_for(scenario(), 5))
+
+@bot_module.limited
+async def quick(message):
+    return "done"
+
+def test_a_busy_handler_holds_the_global_slot():
+    async def scenario():
+        release = asyncio.Event()
+
+        @bot_module.limited
+        async def slow(message):
+            await release.wait()
+
+        task = asyncio.create_task(slow(message(1)))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(asyncio.shield(quick(message(2))), 0.1)
+        release.set()
+        await task
+    run(scenario)
+
+def test_streaming_gives_the_global_slot_back():
+    async def scenario():
+        release = asyncio.Event()
+
+        @bot_module.limited
+        async def stream(message):
+            async with bot_module.streaming_slot():
+                await release.wait()
+            return "streamed"
+
+        task = asyncio.create_task(stream(message(1)))
+        await asyncio.sleep(0)
+        assert await asyncio.wait_for(quick(message(2)), 1) == "done"
+
+        release.set()
+        assert await task == "streamed"
+        assert bot_module._global_slots._value == 1
+    run(scenario)
+
+def test_streams_are_limited_on_their_own(monkeypatch):
+    monkeypatch.setattr(bot_module, "MAX_CONCURRENT_STREAMS", 1)
+
+    async def scenario():
+        release = asyncio.Event()
+        streaming = []
+
+        @bot_module.limited
+        async def stream(message):
+            async with bot_module.streaming_slot():
+                streaming.append(message.chat.id)
+                await release.wait()
+
+        tasks = [asyncio.create_task(stream(message(chat_id))) for chat_id in (1, 2)]
+        await asyncio.sleep(0.05)
+        assert streaming == [1]
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert streaming == [1, 2]
+    run(scenario)
+
+def test_stream_blocking_yields_items_then_raises():
+    def produce():
+        yield "a"
+        yield "b"
+        raise ValueError("cut off")
+
+    async def scenario():
+        items = []
+        with pytest.raises(ValueError):
+            async for item in bot_module.stream_blocking(produce):
+                items.append(item)
+        assert items == ["a", "b"]
+    run(scenario)
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+import http_client
+import login_flow
+import order_store
+from stub_server import make_orders, start_stub_server
+
+AUTH = {"access_token": "stub-token"}
+
+@pytest.mark.parametrize("report_total", [True, False])
+def test_fetches_every_page(stub_servers, tmp_path, report_total):
+    orders = make_orders(230)
+    server = start_stub_server(orders, report_total=report_total)
+    stub_servers.append(server)
+    json_file = tmp_path / "orders_data.json"
+
+    orders_data = login_flow.fetch_orders(http_client.new_session(), AUTH, json_file=str(json_file),
+                                          url=server.orders_url, page_size=50)
+
+    assert orders_data["orders"] == orders
+    with open(json_file, encoding="utf-8") as f:
+        assert json.load(f)["orders"] == orders
+
+def test_fetches_page_count_exactly(stub_servers, tmp_path):
+    server = start_stub_server(make_orders(200), report_total=True)
+    stub_servers.append(server)
+
+    login_flow.fetch_orders(http_client.new_session(), AUTH, json_file=str(tmp_path / "orders_data.json"),
+                            url=server.orders_url, page_size=50)
+
+    assert server.requests_served == 4
+
+def test_concurrency_is_limited(stub_servers, tmp_path):
+    server = start_stub_server(make_orders(1000), delay=0.1)
+    stub_servers.append(server)
+
+    orders_data = login_flow.fetch_orders(http_client.new_session(), AUTH, json_file=str(tmp_path / "orders_data.json"),
+                                          url=server.orders_url, page_size=50, max_workers=4)
+
+    assert len(orders_data["orders"]) == 1000
+    assert server.requests_served == 20
+    assert 1 < server.max_in_flight <= 4
+
+def test_failed_pages_are_retried(stub_servers, tmp_path):
+    orders = make_orders(300)
+    server = start_stub_server(orders, fail_requests=3)
+    stub_servers.append(server)
+
+    orders_data = login_flow.fetch_orders(http_client.new_session(), AUTH, json_file=str(tmp_path / "orders_data.json"),
+                                          url=server.orders_url, page_size=50)
+
+    assert orders_data["orders"] == orders
+
+def test_rejected_token(stub_servers, tmp_path):
+    server = start_stub_server(make_orders(10), accepted_token="other-token")
+    stub_servers.append(server)
+
+    with pytest.raises(login_flow.AuthExpiredError):
+        login_flow.fetch_orders(http_client.new_session(), AUTH, json_file=str(tmp_path / "orders_data.json"),
+                                url=server.orders_url, page_size=50)
+
+def test_sync_stores_only_the_delta(stub_servers, tmp_path):
+    orders = make_orders(120)
+    server = start_stub_server(orders)
+    stub_servers.append(server)
+    json_file = str(tmp_path / "orders_data.json")
+    state_file = str(tmp_path / "orders_sync_state.json")
+    db_file = str(tmp_path / "orders.db")
+
+    def sync():
+        return login_flow.sync_orders(http_client.new_session(), AUTH, json_file, state_file, server.orders_url,
+                                      page_size=50, db_file=db_file)
+
+    # The first sync downloads and imports the whole history
+    orders_data, added, updated = sync()
+    assert (len(orders_data["orders"]), added, updated) == (120, 120, 0)
+    with open(json_file, encoding="utf-8") as f:
+        export = f.read()
+
+    # Two new orders, and a known one whose status changed
+    new_orders = [dict(orders[0], orderId=f"NEW{i}") for i in range(2)]
+    changed = dict(orders[1], status={"statusText": "İptal Edildi"})
+    server.orders = new_orders + [orders[0], changed] + orders[2:]
+    served = server.requests_served
+
+    orders_data, added, updated = sync()
+    assert (added, updated) == (2, 1)
+    assert server.requests_served == served + 1
+    assert len(order_store.read_orders(db_file)) == 122
+    with open(json_file, encoding="utf-8") as f:
+        assert f.read() == export
+
+    # Nothing new since
+    assert sync()[1:] == (0, 0)
+    order_store.invalidate_cache()
@@ -0,0 +1,42 @@
+import random
+
+from food_classifier import FoodClassifier, turkish_fold
+
+TABLE = {
+    'burger': ['Burger', 'King', 'Secret'],
+    'pizza': ['Pizza', 'Pide'],
+    'sandwich': ['Sandwich', 'Tost'],
+    'chicken': ['Chicken', 'Tavuk', 'Tavuk Şiş'],
+    'kebab': ['Şiş', 'Kebap', 'İskender']
+}
+
+def naive_classify(table, item):
+    folded = turkish_fold(item)
+    return tuple(food_type for food_type, keywords in table.items()
+                 if any(turkish_fold(keyword) in folded for keyword in keywords))
+
+def test_turkish_case_folding():
+    classifier = FoodClassifier(TABLE)
+
+    assert classifier.classify("SANDWİCH") == ('sandwich',)
+    assert classifier.classify("ıskender") == ('kebab',)
+    assert classifier.classify("TAVUK ŞİŞ DÜRÜM") == ('chicken', 'kebab')
+
+def test_overlapping_keywords_in_table_order():
+    classifier = FoodClassifier({'a': ['hers'], 'b': ['he'], 'c': ['she'], 'd': ['his']})
+
+    assert classifier.classify("ushers") == ('a', 'b', 'c')
+    assert classifier.classify("this") == ('d',)
+    assert classifier.classify("xyz") == ()
+
+def test_matches_naive_substring_search():
+    classifier = FoodClassifier(TABLE)
+    rng = random.Random(0)
+    words = [keyword for keywords in TABLE.values() for keyword in keywords] + ["Menü", "Dürüm", "Double", "ve"]
+    for _ in range(2000):
+        item = rng.choice(["", " ", "-"]).join(rng.choice(words) for _ in range(rng.randint(1, 4)))
+        assert classifier.classify(item) == naive_classify(TABLE, item), item
+
+def test_fingerprint_follows_the_table():
+    assert FoodClassifier(TABLE).fingerprint == FoodClassifier(dict(TABLE)).fingerprint
+    assert FoodClassifier(TABLE).fingerprint != FoodClassifier(dict(TABLE, pizza=['Pizza'])).fingerprint
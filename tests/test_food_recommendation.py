@@ -0,0 +1,80 @@
+import pytest
+
+import food_recommendation
+import response_cache
+from stub_server import STUB_RECOMMENDATION, make_orders, start_stub_claude_server
+
+ORDERS = [{
+    'Item Name': order['product']['name'], 'Restaurant Name': order['store']['name'],
+    'Restaurant Location': '', 'Date': '', 'Time': '', 'Price (TL)': order['price']['totalPrice']
+} for order in make_orders(20)]
+
+@pytest.fixture
+def claude(stub_servers, monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "stub-key")
+
+    def start(**kwargs):
+        server = start_stub_claude_server(chunk_delay=0.0, **kwargs)
+        stub_servers.append(server)
+        monkeypatch.setattr(food_recommendation, "CLAUDE_API_URL", server.messages_url)
+        return server
+    return start
+
+def test_iter_sse_events():
+    lines = [
+        "event: message_start",
+        'data: {"type": "message_start"}',
+        "",
+        ": a comment",
+        "event: content_block_delta",
+        'data: {"delta":',
+        'data:  {"text": "Merhaba"}}',
+        "",
+        "",
+        'data: {"type": "ping"}'
+    ]
+
+    assert list(food_recommendation.iter_sse_events(lines)) == [
+        ("message_start", {"type": "message_start"}),
+        ("content_block_delta", {"delta": {"text": "Merhaba"}}),
+        (None, {"type": "ping"})
+    ]
+
+def test_stream_yields_whole_answer(claude, tmp_path):
+    server = claude()
+    cache_file = str(tmp_path / "claude_cache.db")
+
+    parts = list(food_recommendation.stream_food_recommendation(ORDERS, refresh=True, cache_file=cache_file))
+
+    assert len(parts) > 1
+    assert "".join(parts) == STUB_RECOMMENDATION
+
+    # Asking again is answered from the cache, in one piece
+    assert list(food_recommendation.stream_food_recommendation(ORDERS, cache_file=cache_file)) == [STUB_RECOMMENDATION]
+    assert server.requests_served == 1
+
+def test_stream_error_event(claude, tmp_path):
+    claude(error_after=3)
+    cache_file = str(tmp_path / "claude_cache.db")
+
+    parts = []
+    with pytest.raises(food_recommendation.RecommendationError):
+        for part in food_recommendation.stream_food_recommendation(ORDERS, refresh=True, cache_file=cache_file):
+            parts.append(part)
+
+    assert len(parts) == 3
+    # A cut off answer is not cached
+    assert response_cache.get(food_recommendation.build_request(ORDERS)[1], cache_file) is None
+
+def test_stream_failed_call(claude, tmp_path):
+    claude(fail_requests=1)
+
+    with pytest.raises(food_recommendation.RecommendationError):
+        list(food_recommendation.stream_food_recommendation(ORDERS, refresh=True, cache_file=str(tmp_path / "cache.db")))
+
+def test_blocking_answer(claude, tmp_path):
+    claude()
+
+    answer = food_recommendation.get_food_recommendation(ORDERS, refresh=True, cache_file=str(tmp_path / "cache.db"))
+
+    assert answer == STUB_RECOMMENDATION
@@ -0,0 +1,160 @@
+import time
+
+import pytest
+import requests
+
+import http_client
+from stub_server import make_orders, start_stub_server, start_stub_claude_server
+
+HEADERS = {"Authorization": "Bearer stub-token"}
+
+def test_retries_503(stub_servers):
+    server = start_stub_server(make_orders(10), fail_requests=2)
+    stub_servers.append(server)
+
+    response = http_client.get(server.orders_url, headers=HEADERS)
+
+    assert response.status_code == 200
+    assert server.requests_served == 3
+
+def test_retries_429_after_retry_after(stub_servers):
+    server = start_stub_server(make_orders(10), fail_requests=1, fail_status=429, retry_after=1)
+    stub_servers.append(server)
+
+    started = time.perf_counter()
+    response = http_client.get(server.orders_url, headers=HEADERS)
+    elapsed = time.perf_counter() - started
+
+    assert response.status_code == 200
+    assert server.requests_served == 2
+    assert elapsed >= 1.0
+
+def test_gives_up_after_max_retries(stub_servers, monkeypatch):
+    monkeypatch.setattr(http_client, "MAX_RETRIES", 2)
+    server = start_stub_server(make_orders(10), fail_requests=10)
+    stub_servers.append(server)
+
+    response = http_client.get(server.orders_url, headers=HEADERS)
+
+    assert response.status_code == 503
+    assert server.requests_served == 3
+
+def test_post_is_not_retried(stub_servers):
+    server = start_stub_claude_server(fail_requests=1)
+    stub_servers.append(server)
+
+    response = http_client.post(server.messages_url, headers={"x-api-key": "stub-key"}, json={})
+
+    assert response.status_code == 503
+    assert server.requests_served == 1
+
+def test_read_timeout(stub_servers):
+    server = start_stub_server(make_orders(10), delay=1.0)
+    stub_servers.append(server)
+
+    started = time.perf_counter()
+    with pytest.raises(requests.exceptions.Timeout):
+        http_client.get(server.orders_url, headers=HEADERS, timeout=(1, 0.2), retry=False)
+
+    assert time.perf_counter() - started < 1.0
+    assert server.requests_served == 1
+
+def test_timeouts_are_retried(stub_servers, monkeypatch):
+    monkeypatch.setattr(http_client, "MAX_RETRIES", 1)
+    server = start_stub_server(make_orders(10), delay=1.0)
+    stub_servers.append(server)
+
+    with pytest.raises(requests.exceptions.Timeout):
+        http_client.get(server.orders_url, headers=HEADERS, timeout=(1, 0.2))
+
+    assert server.requests_served == 2
+
+def test_breaker_opens_after_failures(stub_servers):
+    server = start_stub_server(make_orders(10), fail_requests=100)
+    stub_servers.append(server)
+
+    for _ in range(http_client.BREAKER_FAILURES):
+        assert http_client.get(server.orders_url, headers=HEADERS, retry=False).status_code == 503
+    assert http_client.get_breaker(server.orders_url).state == "open"
+
+    with pytest.raises(http_client.CircuitOpenError):
+        http_client.get(server.orders_url, headers=HEADERS, retry=False)
+    assert server.requests_served == http_client.BREAKER_FAILURES
+
+def test_breaker_does_not_retry_into_open_circuit(stub_servers, monkeypatch):
+    monkeypatch.setattr(http_client, "MAX_RETRIES", http_client.BREAKER_FAILURES + 2)
+    server = start_stub_server(make_orders(10), fail_requests=100)
+    stub_servers.append(server)
+
+    with pytest.raises(http_client.CircuitOpenError):
+        http_client.get(server.orders_url, headers=HEADERS)
+    assert server.requests_served == http_client.BREAKER_FAILURES
+
+def test_breaker_half_open_trial_closes_on_success(stub_servers):
+    server = start_stub_server(make_orders(10), fail_requests=http_client.BREAKER_FAILURES)
+    stub_servers.append(server)
+    breaker = http_client.get_breaker(server.orders_url)
+    breaker.reset_timeout = 0.2
+
+    for _ in range(http_client.BREAKER_FAILURES):
+        http_client.get(server.orders_url, headers=HEADERS, retry=False)
+    assert breaker.state == "open"
+
+    time.sleep(0.3)
+    assert breaker.state == "half-open"
+    assert http_client.get(server.orders_url, headers=HEADERS, retry=False).status_code == 200
+    assert breaker.state == "closed"
+
+def test_breaker_half_open_trial_reopens_on_failure(stub_servers):
+    server = start_stub_server(make_orders(10), fail_requests=http_client.BREAKER_FAILURES + 1)
+    stub_servers.append(server)
+    breaker = http_client.get_breaker(server.orders_url)
+    breaker.reset_timeout = 0.2
+
+    for _ in range(http_client.BREAKER_FAILURES):
+        http_client.get(server.orders_url, headers=HEADERS, retry=False)
+    time.sleep(0.3)
+
+    # One failed trial is enough to open the circuit again
+    assert http_client.get(server.orders_url, headers=HEADERS, retry=False).status_code == 503
+    assert breaker.state == "open"
+    with pytest.raises(http_client.CircuitOpenError):
+        http_client.get(server.orders_url, headers=HEADERS, retry=False)
+    assert server.requests_served == http_client.BREAKER_FAILURES + 1
+
+def test_breaker_lets_one_trial_through():
+    breaker = http_client.CircuitBreaker("upstream", failures=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.state == "half-open"
+
+    breaker.before_call()
+    with pytest.raises(http_client.CircuitOpenError):
+        breaker.before_call()
+
+    # A trial that ended without an answer lets the next one through
+    breaker.release_trial()
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+def test_429_does_not_open_the_breaker(stub_servers):
+    server = start_stub_server(make_orders(10), fail_requests=100, fail_status=429)
+    stub_servers.append(server)
+
+    for _ in range(http_client.BREAKER_FAILURES + 1):
+        assert http_client.get(server.orders_url, headers=HEADERS, retry=False).status_code == 429
+    assert http_client.get_breaker(server.orders_url).state == "closed"
+
+def test_timing_hook_sees_every_attempt(stub_servers):
+    server = start_stub_server(make_orders(10), fail_requests=1)
+    stub_servers.append(server)
+    calls = []
+    hook = lambda upstream, method, url, status, elapsed, attempt, error: calls.append((method, status, attempt))
+
+    http_client.add_timing_hook(hook)
+    try:
+        http_client.get(server.orders_url, headers=HEADERS)
+    finally:
+        http_client.remove_timing_hook(hook)
+
+    assert calls == [("GET", 503, 1), ("GET", 200, 2)]
@@ -0,0 +1,74 @@
+import asyncio
+
+import jobs
+
+def run_jobs(db_file, handler, max_attempts=3, before=None):
+    """Start a queue, let it work through whatever it resumed, and return it"""
+
+    async def main():
+        queue = jobs.JobQueue(db_file, workers=1, max_attempts=max_attempts)
+        queue.register("work", handler)
+        notified = []
+
+        async def on_progress(job):
+            notified.append((job.job_id, job.state))
+
+        queue.on_progress(on_progress)
+        await queue.start()
+        if before is not None:
+            before(queue)
+        await queue._queue.join()
+        await queue.stop()
+        return queue, notified
+
+    return asyncio.run(main())
+
+def interrupted_job(db_file, attempts):
+    """Leave a job in the database as if the bot died while running it"""
+
+    queue = jobs.JobQueue(db_file)
+    job = jobs.Job("abcd1234", "work", "work:1", {"n": 1}, state=jobs.RUNNING, attempts=attempts)
+    queue._save(job)
+    return job
+
+def test_interrupted_job_is_resumed(tmp_path):
+    db_file = str(tmp_path / "jobs.db")
+    interrupted_job(db_file, attempts=1)
+
+    async def handler(job, progress):
+        return f"done {job.payload['n']}"
+
+    queue, _ = run_jobs(db_file, handler)
+    job = queue.get("abcd1234")
+    assert (job.state, job.result, job.attempts) == (jobs.DONE, "done 1", 2)
+
+def test_job_is_given_up_after_max_attempts(tmp_path):
+    db_file = str(tmp_path / "jobs.db")
+    interrupted_job(db_file, attempts=3)
+    ran = []
+
+    async def handler(job, progress):
+        ran.append(job.job_id)
+
+    queue, notified = run_jobs(db_file, handler, max_attempts=3)
+    job = queue.get("abcd1234")
+    assert ran == []
+    assert job.state == jobs.FAILED
+    assert "3 interrupted attempts" in job.result
+    assert notified == [("abcd1234", jobs.FAILED)]
+    assert queue.active_job("work:1") is None
+
+def test_same_key_is_single_flight(tmp_path):
+    submitted = []
+
+    async def handler(job, progress):
+        return "ok"
+
+    def submit_twice(queue):
+        submitted.append(queue.submit("work", "work:1", {}))
+        submitted.append(queue.submit("work", "work:1", {}))
+
+    run_jobs(str(tmp_path / "jobs.db"), handler, before=submit_twice)
+    (first, created), (second, created_again) = submitted
+    assert created and not created_again
+    assert first is second
@@ -0,0 +1,66 @@
+import base64
+import json
+import os
+import stat
+import time
+
+import pytest
+
+import http_client
+import login_flow
+
+def make_jwt(claims):
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip("=")
+    return f"header.{payload}.signature"
+
+def test_token_expiry():
+    now = time.time()
+    assert login_flow.get_token_expiry({"access_token": "x", "expires_in": 600}) == pytest.approx(now + 600, abs=5)
+    assert login_flow.get_token_expiry({"access_token": make_jwt({"exp": 2_000_000_000})}) == 2_000_000_000
+    assert login_flow.get_token_expiry({"access_token": "opaque"}) == pytest.approx(
+        now + login_flow.AUTH_DEFAULT_TTL, abs=5)
+
+def test_cached_session_round_trip(tmp_path):
+    cache_file = str(tmp_path / "auth_cache.json")
+    session = http_client.new_session()
+    session.cookies.set("sid", "abc", domain="tgoyemek.com", path="/")
+
+    login_flow.save_auth_cache(session, {"access_token": "token", "expires_in": 3600}, cache_file)
+    assert stat.S_IMODE(os.stat(cache_file).st_mode) == 0o600
+
+    session, auth_data = login_flow.load_cached_session(cache_file)
+    assert auth_data["access_token"] == "token"
+    assert session.cookies.get("sid", domain="tgoyemek.com") == "abc"
+
+def test_expired_session_is_not_reused(tmp_path):
+    cache_file = str(tmp_path / "auth_cache.json")
+    # Expiring within the safety margin counts as expired
+    auth_data = {"access_token": "token", "expires_in": login_flow.AUTH_EXPIRY_MARGIN - 1}
+    login_flow.save_auth_cache(http_client.new_session(), auth_data, cache_file)
+
+    assert login_flow.load_cached_session(cache_file) == (None, None)
+
+def test_run_with_auth_skips_login_with_a_cached_session(tmp_path, monkeypatch):
+    cache_file = str(tmp_path / "auth_cache.json")
+    login_flow.save_auth_cache(http_client.new_session(), {"access_token": "cached", "expires_in": 3600}, cache_file)
+    monkeypatch.setattr(login_flow, "login_fresh", lambda *args: pytest.fail("logged in again"))
+
+    assert login_flow.run_with_auth(lambda session, auth_data: auth_data["access_token"], cache_file) == "cached"
+
+def test_run_with_auth_logs_in_again_when_the_token_is_rejected(tmp_path, monkeypatch):
+    cache_file = str(tmp_path / "auth_cache.json")
+    login_flow.save_auth_cache(http_client.new_session(), {"access_token": "stale", "expires_in": 3600}, cache_file)
+
+    def login_fresh(cache_file, credentials=None):
+        auth_data = {"access_token": "fresh", "expires_in": 3600}
+        login_flow.save_auth_cache(http_client.new_session(), auth_data, cache_file)
+        return http_client.new_session(), auth_data
+    monkeypatch.setattr(login_flow, "login_fresh", login_fresh)
+
+    def action(session, auth_data):
+        if auth_data["access_token"] == "stale":
+            raise login_flow.AuthExpiredError("rejected")
+        return auth_data["access_token"]
+
+    assert login_flow.run_with_auth(action, cache_file) == "fresh"
+    assert login_flow.load_cached_session(cache_file)[1]["access_token"] == "fresh"
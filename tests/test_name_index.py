@@ -0,0 +1,85 @@
+import pickle
+
+import pytest
+
+import name_index
+from name_index import NameIndex
+
+@pytest.mark.parametrize("name, other", [
+    ("Whopper Menü", "Whoper Menü"),
+    ("Whopper Menü", "WHOPPER MENU"),
+    ("KARIŞIK PİZZA", "Karisik Pizza"),
+    ("Pizza Margarita", "Margarita Pizza"),
+    ("Cheese Burger", "Cheeseburger"),
+    ("Et Döner 100gr", "ET DÖNER 100 GR"),
+])
+def test_respellings(name, other):
+    assert name_index.is_respelling(name, other)
+
+@pytest.mark.parametrize("name, other", [
+    ("Whopper Menü", "Double Whopper Menü"),
+    ("Et Döner 100gr", "Et Döner 150gr"),
+    ("Lahmacun 2'li", "Lahmacun 3'lü"),
+    ("Su 0.5 L", "Su 1.5 L"),
+    ("Çay", "Çaya"),
+])
+def test_other_products(name, other):
+    assert not name_index.is_respelling(name, other)
+
+def test_typo_joins_the_first_spelling():
+    index = NameIndex()
+    assert index.add("Whopper Menü") == "Whopper Menü"
+    assert index.add("Tavuk Dürüm") == "Tavuk Dürüm"
+    assert index.add("Whoper Menü") == "Whopper Menü"
+
+    assert index.canonical("Whoper Menü") == "Whopper Menü"
+    assert index.spellings("Whopper Menü") == ["Whopper Menü", "Whoper Menü"]
+    assert index.merge_counts({"Whopper Menü": 2, "Whoper Menü": 5, "Tavuk Dürüm": 1}) == {
+        "Whoper Menü": 7, "Tavuk Dürüm": 1
+    }
+
+def test_size_variants_stay_apart():
+    index = NameIndex()
+    index.add("Et Döner 100gr")
+    assert index.add("Et Döner 150gr") == "Et Döner 150gr"
+    assert index.spellings("Et Döner 150gr") == ["Et Döner 150gr"]
+
+    # Still similar names of each other
+    assert [name for name, _ in index.similar("Et Döner 100gr")] == ["Et Döner 150gr"]
+
+@pytest.mark.parametrize("first", ["-", "🍔", "", "!!!"])
+def test_names_without_words(first):
+    index = NameIndex()
+    assert index.add(first) == first
+    assert index.add("🍟") == "🍟"
+    assert index.similar(first) == []
+
+    index.add("Whopper Menü")
+    assert [name for name, _ in index.similar("Whopper")] == ["Whopper Menü"]
+    assert len(index.norms) == len(index)
+
+def test_similar_ranks_closest_names_first():
+    index = NameIndex()
+    for name in ["Et Döner Dürüm", "Tavuk Döner Dürüm", "Tavuk Şiş", "Whopper Menü", "Döner Porsiyon",
+                 "Tavuk Dürüm"]:
+        index.add(name)
+
+    results = index.similar("Tavuk Döner")
+    names = [name for name, _ in results]
+    assert names[0] == "Tavuk Döner Dürüm"
+    assert "Whopper Menü" not in names
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
+    assert all(0.3 <= score <= 1.0 for score in scores)
+
+    # Unmarked letters find the same names
+    assert index.similar("Tavuk Sis", 1)[0][0] == "Tavuk Şiş"
+    # A known name leaves its own spellings out
+    assert "Tavuk Döner Dürüm" not in [name for name, _ in index.similar("Tavuk Döner Dürüm")]
+
+def test_pickled_index_keeps_working():
+    index = NameIndex()
+    index.add("Whopper Menü")
+    copy = pickle.loads(pickle.dumps(index))
+    assert copy.add("Whoper Menü") == "Whopper Menü"
+    assert copy.similar("Whopper")[0][0] == "Whopper Menü"
@@ -0,0 +1,50 @@
+import pytest
+
+import food_recommendation_simple
+import parse_orders
+from order_analytics import OrderAggregates
+from stub_server import make_orders
+
+ROWS = [parse_orders.normalize_order(order) for order in make_orders(300)]
+
+def assert_same_analysis(analysis, expected):
+    assert analysis['most_common_items'] == expected['most_common_items']
+    assert analysis['avg_hour'] == pytest.approx(expected['avg_hour'])
+    assert analysis['price_range'] == pytest.approx(expected['price_range'])
+    assert analysis['preferred_types'] == expected['preferred_types']
+
+def test_matches_analyze_orders():
+    aggregates = OrderAggregates.from_orders(ROWS)
+
+    assert_same_analysis(aggregates.to_analysis(), food_recommendation_simple.analyze_orders(ROWS))
+
+def test_remove_takes_back_an_order():
+    aggregates = OrderAggregates.from_orders(ROWS)
+    extra = dict(ROWS[0], **{'Item Name': 'Lahmacun', 'Price (TL)': 250.0})
+    aggregates.add(extra)
+    aggregates.remove(extra)
+
+    expected = OrderAggregates.from_orders(ROWS)
+    assert aggregates.item_counts == expected.item_counts
+    assert aggregates.type_counts == expected.type_counts
+    assert aggregates.hour_counts == expected.hour_counts
+    assert aggregates.price_mean == pytest.approx(expected.price_mean)
+    assert aggregates.price_stddev == pytest.approx(expected.price_stddev)
+    assert not aggregates.needs_rebuild
+
+def test_removing_the_cheapest_order_needs_a_rebuild():
+    aggregates = OrderAggregates.from_orders(ROWS)
+    cheapest = min(ROWS, key=lambda row: row['Price (TL)'])
+    aggregates.remove(cheapest)
+
+    assert aggregates.needs_rebuild
+
+def test_dict_round_trip():
+    aggregates = OrderAggregates.from_orders(ROWS)
+    restored = OrderAggregates.from_dict(aggregates.to_dict())
+
+    assert restored.to_dict() == aggregates.to_dict()
+    assert not restored.needs_rebuild
+
+def test_empty_history():
+    assert_same_analysis(OrderAggregates().to_analysis(), food_recommendation_simple.analyze_orders([]))
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+import order_store
+from stub_server import make_orders
+
+@pytest.fixture
+def store(tmp_path):
+    json_file = tmp_path / "orders_data.json"
+    json_file.write_text(json.dumps({"orders": make_orders(50)}), encoding="utf-8")
+    db_file = str(tmp_path / "orders.db")
+    order_store.ingest_json(str(json_file), db_file)
+    yield db_file
+    order_store.invalidate_cache()
+
+def test_cached_reads_see_writes_from_other_connections(store):
+    orders = order_store.read_orders(store)
+    assert order_store.read_orders(store) is orders
+
+    # Another process updating the store, the write stays in the WAL
+    conn = order_store.connect(store)
+    conn.execute("PRAGMA wal_autocheckpoint=0")
+    with conn:
+        conn.execute("UPDATE orders SET price = 1.5")
+        order_store._bump_version(conn)
+
+    assert all(order["Price (TL)"] == 1.5 for order in order_store.read_orders(store))
+    conn.close()
+
+def test_cache_keeps_recent_stores_only(tmp_path, monkeypatch):
+    monkeypatch.setattr(order_store, "CACHE_MAX_STORES", 2)
+    json_file = tmp_path / "orders_data.json"
+    json_file.write_text(json.dumps({"orders": make_orders(10)}), encoding="utf-8")
+
+    db_files = []
+    for i in range(3):
+        db_file = str(tmp_path / f"orders_{i}.db")
+        order_store.ingest_json(str(json_file), db_file)
+        order_store.read_orders(db_file)
+        db_files.append(db_file)
+
+    assert list(order_store._cache) == [str(tmp_path / "orders_1.db"), str(tmp_path / "orders_2.db")]
+    order_store.invalidate_cache()
+    assert not order_store._cache
+
+def test_orders_are_upserted_by_order_id(store):
+    first, second = make_orders(50)[:2]
+    new_order = dict(first, orderId="NEW1")
+    changed = dict(second, price={"totalPrice": 1.0})
+
+    # Unchanged orders are left alone, a changed one replaces its row
+    assert order_store.ingest_orders([new_order, changed, first], store) == (1, 1)
+    assert order_store.ingest_orders([new_order, changed], store) == (0, 0)
+
+    orders = {order["Order ID"]: order for order in order_store.read_orders(store)}
+    assert len(orders) == 51
+    assert orders[second["orderId"]]["Price (TL)"] == 1.0
+    assert order_store.verify_aggregates(store)
+
+def saved_name_index(db_file, table='items'):
+    conn = order_store.connect(db_file)
+    try:
+        row = conn.execute("SELECT last_id FROM name_indexes WHERE name_table = ?", (table,)).fetchone()
+        return row['last_id'] if row else None
+    finally:
+        conn.close()
+
+def test_name_index_is_saved_once_enough_names_are_new(tmp_path, monkeypatch):
+    monkeypatch.setattr(order_store, "NAME_INDEX_MIN_BACKLOG", 5)
+    db_file = str(tmp_path / "orders.db")
+
+    def order(number, item):
+        order = make_orders(1)[0]
+        order["orderId"] = f"NEW{number:05d}"
+        order["product"]["name"] = item
+        return order
+
+    order_store.ingest_orders([order(n, f"Item {n}") for n in range(3)], db_file)
+    assert saved_name_index(db_file) is None
+    # Readers see every name anyway
+    assert "Item 2" in order_store.get_name_index(db_file)
+
+    order_store.ingest_orders([order(n, f"Item {n}") for n in range(3, 6)], db_file)
+    assert saved_name_index(db_file) == 6
+
+    # Fewer than the growth share of the saved names: not saved again
+    order_store.ingest_orders([order(6, "Item 6")], db_file)
+    assert saved_name_index(db_file) == 6
+    assert "Item 6" in order_store.get_name_index(db_file)
+    order_store.invalidate_cache()
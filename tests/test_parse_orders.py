@@ -0,0 +1,59 @@
+import csv
+import json
+
+import pytest
+
+import parse_orders
+from stub_server import make_orders
+
+def write(tmp_path, text):
+    json_file = tmp_path / "orders_data.json"
+    json_file.write_text(text, encoding="utf-8")
+    return str(json_file)
+
+TRICKY = {
+    "totalCount": 3,
+    "meta": {"orders": [{"not": "these"}], "text": 'a ] } [ { " \\ ç'},
+    "orders": [
+        {"orderId": 1, "price": {"totalPrice": 123456.789e-2}, "product": {"name": 'Karışık "Pizza" ]'}},
+        {"orderId": 2, "price": {"totalPrice": -0.5}, "product": {"name": "Şiş 🍢"}},
+        {"orderId": 3, "price": {"totalPrice": 1000000}, "tags": [], "store": {}}
+    ],
+    "trailing": [1, 2.5, None, True]
+}
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, parse_orders.STREAM_CHUNK_SIZE])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_iter_orders_matches_json_load(tmp_path, chunk_size, indent):
+    json_file = write(tmp_path, json.dumps(TRICKY, indent=indent, ensure_ascii=False))
+
+    assert list(parse_orders.iter_orders(json_file, chunk_size)) == TRICKY["orders"]
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 4096])
+def test_numbers_cut_at_chunk_boundaries(tmp_path, chunk_size):
+    orders = [{"price": {"totalPrice": 10 ** i + 0.25}} for i in range(12)]
+    json_file = write(tmp_path, '{"orders":[' + ",".join(json.dumps(order) for order in orders) + "]}")
+
+    assert list(parse_orders.iter_orders(json_file, chunk_size)) == orders
+
+@pytest.mark.parametrize("text", ['{}', ' { } ', '{"orders": []}', '{"orders": [ ]}', '{"page": 1}'])
+def test_no_orders(tmp_path, text):
+    assert list(parse_orders.iter_orders(write(tmp_path, text), 2)) == []
+
+@pytest.mark.parametrize("text", ['[]', '{"orders": [{"orderId": 1}', '{"orders": [{"orderId": 1} {"orderId": 2}]}'])
+def test_malformed_export(tmp_path, text):
+    with pytest.raises(ValueError):
+        list(parse_orders.iter_orders(write(tmp_path, text), 4))
+
+def test_csv_export(tmp_path):
+    orders = make_orders(120)
+    json_file = write(tmp_path, json.dumps({"orders": orders}, ensure_ascii=False))
+    csv_file = str(tmp_path / "orders_summary.csv")
+
+    parse_orders.parse_orders_to_csv(json_file, csv_file)
+
+    with open(csv_file, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["Order ID"] for row in rows] == [order["orderId"] for order in orders]
+    assert rows[0]["Item Name"] == orders[0]["product"]["name"]
+    assert rows[0]["Restaurant Location"] == orders[0]["store"]["name"].split("(")[1].rstrip(")")
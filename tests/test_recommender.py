@@ -0,0 +1,92 @@
+import json
+import time
+
+import pytest
+
+import order_store
+import recommender
+import tenants
+from stub_server import make_orders
+
+def add_chat(root, chat_id, orders):
+    tenant = tenants.Tenant(chat_id, str(root))
+    tenant.ensure_directory()
+    with open(tenant.json_file, "w", encoding="utf-8") as f:
+        json.dump({"orders": orders}, f)
+    order_store.ingest_json(tenant.json_file, tenant.db_file)
+
+def wait_for_rebuild():
+    deadline = time.monotonic() + 10
+    while recommender._rebuilding:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+@pytest.fixture(autouse=True)
+def no_model(monkeypatch):
+    monkeypatch.setattr(recommender, "_model", None)
+    monkeypatch.setattr(recommender, "_last_build", None)
+    monkeypatch.setattr(recommender, "_histories", {})
+    monkeypatch.setattr(recommender, "RECOMMENDER_REBUILD_INTERVAL", 0)
+    yield
+    wait_for_rebuild()
+
+def test_first_build_runs_in_the_background(tmp_path):
+    add_chat(tmp_path, 1, make_orders(30, seed=1))
+
+    assert recommender.get_model(str(tmp_path)) is None
+    wait_for_rebuild()
+    assert "1" in recommender.get_model(str(tmp_path)).user_rows
+
+def test_refresh_picks_up_new_chats(tmp_path):
+    add_chat(tmp_path, 1, make_orders(30, seed=1))
+    recommender.refresh(str(tmp_path))
+    wait_for_rebuild()
+
+    add_chat(tmp_path, 2, make_orders(30, seed=2))
+    assert "2" not in recommender.get_model(str(tmp_path)).user_rows
+    recommender.refresh(str(tmp_path))
+    wait_for_rebuild()
+    assert "2" in recommender.get_model(str(tmp_path)).user_rows
+
+def test_only_changed_chats_are_read_again(tmp_path):
+    add_chat(tmp_path, 1, make_orders(30, seed=1))
+    add_chat(tmp_path, 2, make_orders(30, seed=2))
+    recommender.refresh(str(tmp_path))
+    wait_for_rebuild()
+    before = dict(recommender._histories)
+
+    add_chat(tmp_path, 2, make_orders(40, seed=3))
+    recommender.refresh(str(tmp_path))
+    wait_for_rebuild()
+
+    assert recommender._histories["1"] is before["1"]
+    assert recommender._histories["2"] is not before["2"]
+    model = recommender.get_model(str(tmp_path))
+    assert model.user_items.getrow(model.user_rows["2"]).sum() == 40
+
+def test_empty_model_is_kept(tmp_path, monkeypatch):
+    builds = []
+    build = recommender.build_model_from_tenants
+    monkeypatch.setattr(recommender, "build_model_from_tenants", lambda root: builds.append(root) or build(root))
+
+    recommender.get_model(str(tmp_path))
+    wait_for_rebuild()
+    for _ in range(3):
+        assert recommender.get_model(str(tmp_path)).item_names == []
+    wait_for_rebuild()
+    assert len(builds) == 1
+
+def test_rebuilds_are_spaced_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(recommender, "RECOMMENDER_REBUILD_INTERVAL", 0.3)
+    add_chat(tmp_path, 1, make_orders(30, seed=1))
+    started = []
+    build = recommender.build_model_from_tenants
+    monkeypatch.setattr(recommender, "build_model_from_tenants",
+                        lambda root: started.append(time.monotonic()) or build(root))
+
+    for _ in range(5):
+        recommender.refresh(str(tmp_path))
+        wait_for_rebuild()
+
+    assert len(started) == 5
+    assert min(b - a for a, b in zip(started, started[1:])) >= 0.29
@@ -0,0 +1,61 @@
+import sqlite3
+
+import response_cache
+
+def test_key_depends_on_content_only():
+    key = response_cache.make_key("model", {"a": 1, "b": [1, 2]}, 1024)
+    assert key == response_cache.make_key("model", {"a": 1, "b": [1, 2]}, 1024)
+    assert key != response_cache.make_key("model", {"a": 1, "b": [1, 3]}, 1024)
+    assert key != response_cache.make_key("other model", {"a": 1, "b": [1, 2]}, 1024)
+
+def test_round_trip(tmp_path):
+    cache_file = str(tmp_path / "cache.db")
+    assert response_cache.get("k", cache_file) is None
+
+    response_cache.put("k", "Try the lahmacun 🌯", cache_file)
+    assert response_cache.get("k", cache_file) == "Try the lahmacun 🌯"
+
+    response_cache.put("k", "newer", cache_file)
+    assert response_cache.get("k", cache_file) == "newer"
+
+def test_expired_responses_are_not_returned(tmp_path, monkeypatch):
+    cache_file = str(tmp_path / "cache.db")
+    now = 1_000_000.0
+    monkeypatch.setattr(response_cache.time, "time", lambda: now)
+    response_cache.put("k", "answer", cache_file, ttl=60)
+
+    now += 59
+    assert response_cache.get("k", cache_file, ttl=60) == "answer"
+    now += 2
+    assert response_cache.get("k", cache_file, ttl=60) is None
+
+    # And are dropped on the next put
+    response_cache.put("other", "answer", cache_file, ttl=60)
+    conn = sqlite3.connect(cache_file)
+    assert [key for key, in conn.execute("SELECT key FROM responses")] == ["other"]
+    conn.close()
+
+def test_least_recently_used_is_evicted(tmp_path, monkeypatch):
+    cache_file = str(tmp_path / "cache.db")
+    now = 1_000_000.0
+    monkeypatch.setattr(response_cache.time, "time", lambda: now)
+
+    for key in ("a", "b", "c"):
+        now += 1
+        response_cache.put(key, key.upper(), cache_file, max_entries=3)
+
+    # Reading "a" makes "b" the least recently used
+    now += 1
+    assert response_cache.get("a", cache_file) == "A"
+    now += 1
+    response_cache.put("d", "D", cache_file, max_entries=3)
+
+    assert response_cache.get("b", cache_file) is None
+    assert [response_cache.get(key, cache_file) for key in ("a", "c", "d")] == ["A", "C", "D"]
+
+def test_clear(tmp_path):
+    cache_file = str(tmp_path / "cache.db")
+    response_cache.clear(cache_file)
+    response_cache.put("k", "answer", cache_file)
+    response_cache.clear(cache_file)
+    assert response_cache.get("k", cache_file) is None
@@ -0,0 +1,76 @@
+import json
+import pickle
+
+import pytest
+
+import order_store
+import snapshots
+from stub_server import make_orders
+
+@pytest.fixture
+def store(tmp_path):
+    json_file = tmp_path / "orders_data.json"
+    json_file.write_text(json.dumps({"orders": make_orders(30)}), encoding="utf-8")
+    db_file = str(tmp_path / "orders.db")
+    order_store.ingest_json(str(json_file), db_file)
+    snapshot_file = str(tmp_path / "snapshot.pickle")
+    yield db_file, snapshot_file
+    snapshots.forget(snapshot_file)
+    order_store.invalidate_cache()
+
+def new_order(order_id, price):
+    order = make_orders(1, seed=7)[0]
+    order["orderId"] = order_id
+    order["price"]["totalPrice"] = price
+    return order
+
+def test_snapshot_is_served_from_memory(store):
+    db_file, snapshot_file = store
+    snapshot = snapshots.get(db_file, snapshot_file)
+    assert snapshots.order_totals(snapshot)[0] == 30
+    assert snapshots.get(db_file, snapshot_file) is snapshot
+
+def test_stale_snapshot_file_is_rebuilt(store):
+    db_file, snapshot_file = store
+    old = snapshots.get(db_file, snapshot_file)
+
+    # Another process adds orders; this one only sees the file and the store
+    order_store.ingest_orders([new_order("NEW00001", 123.0)], db_file)
+    snapshots.forget(snapshot_file)
+
+    snapshot = snapshots.get(db_file, snapshot_file)
+    assert snapshot['store_version'] != old['store_version']
+    assert snapshots.order_totals(snapshot)[0] == 31
+
+def test_current_snapshot_file_is_loaded_not_rebuilt(store, monkeypatch):
+    db_file, snapshot_file = store
+    saved = snapshots.get(db_file, snapshot_file)
+    snapshots.forget(snapshot_file)
+
+    def fail(*args):
+        raise AssertionError("the snapshot was rebuilt")
+
+    monkeypatch.setattr(snapshots, "build", fail)
+    snapshot = snapshots.get(db_file, snapshot_file)
+    assert snapshot is not saved
+    assert snapshot['store_version'] == saved['store_version']
+
+def test_snapshot_of_an_older_layout_is_rebuilt(store):
+    db_file, snapshot_file = store
+    snapshot = snapshots.get(db_file, snapshot_file)
+    snapshots.forget(snapshot_file)
+
+    with open(snapshot_file, 'wb') as f:
+        pickle.dump(dict(snapshot, snapshot_version=snapshots.SNAPSHOT_VERSION - 1, time_index=None), f)
+
+    assert snapshots.order_totals(snapshots.get(db_file, snapshot_file))[0] == 30
+
+def test_unreadable_snapshot_file_is_rebuilt(store):
+    db_file, snapshot_file = store
+    with open(snapshot_file, 'wb') as f:
+        f.write(b"not a pickle")
+
+    assert snapshots.order_totals(snapshots.get(db_file, snapshot_file))[0] == 30
+
+def test_no_snapshot_without_orders(tmp_path):
+    assert snapshots.get(str(tmp_path / "orders.db"), str(tmp_path / "snapshot.pickle")) is None
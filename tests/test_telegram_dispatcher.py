@@ -0,0 +1,175 @@
+import time
+import asyncio
+from types import SimpleNamespace
+
+from telebot.asyncio_helper import ApiTelegramException
+
+import telegram_dispatcher
+from telegram_dispatcher import TokenBucket, TelegramDispatcher
+
+def too_many_requests(retry_after):
+    return ApiTelegramException("sendMessage", None, {
+        "ok": False, "error_code": 429, "description": "Too Many Requests",
+        "parameters": {"retry_after": retry_after}
+    })
+
+class FakeBot:
+    """Records what the bot would have sent; the first `limited` calls get a 429"""
+
+    def __init__(self, limited=0, retry_after=0.05):
+        self.limited = limited
+        self.retry_after = retry_after
+        self.sent = []
+        self.edits = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.limited:
+            self.limited -= 1
+            raise too_many_requests(self.retry_after)
+        self.sent.append((chat_id, text, time.monotonic()))
+        return SimpleNamespace(message_id=100 + len(self.sent))
+
+    async def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        self.edits.append((message_id, text))
+        await asyncio.sleep(0.01)
+
+def test_bucket_allows_a_burst_then_the_rate():
+    async def main():
+        bucket = TokenBucket(rate=100, capacity=3)
+        start = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire()
+        burst = time.monotonic() - start
+        for _ in range(5):
+            await bucket.acquire()
+        return burst, time.monotonic() - start
+
+    burst, total = asyncio.run(main())
+    assert burst < 0.01
+    # Five more calls at 100 a second
+    assert 0.04 <= total < 0.2
+
+def test_bucket_hold_delays_the_next_call():
+    async def main():
+        bucket = TokenBucket(rate=100, capacity=3)
+        bucket.hold(0.1)
+        assert not bucket.idle
+        start = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - start
+
+    assert 0.09 <= asyncio.run(main()) < 0.3
+
+def test_call_retries_after_429():
+    bot = FakeBot(limited=2, retry_after=0.05)
+
+    async def main():
+        dispatcher = TelegramDispatcher(bot, global_rate=1000, chat_rate=1000)
+        start = time.monotonic()
+        message = await dispatcher.send_message(1, "hello")
+        return message, time.monotonic() - start
+
+    message, elapsed = asyncio.run(main())
+    assert message.message_id == 101
+    assert [text for _, text, _ in bot.sent] == ["hello"]
+    # Each 429 made the chat wait its retry_after
+    assert elapsed >= 0.1
+
+def test_call_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(telegram_dispatcher, "MAX_RETRIES", 1)
+    bot = FakeBot(limited=5, retry_after=0.01)
+
+    async def main():
+        dispatcher = TelegramDispatcher(bot, global_rate=1000, chat_rate=1000)
+        await dispatcher.send_message(1, "hello")
+
+    try:
+        asyncio.run(main())
+    except ApiTelegramException as e:
+        assert e.error_code == 429
+    else:
+        raise AssertionError("the 429 was not raised")
+    assert bot.limited == 3
+
+def test_messages_to_one_chat_follow_its_rate():
+    bot = FakeBot()
+
+    async def main():
+        dispatcher = TelegramDispatcher(bot, global_rate=1000, chat_rate=20)
+        await dispatcher.send_messages(1, [str(n) for n in range(telegram_dispatcher.CHAT_BURST + 2)])
+
+    asyncio.run(main())
+    times = [sent_at for _, _, sent_at in bot.sent]
+    # The burst goes out at once, the rest at 20 a second
+    assert times[-1] - times[0] >= 0.09
+
+def test_status_updates_are_coalesced():
+    bot = FakeBot()
+
+    async def main():
+        dispatcher = TelegramDispatcher(bot, global_rate=1000, chat_rate=10)
+        # Use up the chat's burst so the updates have to wait for a token
+        dispatcher._chat_bucket(1).tokens = 0
+        for n in range(10):
+            task = dispatcher.update_status(1, 5, f"step {n}")
+        await task
+        return dispatcher
+
+    dispatcher = asyncio.run(main())
+    assert bot.edits == [(5, "step 9")]
+    assert not dispatcher._status_tasks
+
+def test_status_set_back_during_an_edit_is_not_sent_again():
+    bot = FakeBot()
+
+    async def main():
+        dispatcher = TelegramDispatcher(bot, global_rate=1000, chat_rate=1000)
+        task = dispatcher.update_status(1, 5, "same")
+        await asyncio.sleep(0.001)
+        # While "same" is being sent it changes and changes back
+        dispatcher.update_status(1, 5, "other")
+        dispatcher.update_status(1, 5, "same")
+        await task
+
+    asyncio.run(main())
+    assert bot.edits == [(5, "same")]
+
+def test_streaming_message_rolls_over_at_the_limit():
+    bot = FakeBot()
+    lines = [f"line {n:02d} " + "x" * 10 for n in range(12)]
+
+    async def main():
+        dispatcher = TelegramDispatcher(bot, global_rate=1000, chat_rate=1000)
+        stream = telegram_dispatcher.StreamingMessage(dispatcher, 1, 5, header="Header\n", limit=60)
+        for line in lines:
+            await stream.append(line + "\n")
+        await stream.finish()
+        return stream
+
+    stream = asyncio.run(main())
+    assert stream.total == "".join(line + "\n" for line in lines)
+
+    # Every message ends up with the last text wanted for it, within the limit
+    final = {}
+    for message_id, text in bot.edits:
+        final[message_id] = text
+    assert all(len(text) <= 60 for text in final.values())
+    assert list(final) == [5] + [101 + n for n in range(len(bot.sent))]
+
+    # Broken at line ends, and nothing is lost or repeated
+    assert final[5].startswith("Header\n")
+    shown = "\n".join(text.strip("\n") for text in final.values())
+    assert shown.split("\n") == ["Header"] + lines
+
+def test_streaming_message_breaks_a_long_line_at_the_limit():
+    bot = FakeBot()
+
+    async def main():
+        dispatcher = TelegramDispatcher(bot, global_rate=1000, chat_rate=1000)
+        stream = telegram_dispatcher.StreamingMessage(dispatcher, 1, 5, limit=50)
+        await stream.append("y" * 120)
+        await stream.finish()
+
+    asyncio.run(main())
+    final = dict(bot.edits)
+    assert [len(text) for text in final.values()] == [50, 50, 20]
@@ -0,0 +1,50 @@
+import json
+import logging
+
+import pytest
+
+import tenants
+
+@pytest.fixture
+def owner(tmp_path, monkeypatch):
+    monkeypatch.setattr(tenants, "OWNER_CHAT_IDS", {"1"})
+    monkeypatch.setenv("TGO_USERNAME", "owner@example.com")
+    monkeypatch.setenv("TGO_PASSWORD", "owner-password")
+    return tenants.Tenant(1, str(tmp_path))
+
+def test_owner_without_a_login_uses_env(owner):
+    assert owner.get_credentials() == ("owner@example.com", "owner-password")
+
+def test_other_chats_never_use_env(owner, tmp_path):
+    assert tenants.Tenant(2, str(tmp_path)).get_credentials() is None
+
+def test_plain_text_login_is_stored_with_a_warning(owner, monkeypatch, caplog):
+    monkeypatch.setattr(tenants, "CREDENTIALS_KEY", None)
+    with caplog.at_level(logging.WARNING, logger="tenants"):
+        owner.set_credentials("me@example.com", "pass with spaces")
+
+    assert "plain text" in caplog.text
+    assert owner.get_credentials() == ("me@example.com", "pass with spaces")
+
+def test_unreadable_login_does_not_fall_back_to_env(owner, monkeypatch):
+    monkeypatch.setattr(tenants, "CREDENTIALS_KEY", None)
+    owner.ensure_directory()
+    with open(owner.credentials_file, "w", encoding="utf-8") as f:
+        json.dump({"username": "me@example.com", "encrypted_password": "token"}, f)
+
+    with pytest.raises(tenants.CredentialsError):
+        owner.get_credentials()
+
+def test_encrypted_login(owner, monkeypatch):
+    fernet = pytest.importorskip("cryptography.fernet")
+    monkeypatch.setattr(tenants, "CREDENTIALS_KEY", fernet.Fernet.generate_key().decode())
+    owner.set_credentials("me@example.com", "secret")
+
+    with open(owner.credentials_file, encoding="utf-8") as f:
+        assert "secret" not in f.read()
+    assert owner.get_credentials() == ("me@example.com", "secret")
+
+    # Another key can't read it, and the owner's .env login isn't used instead
+    monkeypatch.setattr(tenants, "CREDENTIALS_KEY", fernet.Fernet.generate_key().decode())
+    with pytest.raises(tenants.CredentialsError):
+        owner.get_credentials()
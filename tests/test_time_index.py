@@ -0,0 +1,69 @@
+import datetime
+
+import pytest
+
+import time_index
+from time_index import TimeIndex
+
+# A Wednesday
+TODAY = datetime.date(2025, 3, 12)
+
+def at(day, hour=12):
+    return datetime.datetime.combine(day, datetime.time(hour)).timestamp()
+
+def test_named_windows():
+    end = TODAY.toordinal()
+    assert time_index.window('all', TODAY) == (None, None)
+    assert time_index.window('today', TODAY) == (end, end)
+    assert time_index.window('week', TODAY) == (datetime.date(2025, 3, 10).toordinal(), end)
+    assert time_index.window('month', TODAY) == (datetime.date(2025, 3, 1).toordinal(), end)
+    assert time_index.window('year', TODAY) == (datetime.date(2025, 1, 1).toordinal(), end)
+
+def test_week_starting_today():
+    monday = datetime.date(2025, 3, 10)
+    assert time_index.window('week', monday) == (monday.toordinal(), monday.toordinal())
+
+def test_last_n_days():
+    end = TODAY.toordinal()
+    assert time_index.window(1, TODAY) == (end, end)
+    assert time_index.window('30', TODAY) == (end - 29, end)
+
+@pytest.mark.parametrize("period", [0, "-3", "fortnight"])
+def test_bad_windows(period):
+    with pytest.raises(ValueError):
+        time_index.window(period, TODAY)
+
+def test_windows_select_the_right_orders():
+    orders = [
+        (at(datetime.date(2024, 12, 31)), 100.0, "Kebapçı"),
+        (at(datetime.date(2025, 2, 28)), 50.0, "Pizzacı"),
+        (at(datetime.date(2025, 3, 1)), 70.0, "Kebapçı"),
+        (at(datetime.date(2025, 3, 9)), 30.0, "Pizzacı"),
+        (at(datetime.date(2025, 3, 10), hour=9), 20.0, "Kebapçı"),
+        (at(TODAY, hour=20), 40.0, "Kebapçı"),
+        (None, 999.0, "No date"),
+    ]
+    index = TimeIndex.from_orders(orders)
+
+    def totals(period):
+        start, end = time_index.window(period, TODAY)
+        return index.count(start, end), index.spend(start, end)
+
+    assert totals('today') == (1, 40.0)
+    assert totals('week') == (2, 60.0)
+    assert totals('month') == (4, 160.0)
+    assert totals('year') == (5, 210.0)
+    assert totals('all') == (6, 310.0)
+    assert totals(3) == (2, 60.0)
+    assert totals(2) == (1, 40.0)
+
+    start, end = time_index.window('month', TODAY)
+    assert index.top_restaurants(start=start, end=end) == [("Kebapçı", 3), ("Pizzacı", 1)]
+    assert index.restaurant_count("Pizzacı", *time_index.window('week', TODAY)) == 0
+    assert index.slot_count(0, 9) == 1
+    assert index.slot_count(TODAY.weekday(), 20, *time_index.window('today', TODAY)) == 1
+
+def test_empty_index():
+    index = TimeIndex.from_orders([])
+    assert (index.count(), index.spend(), index.top_restaurants()) == (0, 0.0, [])
+    assert index.first_order is None
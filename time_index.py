@@ -0,0 +1,157 @@
+import datetime
+from array import array
+from bisect import bisect_left, bisect_right
+
+# Calendar windows a time range can be named by, see window()
+PERIODS = ['today', 'week', 'month', 'year', 'all']
+
+class TimeIndex:
+    """Orders by day for windowed queries.
+
+    Days are proleptic Gregorian ordinals (date.toordinal()) in local time.
+    Every day with orders has an entry with prefix sums of order counts and
+    spend, so the totals of any range of days are two binary searches and a
+    subtraction. Restaurants and (weekday, hour) slots get the same per-day
+    prefix counts, which keeps "top restaurants this month" and "orders at
+    this hour on this weekday" at one pair of bisects per restaurant or slot.
+    """
+
+    def __init__(self):
+        self.days = array('l')
+        self.count_prefix = array('q', [0])
+        self.spend_prefix = array('d', [0.0])
+
+        # restaurant -> (days, count prefix), and the same per (weekday, hour)
+        self.restaurant_days = {}
+        self.slot_days = {}
+
+        self.first_order = None
+        self.last_order = None
+
+    @classmethod
+    def from_orders(cls, orders):
+        """Build the index from (timestamp, price, restaurant) tuples, in any order.
+
+        Orders without a timestamp are skipped.
+        """
+
+        # One local-time lookup per quarter hour (every timezone offset and DST switch falls on one)
+        slot_of = {}
+
+        def local_slot(timestamp):
+            quarter = timestamp // 900
+            slot = slot_of.get(quarter)
+            if slot is None:
+                moment = datetime.datetime.fromtimestamp(timestamp)
+                slot = slot_of[quarter] = (moment.toordinal(), moment.weekday(), moment.hour)
+            return slot
+
+        day_counts = {}
+        day_spend = {}
+        restaurant_counts = {}
+        slot_counts = {}
+        first = last = None
+
+        for timestamp, price, restaurant in orders:
+            if timestamp is None:
+                continue
+            day, weekday, hour = local_slot(timestamp)
+
+            day_counts[day] = day_counts.get(day, 0) + 1
+            day_spend[day] = day_spend.get(day, 0.0) + price
+
+            counts = restaurant_counts.setdefault(restaurant, {})
+            counts[day] = counts.get(day, 0) + 1
+            counts = slot_counts.setdefault((weekday, hour), {})
+            counts[day] = counts.get(day, 0) + 1
+
+            if first is None or timestamp < first:
+                first = timestamp
+            if last is None or timestamp > last:
+                last = timestamp
+
+        index = cls()
+        index.first_order = first
+        index.last_order = last
+        for day in sorted(day_counts):
+            index.days.append(day)
+            index.count_prefix.append(index.count_prefix[-1] + day_counts[day])
+            index.spend_prefix.append(index.spend_prefix[-1] + day_spend[day])
+
+        index.restaurant_days = {key: _prefix_counts(counts) for key, counts in restaurant_counts.items()}
+        index.slot_days = {key: _prefix_counts(counts) for key, counts in slot_counts.items()}
+        return index
+
+    def _span(self, days, start, end):
+        # Positions in a sorted day array covering start..end (inclusive, None = open)
+        low = 0 if start is None else bisect_left(days, start)
+        high = len(days) if end is None else bisect_right(days, end)
+        return low, max(low, high)
+
+    def count(self, start=None, end=None):
+        """Orders placed from day start to day end, both included"""
+
+        low, high = self._span(self.days, start, end)
+        return self.count_prefix[high] - self.count_prefix[low]
+
+    def spend(self, start=None, end=None):
+        """Money spent (TL) from day start to day end, both included"""
+
+        low, high = self._span(self.days, start, end)
+        return self.spend_prefix[high] - self.spend_prefix[low]
+
+    def restaurant_count(self, restaurant, start=None, end=None):
+        days, prefix = self.restaurant_days.get(restaurant, ((), (0,)))
+        low, high = self._span(days, start, end)
+        return prefix[high] - prefix[low]
+
+    def top_restaurants(self, limit=5, start=None, end=None):
+        """Restaurants with the most orders in the window, as (restaurant, count)"""
+
+        counts = []
+        for restaurant, (days, prefix) in self.restaurant_days.items():
+            low, high = self._span(days, start, end)
+            if prefix[high] > prefix[low]:
+                counts.append((restaurant, prefix[high] - prefix[low]))
+        counts.sort(key=lambda entry: entry[1], reverse=True)
+        return counts[:limit]
+
+    def slot_count(self, weekday, hour, start=None, end=None):
+        """Orders placed at this hour (0-23) on this weekday (0 = Monday) in the window"""
+
+        days, prefix = self.slot_days.get((weekday, hour), ((), (0,)))
+        low, high = self._span(days, start, end)
+        return prefix[high] - prefix[low]
+
+def _prefix_counts(day_counts):
+    days = array('l', sorted(day_counts))
+    prefix = array('q', [0])
+    for day in days:
+        prefix.append(prefix[-1] + day_counts[day])
+    return days, prefix
+
+def window(period, today=None):
+    """The (start, end) day ordinals of a named period, or the last N days for a number.
+
+    Periods run up to and including today: "week" starts on Monday, "month"
+    on the 1st and "year" on January 1st. "all" is (None, None).
+    """
+
+    today = today or datetime.date.today()
+    end = today.toordinal()
+
+    if period == 'all':
+        return None, None
+    if period == 'today':
+        return end, end
+    if period == 'week':
+        return end - today.weekday(), end
+    if period == 'month':
+        return today.replace(day=1).toordinal(), end
+    if period == 'year':
+        return today.replace(month=1, day=1).toordinal(), end
+
+    days = int(period)
+    if days < 1:
+        raise ValueError(f"Window must cover at least one day, got {days}")
+    return end - days + 1, end